@@ -0,0 +1,223 @@
+"""Bulk answers and incremental score rollups of compliance assessments
+
+``upsert_results()`` writes any number of answers with one read and at most
+one batched insert and one batched update of results, then moves the
+rollups by the change of each answer: the subtree rows of the answered
+nodes and their ancestors (one recursive query over ``parent_urn_id``) and
+the assessment row. Nothing else in the tree is read or written, so the
+cost follows the answers, not the framework size. ``rebuild_rollups()``
+recomputes everything from the results, after the tree itself changed.
+"""
+from datetime import datetime
+
+from sqlalchemy import bindparam
+from sqlalchemy.orm import aliased
+
+from application import db
+from app.models import (AssessmentSubtreeScore, ComplianceAssessment, RequirementAssessment, RequirementNode,
+                        RESULT_STATUSES, ROLLUP_COLUMNS, result_contribution)
+
+_NO_RESULT = result_contribution(None, None)
+
+# Tries of upsert_results() when concurrent first answers collide
+RESULT_WRITE_ATTEMPTS = 3
+
+
+class AssessmentError(ValueError):
+    """Answers that cannot be recorded (unknown requirements, invalid status or score)"""
+
+
+def _parent_ids(urn_ids):
+    """{urn id: parent urn id} of the nodes and all their ancestors (one recursive query)"""
+    if not urn_ids:
+        return {}
+    chain = (db.select(RequirementNode.urn_id, RequirementNode.parent_urn_id)
+             .where(RequirementNode.urn_id.in_(urn_ids))
+             .cte('chain', recursive=True))
+    parent = aliased(RequirementNode)
+    chain = chain.union(db.select(parent.urn_id, parent.parent_urn_id)
+                        .join(chain, parent.urn_id == chain.c.parent_urn_id))
+    return dict(db.session.execute(db.select(chain.c.urn_id, chain.c.parent_urn_id)).all())
+
+
+def _rollup_deltas(deltas, parent_ids):
+    """{node urn id: summed delta} over each changed node and its ancestors"""
+    rollups = {}
+    for urn_id, delta in deltas.items():
+        seen = set()
+        while urn_id is not None and urn_id not in seen:
+            seen.add(urn_id)
+            rollup = rollups.setdefault(urn_id, dict.fromkeys(ROLLUP_COLUMNS, 0))
+            for column, value in delta.items():
+                rollup[column] += value
+            urn_id = parent_ids.get(urn_id)
+    return rollups
+
+
+def _apply_rollup_deltas(assessment_id, rollups):
+    """Add ``rollups`` to the subtree rows, creating the missing ones"""
+    table = AssessmentSubtreeScore.__table__
+    existing = set(db.session.execute(
+        db.select(AssessmentSubtreeScore.node_urn_id).where(
+            AssessmentSubtreeScore.assessment_id == assessment_id,
+            AssessmentSubtreeScore.node_urn_id.in_(rollups))
+    ).scalars())
+
+    updates = [dict({f'd_{c}': v for c, v in rollup.items()}, n=urn_id)
+               for urn_id, rollup in rollups.items() if urn_id in existing]
+    if updates:
+        db.session.execute(
+            table.update()
+            .where(table.c.assessment_id == assessment_id, table.c.node_urn_id == bindparam('n'))
+            .values({column: table.c[column] + bindparam(f'd_{column}') for column in ROLLUP_COLUMNS}),
+            updates
+        )
+    inserts = [dict(rollup, assessment_id=assessment_id, node_urn_id=urn_id)
+               for urn_id, rollup in rollups.items() if urn_id not in existing]
+    if inserts:
+        db.session.execute(table.insert(), inserts)
+
+
+def _stored_results(assessment_id, urn_ids):
+    """{requirement urn id: result}, locked until the end of the transaction (FOR UPDATE)
+
+    The lock makes concurrent answers to the same requirement apply one
+    after the other, each from the result the previous one wrote.
+    """
+    return {
+        result.requirement_urn_id: result
+        for result in RequirementAssessment.query.filter(
+            RequirementAssessment.assessment_id == assessment_id,
+            RequirementAssessment.requirement_urn_id.in_(urn_ids)).with_for_update()
+    }
+
+
+def upsert_results(assessment, answers):
+    """Record ``answers`` ([{requirement, status, score, observation}]) and move the rollups
+
+    ``requirement`` is a requirement id or URN of the assessed framework;
+    fields left out keep their stored value. Raises AssessmentError before
+    writing anything when an answer is invalid. Returns counts.
+    
+    Rows that do not exist yet cannot be locked: when another transaction
+    inserts the same first answer meanwhile, the insert raises
+    IntegrityError and the caller rolls back and calls again (the answer is
+    then an update, see ``RESULT_WRITE_ATTEMPTS``).
+    """
+    framework = assessment.framework
+    by_key = {}
+    for answer in answers:
+        if not isinstance(answer, dict) or not answer.get('requirement'):
+            raise AssessmentError('Each answer needs a requirement id or URN')
+        if 'status' in answer and answer['status'] not in RESULT_STATUSES:
+            raise AssessmentError(f"Invalid status {answer['status']!r} (one of {', '.join(RESULT_STATUSES)})")
+        score = answer.get('score')
+        if score is not None:
+            if not isinstance(score, int) or isinstance(score, bool):
+                raise AssessmentError(f'Invalid score {score!r}')
+            if (framework.min_score is not None and score < framework.min_score) or \
+                    (framework.max_score is not None and score > framework.max_score):
+                raise AssessmentError(f'Score {score} outside {framework.min_score}..{framework.max_score}')
+        by_key.setdefault(answer['requirement'], {}).update(answer)  # last answer wins
+
+    keys = list(by_key)
+    nodes = RequirementNode.query.filter(
+        RequirementNode.framework_id == assessment.framework_id,
+        db.or_(RequirementNode.id.in_(keys), RequirementNode.urn_in(keys))
+    ).all() if keys else []
+    by_id = {node.id: node for node in nodes}
+    by_id.update({node.urn: node for node in nodes})
+    unknown = [key for key in keys if key not in by_id]
+    if unknown:
+        raise AssessmentError(f"Unknown requirements: {', '.join(unknown[:10])}")
+    not_assessable = [key for key in keys if not by_id[key].assessable]
+    if not_assessable:
+        raise AssessmentError(f"Requirements not assessable: {', '.join(not_assessable[:10])}")
+
+    answers_by_node = {}
+    for key in keys:
+        answers_by_node.setdefault(by_id[key].urn_id, {}).update(by_key[key])
+    existing = _stored_results(assessment.id, list(answers_by_node))
+
+    inserts, updates, deltas = [], [], {}
+    for urn_id, answer in answers_by_node.items():
+        stored = existing.get(urn_id)
+        old = {'status': stored.status, 'score': stored.score, 'observation': stored.observation} if stored \
+            else {'status': 'not_assessed', 'score': None, 'observation': None}
+        new = dict(old, **{field: answer[field] for field in ('status', 'score', 'observation') if field in answer})
+        if stored is not None and new == old:
+            continue
+        row = dict(new, assessment_id=assessment.id, requirement_urn_id=urn_id)
+        (updates if stored is not None else inserts).append(row)
+
+        before = result_contribution(old['status'], old['score']) if stored else _NO_RESULT
+        after = result_contribution(new['status'], new['score'])
+        delta = {column: after[column] - before[column] for column in ROLLUP_COLUMNS}
+        if any(delta.values()):
+            deltas[urn_id] = delta
+
+    now = datetime.utcnow()
+    if inserts:
+        db.session.execute(db.insert(RequirementAssessment), [dict(row, updated_at=now) for row in inserts])
+    if updates:
+        db.session.execute(db.update(RequirementAssessment), [dict(row, updated_at=now) for row in updates])
+
+    rollups = {}
+    if deltas:
+        rollups = _rollup_deltas(deltas, _parent_ids(list(deltas)))
+        _apply_rollup_deltas(assessment.id, rollups)
+        table = ComplianceAssessment.__table__
+        db.session.execute(
+            table.update().where(table.c.id == assessment.id).values(
+                dict({column: table.c[column] + sum(delta[column] for delta in deltas.values())
+                      for column in ROLLUP_COLUMNS}, updated_at=now))
+        )
+    # Bulk statements bypass loaded instances
+    db.session.expire_all()
+
+    return {
+        'received': len(answers),
+        'inserted': len(inserts),
+        'updated': len(updates),
+        'unchanged': len(answers_by_node) - len(inserts) - len(updates),
+        'rollups_updated': len(rollups)
+    }
+
+
+def rebuild_rollups(assessment):
+    """Recompute every rollup of ``assessment`` from its results and the current tree"""
+    nodes = db.session.execute(
+        db.select(RequirementNode.urn_id, RequirementNode.parent_urn_id, RequirementNode.assessable)
+        .where(RequirementNode.framework_id == assessment.framework_id)
+    ).all()
+    in_framework = {urn_id for urn_id, _, _ in nodes}
+    deltas = {
+        result.requirement_urn_id: result_contribution(result.status, result.score)
+        for result in assessment.results
+        if result.requirement_urn_id in in_framework
+    }
+    rollups = _rollup_deltas(deltas, {urn_id: parent_id for urn_id, parent_id, _ in nodes})
+
+    db.session.execute(db.delete(AssessmentSubtreeScore).where(
+        AssessmentSubtreeScore.assessment_id == assessment.id))
+    if rollups:
+        db.session.execute(db.insert(AssessmentSubtreeScore), [
+            dict(rollup, assessment_id=assessment.id, node_urn_id=urn_id) for urn_id, rollup in rollups.items()
+        ])
+    for column in ROLLUP_COLUMNS:
+        setattr(assessment, column, sum(delta[column] for delta in deltas.values()))
+    assessment.assessable_count = sum(1 for _, _, assessable in nodes if assessable)
+
+
+def subtree_summary(assessment, node):
+    """Score summary of ``node`` and its descendants: one primary key read"""
+    rollup = db.session.get(AssessmentSubtreeScore, (assessment.id, node.urn_id))
+    return (rollup or AssessmentSubtreeScore(**dict.fromkeys(ROLLUP_COLUMNS, 0))).score_summary()
+
+
+def delete_framework_assessments(framework_ids):
+    """Delete the assessments of ``framework_ids`` with their results and rollups (bulk)"""
+    assessment_ids = db.select(ComplianceAssessment.id).where(ComplianceAssessment.framework_id.in_(framework_ids))
+    for model in (RequirementAssessment, AssessmentSubtreeScore):
+        db.session.execute(db.delete(model).where(model.assessment_id.in_(assessment_ids)))
+    db.session.execute(db.delete(ComplianceAssessment).where(ComplianceAssessment.framework_id.in_(framework_ids)))
@@ -0,0 +1,484 @@
+"""Shared cache for computed API responses
+
+Pluggable backends let gunicorn workers and warm serverless instances share
+computed results (framework trees, library content, crosswalks):
+
+- ``memory``: in-process LRU bounded by bytes
+- ``filesystem``: one file per key under CACHE_DIR (e.g. ``/tmp`` on Vercel)
+- ``redis``: any Redis-protocol server (redis-py compatible client)
+
+Values are pre-encoded bytes. Keys live in namespaces (one per library URN);
+invalidating a namespace replaces its version token so every older key becomes
+unreachable at once. Concurrent misses on the same key are collapsed
+(single-flight) so only one request computes a value.
+
+Values are computed from the primary database (``app.routing``): a lagging
+replica would otherwise refill an invalidated key with the old rows for the
+whole TTL. A value computed after the request read from a replica is
+returned but not stored.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from flask import Response, current_app, request
+
+from app.routing import primary_reads, replica_read
+
+
+class CacheBackend:
+    """Minimal byte-oriented key/value interface shared by all backends"""
+
+    name = 'base'
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def add(self, key, value, ttl=None):
+        """Set only if absent; returns True when the key was written"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def delete_if_equal(self, key, value):
+        """Delete ``key`` only while it still holds ``value`` (compare-and-delete)"""
+        raise NotImplementedError
+
+    def stats(self):
+        return {'backend': self.name}
+
+
+class MemoryBackend(CacheBackend):
+    """In-process LRU bounded by total stored bytes"""
+
+    name = 'memory'
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None and isinstance(entry[1], bytes):
+            self.bytes -= len(entry[1])
+
+    def _store(self, key, value, ttl):
+        self._remove(key)
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._entries[key] = (expires_at, value)
+        if isinstance(value, bytes):
+            self.bytes += len(value)
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def get(self, key):
+        with self._lock:
+            return self._get_entry(key)
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key, value, ttl=None):
+        with self._lock:
+            if self._get_entry(key) is not None:
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def delete_if_equal(self, key, value):
+        with self._lock:
+            if self._get_entry(key) == value:
+                self._remove(key)
+
+    def stats(self):
+        return {
+            'backend': self.name,
+            'keys': len(self._entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions,
+        }
+
+
+class FileSystemBackend(CacheBackend):
+    """One file per key; survives across invocations of a warm serverless instance"""
+
+    name = 'filesystem'
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.bytes = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    @staticmethod
+    def _encode(value, ttl):
+        expires_at = time.time() + ttl if ttl else 0
+        return f'{expires_at:.3f}\n'.encode() + value
+
+    def _read(self, path):
+        try:
+            with open(path, 'rb') as file:
+                header = file.readline()
+                value = file.read()
+        except FileNotFoundError:
+            return None
+        expires_at = float(header or 0)
+        if expires_at and expires_at < time.time():
+            self._unlink(path)
+            return None
+        return value
+
+    def _unlink(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.unlink(path)
+            with self._lock:
+                self.bytes -= size
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        if self.bytes <= self.max_bytes:
+            return
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.is_file() and not entry.name.startswith('.')),
+            key=lambda entry: entry.stat().st_atime,
+        )
+        for entry in entries:
+            if self.bytes <= self.max_bytes:
+                break
+            self._unlink(entry.path)
+            self.evictions += 1
+
+    def get(self, key):
+        return self._read(self._path(key))
+
+    def set(self, key, value, ttl=None):
+        path = self._path(key)
+        data = self._encode(value, ttl)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.bytes += len(data) - previous
+        self._evict()
+
+    def add(self, key, value, ttl=None):
+        path = self._path(key)
+        self._read(path)  # drops the entry first if it has expired
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        data = self._encode(value, ttl)
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        with self._lock:
+            self.bytes += len(data)
+        return True
+
+    def delete(self, key):
+        self._unlink(self._path(key))
+
+    def delete_if_equal(self, key, value):
+        # Move the file aside atomically, then put it back if it was not ours
+        path = self._path(key)
+        claimed = os.path.join(self.directory, f'.del-{uuid.uuid4().hex}')
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            return
+        size = os.path.getsize(claimed)
+        with open(claimed, 'rb') as file:
+            file.readline()
+            matches = file.read() == value
+        if not matches:
+            try:
+                os.link(claimed, path)  # unless a newer holder created it meanwhile
+            except FileExistsError:
+                matches = True
+        os.unlink(claimed)
+        if matches:
+            with self._lock:
+                self.bytes -= size
+
+    def stats(self):
+        return {
+            'backend': self.name,
+            'directory': self.directory,
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions,
+        }
+
+
+class RedisBackend(CacheBackend):
+    """Redis-protocol backend around a redis-py compatible client"""
+
+    name = 'redis'
+
+    DELETE_IF_EQUAL = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+    )
+
+    def __init__(self, client):
+        self.client = client
+        self.bytes_written = 0
+
+    @classmethod
+    def from_url(cls, url):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError('CACHE_BACKEND=redis requires the "redis" package') from e
+        return cls(redis.Redis.from_url(url))
+
+    @staticmethod
+    def _px(ttl):
+        return int(ttl * 1000) if ttl else None
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, value, px=self._px(ttl))
+        self.bytes_written += len(value)
+
+    def add(self, key, value, ttl=None):
+        return bool(self.client.set(key, value, px=self._px(ttl), nx=True))
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def delete_if_equal(self, key, value):
+        self.client.eval(self.DELETE_IF_EQUAL, 1, key, value)
+
+    def stats(self):
+        return {'backend': self.name, 'bytes_written': self.bytes_written}
+
+
+class SharedCache:
+    """Namespaced get-or-compute cache with single-flight, configured per app"""
+
+    def __init__(self, app=None):
+        self.backend = MemoryBackend()
+        self.prefix = 'hyperlynx'
+        self.default_ttl = 3600
+        self.lock_timeout = 30
+        self._flight_locks = {}
+        self._flight_guard = threading.Lock()
+        self._reset_stats()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        max_bytes = app.config.get('CACHE_MAX_BYTES', 64 * 1024 * 1024)
+        if backend == 'filesystem':
+            directory = app.config.get('CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'hyperlynx-cache')
+            self.backend = FileSystemBackend(directory, max_bytes=max_bytes)
+        elif backend == 'redis':
+            self.backend = RedisBackend.from_url(app.config['CACHE_REDIS_URL'])
+        else:
+            self.backend = MemoryBackend(max_bytes=max_bytes)
+        self.prefix = app.config.get('CACHE_KEY_PREFIX', 'hyperlynx')
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', 3600)
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.computes = 0
+        self.waits = 0
+        self.bytes_served = 0
+
+    # ==================== KEYS ====================
+
+    def _namespace_key(self, namespace):
+        return f'{self.prefix}:ns:{namespace}'
+
+    def _full_key(self, namespace, key):
+        # A lost or evicted version token just yields a fresh one (a miss),
+        # never a reappearing older generation
+        namespace_key = self._namespace_key(namespace)
+        version = self.backend.get(namespace_key)
+        if version is None:
+            self.backend.add(namespace_key, uuid.uuid4().hex.encode())
+            version = self.backend.get(namespace_key) or b'0'
+        return f'{self.prefix}:{namespace}:{version.decode()}:{key}'
+
+    # ==================== API ====================
+
+    def get(self, namespace, key):
+        value = self.backend.get(self._full_key(namespace, key))
+        self._record(value)
+        return value
+
+    def set(self, namespace, key, value, ttl=None):
+        self.backend.set(self._full_key(namespace, key), value, ttl or self.default_ttl)
+
+    def get_or_compute(self, namespace, key, compute, ttl=None):
+        """Return cached bytes for ``key`` or compute, store and return them
+
+        ``compute`` must return bytes. Only one caller per key computes at a
+        time: in-process via a per-key lock, across processes via a lock key
+        in the backend (other callers wait for the value to appear). The lock
+        holds a random token and is released with a compare-and-delete, so a
+        caller whose wait timed out never releases another holder's lock.
+        ``compute`` reads from the primary; see the module docstring.
+        """
+        full_key = self._full_key(namespace, key)
+        value = self.backend.get(full_key)
+        if value is not None:
+            self._record(value)
+            return value
+
+        with self._flight(full_key):
+            value = self.backend.get(full_key)
+            if value is not None:
+                # Computed by the request we waited on
+                self.waits += 1
+                self._record(value)
+                return value
+
+            lock_key = f'{full_key}:lock'
+            token = uuid.uuid4().hex.encode()
+            if not self.backend.add(lock_key, token, ttl=self.lock_timeout):
+                value = self._wait_for(full_key)
+                if value is not None:
+                    self.waits += 1
+                    self._record(value)
+                    return value
+                # The holder gave up or died: compute, taking over the lock if it expired
+                self.backend.add(lock_key, token, ttl=self.lock_timeout)
+            try:
+                self.misses += 1
+                self.computes += 1
+                # Rows already read from a replica may be behind the primary
+                from_replica = replica_read()
+                with primary_reads():
+                    value = compute()
+                if not from_replica:
+                    self.backend.set(full_key, value, ttl or self.default_ttl)
+                self.bytes_served += len(value)
+                return value
+            finally:
+                self.backend.delete_if_equal(lock_key, token)
+
+    def invalidate(self, namespace):
+        """Drop every key of ``namespace`` by giving it a new version token"""
+        self.backend.set(self._namespace_key(namespace), uuid.uuid4().hex.encode())
+
+    def invalidate_library(self, library_urn):
+        if library_urn:
+            self.invalidate(library_namespace(library_urn))
+
+    def invalidate_catalog(self):
+        self.invalidate(CATALOG_NAMESPACE)
+
+    # ==================== INTERNALS ====================
+
+    def _record(self, value):
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.bytes_served += len(value)
+
+    @contextmanager
+    def _flight(self, full_key):
+        with self._flight_guard:
+            lock, waiters = self._flight_locks.get(full_key, (threading.Lock(), 0))
+            self._flight_locks[full_key] = (lock, waiters + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._flight_guard:
+                lock, waiters = self._flight_locks[full_key]
+                if waiters <= 1:
+                    del self._flight_locks[full_key]
+                else:
+                    self._flight_locks[full_key] = (lock, waiters - 1)
+
+    def _wait_for(self, full_key, interval=0.05):
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            value = self.backend.get(full_key)
+            if value is not None:
+                return value
+            time.sleep(interval)
+        return None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            'computes': self.computes,
+            'single_flight_waits': self.waits,
+            'bytes_served': self.bytes_served,
+            **self.backend.stats(),
+        }
+
+
+# Results derived from the catalog as a whole (facets); dropped on any catalog change
+CATALOG_NAMESPACE = 'catalog'
+
+
+def library_namespace(library_urn):
+    """Namespace for results derived from one library's objects"""
+    return f'library:{library_urn}'
+
+
+def encode_json(data):
+    """Encode ``data`` the same way jsonify() does, for caching as bytes"""
+    return current_app.json.dumps(data).encode('utf-8') + b'\n'
+
+
+def json_bytes_response(body, status=200, etag=None):
+    """Response for an already-encoded JSON body, conditional when ``etag`` is given"""
+    response = Response(body, status=status, mimetype='application/json')
+    if etag:
+        response.set_etag(etag)
+        response.make_conditional(request)
+    return response
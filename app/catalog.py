@@ -0,0 +1,77 @@
+"""Bundled read-only catalog database
+
+``build_catalog.py`` compiles ``libraries/`` into a SQLite file with the
+stored library tables (same schema and indexes). When ``CATALOG_DB_PATH``
+points to that file, the catalog views read stored libraries from the
+primary database and, within ``bundle_reads()``, from the bundle: the two
+are merged and a library stored in both is served from the primary
+database (uploads, local edits). Every other table, and every write, goes
+to the usual engines (see ``app.routing``); importing a bundled library
+copies its row into the primary database first.
+
+``is_loaded`` is the one mutable catalog column: bundle rows take it from
+the primary ``loaded_libraries`` table (one cached query) rather than the
+file.
+"""
+from contextlib import contextmanager
+
+import sqlalchemy as sa
+from flask import current_app, g, has_app_context
+
+CATALOG_TABLES = frozenset({'stored_libraries', 'stored_library_contents'})
+
+
+def init_catalog(app):
+    """Open the bundled catalog of ``app`` read-only, when CATALOG_DB_PATH is set
+
+    The engine belongs to the app (``app.extensions``), not to the shared
+    SQLAlchemy extension: it is not a bind with models of its own, and
+    registering it there would leak into every other app of the process.
+    """
+    path = app.config.get('CATALOG_DB_PATH')
+    app.extensions['catalog_engine'] = sa.create_engine(
+        f'sqlite:///file:{path}?mode=ro&uri=true', connect_args={'check_same_thread': False}
+    ) if path else None
+
+
+def catalog_engine():
+    """Engine of the bundled catalog of the current app, or None"""
+    return current_app.extensions.get('catalog_engine') if has_app_context() else None
+
+
+def catalog_bundled():
+    """True when the current app serves a bundled catalog"""
+    return catalog_engine() is not None
+
+
+def catalog_reads_active():
+    return has_app_context() and g.get('catalog_reads', False)
+
+
+def catalog_loaded_urns():
+    """URNs of the loaded libraries while catalog reads are active, else None"""
+    return g.get('catalog_loaded_urns') if catalog_reads_active() else None
+
+
+def catalog_shadowed_urns():
+    """URNs also stored in the primary database while catalog reads are active, else None"""
+    return g.get('catalog_shadowed_urns') if catalog_reads_active() else None
+
+
+@contextmanager
+def bundle_reads(loaded_urns, shadowed_urns):
+    """Read stored libraries from the bundled catalog within the block
+
+    ``loaded_urns`` give the ``is_loaded`` state of bundle rows;
+    ``shadowed_urns`` are the URNs the primary database stores too, whose
+    primary rows win (catalog filters leave them out of bundle queries).
+    """
+    # Batch sub-requests share ``g``: restore the previous state afterwards
+    previous = (g.get('catalog_reads', False), g.get('catalog_loaded_urns'), g.get('catalog_shadowed_urns'))
+    g.catalog_reads = True
+    g.catalog_loaded_urns = frozenset(loaded_urns)
+    g.catalog_shadowed_urns = frozenset(shadowed_urns)
+    try:
+        yield
+    finally:
+        g.catalog_reads, g.catalog_loaded_urns, g.catalog_shadowed_urns = previous
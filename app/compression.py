@@ -0,0 +1,50 @@
+"""Compression of large JSON blobs (stored library content)
+
+zstd is used when the optional ``zstandard`` package is installed, gzip
+otherwise. The codec is stored next to each blob so either can be read back.
+"""
+import gzip
+import hashlib
+import json
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+
+
+def default_codec():
+    return 'zstd' if zstandard is not None else 'gzip'
+
+
+def compress(raw, codec=None):
+    """Compress ``raw`` bytes; returns (codec, data)"""
+    codec = codec or default_codec()
+    if codec == 'zstd':
+        return codec, zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    if codec == 'gzip':
+        return codec, gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f'Unknown codec: {codec}')
+
+
+def decompress(codec, data):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('zstd-compressed content requires the "zstandard" package')
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == 'gzip':
+        return gzip.decompress(data)
+    raise ValueError(f'Unknown codec: {codec}')
+
+
+def encode_document(document):
+    """Canonical compact JSON bytes, so equal documents hash equally"""
+    return json.dumps(document, ensure_ascii=False, sort_keys=True,
+                      separators=(',', ':'), default=str).encode('utf-8')
+
+
+def content_hash(raw):
+    return hashlib.sha256(raw).hexdigest()
@@ -0,0 +1,196 @@
+"""JSON Pointer access to stored library content
+
+Library content is stored compressed (see ``StoredLibraryContent``) as
+canonical compact JSON (``encode_document``). Each library version is
+decompressed once per process and indexed by byte offsets: every object and
+array of the document records the (start, end) offsets of its members in
+the raw bytes. A ``?path=`` lookup walks that index, and the value or a page
+of an array is one slice of the raw bytes, spliced into the response as-is,
+so serving a few kilobytes of a 3 MB library parses nothing.
+
+Indexes are kept in a per-process LRU keyed by content hash and bounded by
+bytes (``CONTENT_INDEX_MAX_BYTES``): the raw document plus its offsets, a
+fraction of what the parsed document would take.
+"""
+import json
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+# Same encoding as app.compression.encode_document, one value at a time
+_encode = json.JSONEncoder(ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str).encode
+
+
+class PointerError(ValueError):
+    """Malformed JSON Pointer"""
+
+
+def parse_pointer(pointer):
+    """RFC 6901 pointer -> list of reference tokens ('' is the whole document)
+
+    The leading slash is optional, so ``objects/risk_matrix`` is accepted too.
+    """
+    if pointer in (None, '', '/'):
+        return []
+    if not pointer.startswith('/'):
+        pointer = '/' + pointer
+    tokens = pointer[1:].split('/')
+    for token in tokens:
+        if '~' in token.replace('~0', '').replace('~1', ''):
+            raise PointerError(f'Invalid escape in JSON pointer: {pointer}')
+    return [token.replace('~1', '/').replace('~0', '~') for token in tokens]
+
+
+def _array_index(token):
+    if not token.isdigit() or (token != '0' and token.startswith('0')):
+        raise KeyError(token)
+    return int(token)
+
+
+def resolve_pointer(document, pointer):
+    """Value at ``pointer``; raises KeyError when it does not exist"""
+    value = document
+    for token in parse_pointer(pointer):
+        if isinstance(value, dict):
+            value = value[token]
+        elif isinstance(value, list):
+            value = value[_array_index(token)]
+        else:
+            raise KeyError(token)
+    return value
+
+
+def _encoded_length(value):
+    return len(_encode(value).encode('utf-8'))
+
+
+class ContentIndex:
+    """Byte offsets of the members of every object and array of a raw JSON document
+
+    A container node is ``(keys, bounds, children)``: the sorted keys of an
+    object (None for an array), the start / end offsets of each member as
+    consecutive pairs, and the nodes of the members that are containers
+    themselves, by position.
+    """
+
+    def __init__(self, raw):
+        document = json.loads(raw)
+        self.raw = raw
+        self.nodes = self.members = 0
+        end, self.root = self._build(document, 0)
+        if end != len(raw):
+            # Not in canonical form: index a canonical encoding instead
+            self.raw = _encode(document).encode('utf-8')
+            self.nodes = self.members = 0
+            _, self.root = self._build(document, 0)
+
+    def _build(self, value, start):
+        """(end offset, node or None) of ``value`` encoded at ``start``"""
+        if isinstance(value, dict):
+            keys = tuple(sorted(value))
+            members = [value[key] for key in keys]
+        elif isinstance(value, list):
+            keys, members = None, value
+        else:
+            return start + _encoded_length(value), None
+
+        bounds = array('q')
+        children = {}
+        position = start + 1
+        for index, member in enumerate(members):
+            if index:
+                position += 1  # ','
+            if keys is not None:
+                position += _encoded_length(keys[index]) + 1  # '"key":'
+            end, child = self._build(member, position)
+            bounds.append(position)
+            bounds.append(end)
+            if child is not None:
+                children[index] = child
+            position = end
+        self.nodes += 1
+        self.members += len(members)
+        return position + 1, (keys, bounds, children or None)
+
+    @property
+    def size(self):
+        """Approximate memory footprint in bytes"""
+        return len(self.raw) + 16 * self.members + 200 * self.nodes
+
+    def locate(self, pointer):
+        """(start, end, node) of the value at ``pointer``; node is None for scalars
+
+        Raises KeyError when the pointer does not exist.
+        """
+        start, end, node = 0, len(self.raw), self.root
+        for token in parse_pointer(pointer):
+            if node is None:
+                raise KeyError(token)
+            keys, bounds, children = node
+            if keys is None:
+                position = _array_index(token)
+                if position >= len(bounds) // 2:
+                    raise KeyError(token)
+            else:
+                position = bisect_left(keys, token)
+                if position == len(keys) or keys[position] != token:
+                    raise KeyError(token)
+            start, end = bounds[2 * position], bounds[2 * position + 1]
+            node = children.get(position) if children else None
+        return start, end, node
+
+    def value(self, pointer):
+        """Raw JSON bytes of the value at ``pointer``"""
+        start, end, _ = self.locate(pointer)
+        return self.raw[start:end]
+
+    def page(self, pointer, offset, limit):
+        """(count, raw JSON array of the page) when ``pointer`` is an array, else None"""
+        _, _, node = self.locate(pointer)
+        if node is None or node[0] is not None:
+            return None
+        bounds = node[1]
+        count = len(bounds) // 2
+        first, last = min(offset, count), min(offset + limit, count)
+        if first >= last:
+            return count, b'[]'
+        return count, b'[' + self.raw[bounds[2 * first]:bounds[2 * last - 1]] + b']'
+
+
+class ContentIndexCache:
+    """LRU of content indexes keyed by content hash, bounded by bytes"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_bytes = app.config.get('CONTENT_INDEX_MAX_BYTES', self.max_bytes)
+        with self._lock:
+            self._indexes.clear()
+            self.bytes = 0
+
+    def get(self, content_hash, load_raw):
+        """ContentIndex for ``content_hash``; ``load_raw()`` returns its JSON bytes on a miss"""
+        with self._lock:
+            index = self._indexes.get(content_hash)
+            if index is not None:
+                self._indexes.move_to_end(content_hash)
+                return index
+
+        index = ContentIndex(load_raw())
+        with self._lock:
+            if content_hash not in self._indexes:
+                self._indexes[content_hash] = index
+                self.bytes += index.size
+            # Always keep the newest one, even when it exceeds the bound on its own
+            while self.bytes > self.max_bytes and len(self._indexes) > 1:
+                _, evicted = self._indexes.popitem(last=False)
+                self.bytes -= evicted.size
+        return index
+
+
+content_indexes = ContentIndexCache()
@@ -0,0 +1,161 @@
+"""Cross-framework coverage inferred through requirement mapping sets
+
+Each ``RequirementMappingSet`` compiles, once per version (``updated_at``),
+into a sparse source x target weight matrix kept as coordinate arrays
+(source URN ids, target URN ids, weights). A weight is the relationship
+weight times the mapping strength relative to the strongest mapping of the
+set (1 when the set has no strengths). Projecting a compliance vector is a
+sparse matrix-vector product done with ``np.bincount``: every target gets
+the weighted mean of the compliance of its mapped sources, and a confidence
+that is the sum of the weights that reached it (capped at 1). When no set
+maps the two frameworks directly, the projection chains through pivot
+frameworks, using sets in either direction (subset and superset swap when
+a set is read backwards); confidence shrinks with every hop.
+"""
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from application import db
+from app.models import RequirementMapping, RequirementMappingSet
+
+# Share of a target requirement covered by a mapped source requirement ("source <relationship> target")
+RELATIONSHIP_WEIGHTS = {
+    'equal': 1.0,
+    'superset': 1.0,
+    'similar': 0.75,
+    'subset': 0.5,
+    'intersect': 0.5,
+    'related': 0.25,
+}
+REVERSED_RELATIONSHIPS = {'subset': 'superset', 'superset': 'subset'}
+
+# Compliance value of an assessment result; other statuses are unknown
+STATUS_COMPLIANCE = {'compliant': 1.0, 'partially_compliant': 0.5, 'non_compliant': 0.0}
+
+# Mapping sets chained at most, and compiled sets kept per process
+MAX_HOPS = 3
+MAX_COMPILED_SETS = 128
+
+
+class CompiledMappingSet:
+    """Coordinate arrays of the weight matrix of a mapping set"""
+
+    def __init__(self, mapping_set, rows):
+        self.mapping_set_id = mapping_set.id
+        self.source_framework_urn = mapping_set.source_framework_urn
+        self.target_framework_urn = mapping_set.target_framework_urn
+
+        rows = [row for row in rows if row[0] is not None and row[1] is not None]
+        self.source_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.target_ids = np.array([row[1] for row in rows], dtype=np.int64)
+        relationships = [row[2] for row in rows]
+        strengths = np.array([row[3] if row[3] is not None else np.nan for row in rows], dtype=np.float64)
+
+        strongest = np.nanmax(strengths) if rows and not np.isnan(strengths).all() else np.nan
+        strength_factor = np.ones(len(rows)) if np.isnan(strongest) or strongest <= 0 else \
+            np.nan_to_num(strengths / strongest, nan=1.0).clip(0, 1)
+        self.forward_weights = strength_factor * np.array(
+            [RELATIONSHIP_WEIGHTS.get(r, 0.0) for r in relationships], dtype=np.float64)
+        self.reverse_weights = strength_factor * np.array(
+            [RELATIONSHIP_WEIGHTS.get(REVERSED_RELATIONSHIPS.get(r, r), 0.0) for r in relationships],
+            dtype=np.float64)
+
+    def oriented(self, reverse=False):
+        """(from ids, to ids, weights) read forwards or backwards"""
+        if reverse:
+            return self.target_ids, self.source_ids, self.reverse_weights
+        return self.source_ids, self.target_ids, self.forward_weights
+
+
+_compiled = OrderedDict()
+_lock = threading.Lock()
+
+
+def compiled_mapping_set(mapping_set):
+    """CompiledMappingSet of ``mapping_set``, compiled once per (id, updated_at)"""
+    key = (mapping_set.id, mapping_set.updated_at)
+    with _lock:
+        compiled = _compiled.get(key)
+        if compiled is not None:
+            _compiled.move_to_end(key)
+            return compiled
+
+    rows = db.session.execute(
+        db.select(RequirementMapping.source_urn_id, RequirementMapping.target_urn_id,
+                  RequirementMapping.relationship_type, RequirementMapping.strength)
+        .where(RequirementMapping.mapping_set_id == mapping_set.id)
+    ).all()
+    compiled = CompiledMappingSet(mapping_set, rows)
+    with _lock:
+        _compiled[key] = compiled
+        while len(_compiled) > MAX_COMPILED_SETS:
+            _compiled.popitem(last=False)
+    return compiled
+
+
+def mapping_path(source_framework_urn, target_framework_urn, max_hops=MAX_HOPS):
+    """Shortest chain [(mapping set, reverse)] from one framework to another, or None
+
+    Breadth-first over all mapping sets (one query); sets read forwards
+    are preferred over backwards ones at equal length.
+    """
+    if source_framework_urn == target_framework_urn:
+        return []
+    edges = {}
+    for mapping_set in RequirementMappingSet.query.order_by(RequirementMappingSet.id):
+        source, target = mapping_set.source_framework_urn, mapping_set.target_framework_urn
+        if source and target:
+            edges.setdefault(source, []).append((target, mapping_set, False))
+            edges.setdefault(target, []).append((source, mapping_set, True))
+    for neighbours in edges.values():
+        neighbours.sort(key=lambda edge: edge[2])
+
+    previous = {source_framework_urn: None}
+    queue = deque([(source_framework_urn, 0)])
+    while queue:
+        framework_urn, hops = queue.popleft()
+        if hops == max_hops:
+            continue
+        for neighbour, mapping_set, reverse in edges.get(framework_urn, []):
+            if neighbour in previous:
+                continue
+            previous[neighbour] = (framework_urn, mapping_set, reverse)
+            if neighbour == target_framework_urn:
+                path = []
+                while previous[neighbour] is not None:
+                    neighbour, mapping_set, reverse = previous[neighbour]
+                    path.append((mapping_set, reverse))
+                return path[::-1]
+            queue.append((neighbour, hops + 1))
+    return None
+
+
+def propagate(ids, values, confidence, compiled, reverse=False):
+    """One hop: (target ids, coverage, confidence) from a sorted compliance vector over URN ids"""
+    from_ids, to_ids, weights = compiled.oriented(reverse)
+    if ids.size == 0 or from_ids.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+
+    positions = np.searchsorted(ids, from_ids).clip(max=ids.size - 1)
+    known = ids[positions] == from_ids
+    positions = positions[known]
+    contribution = weights[known] * confidence[positions]
+    reached = contribution > 0
+    positions, contribution, targets = positions[reached], contribution[reached], to_ids[known][reached]
+
+    target_ids, inverse = np.unique(targets, return_inverse=True)
+    total = np.bincount(inverse, weights=contribution, minlength=target_ids.size)
+    covered = np.bincount(inverse, weights=contribution * values[positions], minlength=target_ids.size)
+    return target_ids, covered / total, np.minimum(total, 1.0)
+
+
+def project(compliance, path):
+    """Project {URN id: compliance in [0, 1]} along ``path``: (ids, coverage, confidence) arrays"""
+    ids = np.array(sorted(compliance), dtype=np.int64)
+    values = np.array([compliance[urn_id] for urn_id in ids.tolist()], dtype=np.float64)
+    confidence = np.ones(ids.size)
+    for mapping_set, reverse in path:
+        ids, values, confidence = propagate(ids, values, confidence, compiled_mapping_set(mapping_set), reverse)
+    return ids, values, confidence
@@ -0,0 +1,294 @@
+"""Read-through identity cache for catalog lookups by id or URN
+
+Routes resolve most objects with "id or URN" lookups. This cache keeps a
+column snapshot of recently used rows per model (TTL + size-bounded LRU) and
+re-attaches them to the current session without a query. Entries are
+invalidated through SQLAlchemy session events on insert, update and delete,
+including bulk ``query.update()`` / ``query.delete()`` statements.
+
+Every invalidation bumps a per-model generation; a load only stores its row
+if no invalidation happened since it started, so a read racing a commit
+cannot cache the pre-commit row. Snapshots are deep copies (JSON columns are
+mutable), and requests that write (not GET/HEAD) bypass the cache: the rows
+they modify are always read from the database. So do reads of the bundled
+catalog (``app.catalog``), whose rows a primary row of the same URN shadows.
+Misses are loaded from the primary even when the request reads from a
+replica (``app.routing``), so a lagging replica never refills an entry with
+the row as it was before a write.
+
+The cache is per process; other workers see changes once their entries expire.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from flask import has_request_context, request
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.catalog import catalog_reads_active
+from app.routing import primary_reads
+
+
+def _bypassed():
+    """True when loads bypass the cache: in requests that may write, and reads of the bundled catalog"""
+    return (has_request_context() and request.method not in ('GET', 'HEAD')) or catalog_reads_active()
+
+
+def _urn_in(model, urns):
+    # Models that index their URN through an interned id say how to filter on it
+    return model.urn_in(urns) if hasattr(model, 'urn_in') else model.urn.in_(urns)
+
+
+class _ModelCache:
+    """LRU of column snapshots for one model, keyed by both id and URN"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Bumped by every invalidation; see put()
+        self.generation = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, values = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return values
+
+    def put(self, keys, values, generation):
+        """Store ``values`` unless the cache was invalidated after ``generation`` was read"""
+        entry = (time.monotonic() + self.ttl, values)
+        with self.lock:
+            if generation != self.generation:
+                return
+            for key in keys:
+                if key is None:
+                    continue
+                self.entries[key] = entry
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, keys):
+        with self.lock:
+            self.generation += 1
+            for key in keys:
+                if self.entries.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+
+class IdentityCache:
+    """Per-model identity cache shared by all routes of the process"""
+
+    def __init__(self, app=None, db=None):
+        self.db = None
+        self.enabled = True
+        self.ttl = 300
+        self.max_size = 512
+        self._caches = {}
+        self._lock = threading.Lock()
+        self._listening = False
+        if app is not None and db is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.db = db
+        self.enabled = app.config.get('IDENTITY_CACHE_ENABLED', True)
+        self.ttl = app.config.get('IDENTITY_CACHE_TTL', 300)
+        self.max_size = app.config.get('IDENTITY_CACHE_MAX_SIZE', 512)
+        self._caches = {}
+        if not self._listening:
+            event.listen(db.session, 'after_flush', self._after_flush)
+            event.listen(db.session, 'after_commit', self._after_commit)
+            event.listen(db.session, 'after_rollback', self._after_rollback)
+            event.listen(db.session, 'do_orm_execute', self._do_orm_execute)
+            self._listening = True
+
+    # ==================== LOOKUPS ====================
+
+    def get(self, model, key):
+        """Return the ``model`` row whose id or URN equals ``key``, or None"""
+        if not self.enabled or _bypassed():
+            return self._load(model, key)
+
+        cache = self._cache_for(model)
+        values = cache.get(key)
+        if values is not None:
+            return self._attach(model, values)
+
+        generation = cache.generation
+        with primary_reads():
+            instance = self._load(model, key, populate_existing=True)
+        if instance is not None:
+            cache.put((instance.id, instance.urn), self._snapshot(model, instance), generation)
+        return instance
+
+    def get_many(self, model, keys, chunk_size=400):
+        """Map each of ``keys`` (ids or URNs) to its ``model`` row
+
+        Cached rows are attached without a query; the rest are loaded with
+        one ``IN`` query per chunk. Keys that match nothing are left out.
+        """
+        cache = self._cache_for(model) if self.enabled and not _bypassed() else None
+        generation = cache.generation if cache is not None else None
+        found = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            values = cache.get(key) if cache is not None else None
+            if values is not None:
+                found[key] = self._attach(model, values)
+            else:
+                missing.append(key)
+
+        wanted = set(missing)
+        for start in range(0, len(missing), chunk_size):
+            chunk = missing[start:start + chunk_size]
+            query = model.query.filter(self.db.or_(model.id.in_(chunk), _urn_in(model, chunk)))
+            if cache is not None:
+                # Rows to cache come from the primary (see the module docstring)
+                with primary_reads():
+                    instances = query.populate_existing().all()
+            else:
+                instances = query.all()
+            for instance in instances:
+                if cache is not None:
+                    cache.put((instance.id, instance.urn), self._snapshot(model, instance), generation)
+                for key in (instance.id, instance.urn):
+                    if key in wanted:
+                        found[key] = instance
+        return found
+
+    def _load(self, model, key, populate_existing=False):
+        # Two indexed lookups instead of one OR across both columns;
+        # populate_existing refreshes a row the session loaded from a replica
+        instance = self.db.session.get(model, key, populate_existing=populate_existing)
+        if instance is None:
+            query = model.query.filter(_urn_in(model, [key]))
+            instance = (query.populate_existing() if populate_existing else query).first()
+        return instance
+
+    def _cache_for(self, model):
+        cache = self._caches.get(model)
+        if cache is None:
+            with self._lock:
+                cache = self._caches.setdefault(model, _ModelCache(self.max_size, self.ttl))
+        return cache
+
+    @staticmethod
+    def _snapshot(model, instance):
+        """Loaded column values only; large deferred/excluded columns reload on access"""
+        excluded = getattr(model, '__identity_cache_exclude__', ())
+        loaded = inspect(instance).dict
+        return {
+            attr.key: copy.deepcopy(loaded[attr.key])
+            for attr in inspect(model).column_attrs
+            if attr.key in loaded and attr.key not in excluded
+        }
+
+    def _attach(self, model, values):
+        # Each session gets its own copy of the mutable (JSON) values
+        instance = model(**copy.deepcopy(values))
+        make_transient_to_detached(instance)
+        return self.db.session.merge(instance, load=False)
+
+    # ==================== INVALIDATION ====================
+
+    def invalidate(self, instance):
+        cache = self._caches.get(type(instance))
+        if cache is not None:
+            cache.discard(self._keys_of(instance))
+
+    def clear(self, model=None):
+        caches = [self._caches.get(model)] if model else list(self._caches.values())
+        for cache in caches:
+            if cache is not None:
+                cache.clear()
+
+    @staticmethod
+    def _keys_of(instance):
+        keys = {instance.id, instance.urn}
+        state = inspect(instance)
+        for attr_name in ('id', 'urn'):
+            # Old values when the id or URN itself changed
+            keys.update(state.attrs[attr_name].history.deleted or ())
+        keys.discard(None)
+        return keys
+
+    def _after_flush(self, session, flush_context):
+        pending = session.info.setdefault('identity_cache_pending', set())
+        for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+            if type(instance) in self._caches:
+                keys = self._keys_of(instance)
+                self._caches[type(instance)].discard(keys)
+                pending.update((type(instance), key) for key in keys)
+
+    def _after_commit(self, session):
+        # Drop again at commit: a concurrent request may have cached the
+        # pre-commit row between our flush and the commit
+        for model, key in session.info.pop('identity_cache_pending', ()):
+            if key is None:
+                self.clear(model)
+            elif model in self._caches:
+                self._caches[model].discard((key,))
+
+    def _after_rollback(self, session):
+        session.info.pop('identity_cache_pending', None)
+
+    def _do_orm_execute(self, orm_execute_state):
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in self._caches:
+            self.clear(mapper.class_)
+            pending = orm_execute_state.session.info.setdefault('identity_cache_pending', set())
+            pending.add((mapper.class_, None))
+
+    # ==================== METRICS ====================
+
+    def stats(self):
+        models = {model.__tablename__: cache.stats() for model, cache in self._caches.items()}
+        hits = sum(s['hits'] for s in models.values())
+        misses = sum(s['misses'] for s in models.values())
+        return {
+            'enabled': self.enabled,
+            'ttl': self.ttl,
+            'max_size': self.max_size,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': (hits / (hits + misses)) if (hits + misses) else 0.0,
+            'models': models,
+        }
@@ -0,0 +1,122 @@
+"""JSON:API-style ``?include=`` of related objects with eager loading
+
+``?include=library,requirements`` (or nested: ``frameworks.requirements``)
+adds related objects to each serialized row. Every include path becomes a
+``selectinload`` (collections) or ``joinedload`` (single objects) option, so a
+list of any length is served in a fixed number of queries. Nesting is capped
+at ``MAX_INCLUDE_DEPTH`` levels.
+"""
+from flask import request
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.models import (StoredLibrary, LoadedLibrary, Framework, RequirementNode, ReferenceControl,
+                        RiskMatrix, RequirementMappingSet, RequirementMapping)
+
+MAX_INCLUDE_DEPTH = 2
+
+# model -> include name -> (relationship attribute, related model)
+INCLUDES = {
+    StoredLibrary: {
+        'loaded': ('loaded_instances', LoadedLibrary),
+    },
+    LoadedLibrary: {
+        'stored_library': ('stored_library', StoredLibrary),
+        'frameworks': ('frameworks', Framework),
+        'reference_controls': ('reference_controls', ReferenceControl),
+        'risk_matrices': ('risk_matrices', RiskMatrix),
+        'mapping_sets': ('mapping_sets', RequirementMappingSet),
+    },
+    Framework: {
+        'library': ('library', LoadedLibrary),
+        'requirements': ('requirement_nodes', RequirementNode),
+    },
+    RequirementNode: {
+        'framework': ('framework', Framework),
+    },
+    ReferenceControl: {
+        'library': ('library', LoadedLibrary),
+    },
+    RiskMatrix: {
+        'library': ('library', LoadedLibrary),
+    },
+    RequirementMappingSet: {
+        'library': ('library', LoadedLibrary),
+        'mappings': ('mapping_list', RequirementMapping),
+    },
+    RequirementMapping: {
+        'mapping_set': ('mapping_set', RequirementMappingSet),
+    },
+}
+
+# Models whose to_dict() takes the localization options
+LOCALIZED_MODELS = (StoredLibrary, Framework, RequirementNode, ReferenceControl, RiskMatrix)
+
+
+class IncludeError(ValueError):
+    """Unknown include or include nested too deep"""
+
+
+def parse_includes(model, value):
+    """'a,b.c' -> {'a': {}, 'b': {'c': {}}}, validated against ``INCLUDES``"""
+    tree = {}
+    for path in filter(None, (part.strip() for part in (value or '').split(','))):
+        names = path.split('.')
+        if len(names) > MAX_INCLUDE_DEPTH:
+            raise IncludeError(f'Include "{path}" is nested deeper than {MAX_INCLUDE_DEPTH} levels')
+        current_model, node = model, tree
+        for name in names:
+            if name not in INCLUDES.get(current_model, {}):
+                raise IncludeError(f'Unknown include "{name}" for {current_model.__tablename__}')
+            current_model = INCLUDES[current_model][name][1]
+            node = node.setdefault(name, {})
+    return tree
+
+
+def requested_includes(model):
+    """Include tree from ?include= of the current request (raises IncludeError)"""
+    return parse_includes(model, request.args.get('include'))
+
+
+def include_options(model, tree, parent=None):
+    """Loader options for an include tree"""
+    options = []
+    for name, children in tree.items():
+        attr_name, related = INCLUDES[model][name]
+        attr = getattr(model, attr_name)
+        strategy = selectinload if attr.property.uselist else joinedload
+        loader = getattr(parent, strategy.__name__)(attr) if parent is not None else strategy(attr)
+        options.append(loader)
+        options.extend(include_options(related, children, loader))
+    return options
+
+
+def include_key(tree, prefix=''):
+    """Canonical string of an include tree, for cache keys"""
+    paths = []
+    for name in sorted(tree):
+        paths.append(prefix + name)
+        if tree[name]:
+            paths.append(include_key(tree[name], prefix + name + '.'))
+    return ','.join(paths)
+
+
+def serialize(instance, tree=None, to_dict_kwargs=None, **options):
+    """``instance.to_dict()`` plus the included related objects"""
+    kwargs = dict(to_dict_kwargs or {})
+    if isinstance(instance, LOCALIZED_MODELS):
+        kwargs.update(options)
+    data = instance.to_dict(**kwargs)
+    for name, children in (tree or {}).items():
+        value = getattr(instance, INCLUDES[type(instance)][name][0])
+        if isinstance(value, list):
+            data[name] = [serialize(item, children, **options) for item in value]
+        else:
+            data[name] = serialize(value, children, **options) if value is not None else None
+    return data
+
+
+def load_with_includes(model, instance, tree):
+    """Reload ``instance`` with the eager loaders of ``tree`` (detail routes)"""
+    if not tree:
+        return instance
+    return model.query.options(*include_options(model, tree)).filter(model.id == instance.id).one()
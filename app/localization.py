@@ -0,0 +1,89 @@
+"""Server-side resolution of translated names and descriptions
+
+Library objects carry a ``translations`` JSON with every language of every
+row. A localized view resolves the translated fields for one locale (falling
+back from ``fr-CA`` to ``fr`` to the stored text) and drops the translations
+blob, unless the client asks for it with ``?include_translations=true``.
+
+The locale comes from ``?locale=`` or else the best ``Accept-Language``
+entry. Without either, views are unchanged (stored text + translations).
+"""
+from flask import has_request_context, request
+
+TRANSLATED_FIELDS = ('name', 'description', 'annotation', 'typical_evidence')
+
+
+def normalize_locale(locale):
+    """'fr_CA' / 'FR-ca' -> 'fr-ca'; empty values -> None"""
+    if not locale:
+        return None
+    return locale.strip().replace('_', '-').lower() or None
+
+
+def requested_locale():
+    """Locale requested by the current request, or None"""
+    if not has_request_context():
+        return None
+    locale = request.args.get('locale')
+    if not locale:
+        locale = next((value for value in request.accept_languages.values() if value != '*'), None)
+    return normalize_locale(locale)
+
+
+def view_options():
+    """Keyword arguments for ``to_dict()`` matching the current request"""
+    locale = requested_locale()
+    if locale is None:
+        return {}
+    include = request.args.get('include_translations', 'false').lower() in ('true', '1', 'yes')
+    return {'locale': locale, 'include_translations': include}
+
+
+def resolve_translation(translations, locale):
+    """Translation entry for ``locale`` with language fallback, or None"""
+    if not translations or not locale:
+        return None
+    by_locale = {normalize_locale(key): value for key, value in translations.items()}
+    entry = by_locale.get(locale)
+    if entry is None and '-' in locale:
+        entry = by_locale.get(locale.split('-', 1)[0])
+    return entry if isinstance(entry, dict) else None
+
+
+def localize(data, translations, locale=None, include_translations=True):
+    """Apply the view for ``locale`` to a ``to_dict()`` payload in place"""
+    if locale is None:
+        data['translations'] = translations
+        return data
+
+    entry = resolve_translation(translations, locale)
+    if entry:
+        for field in TRANSLATED_FIELDS:
+            if field in data and entry.get(field):
+                data[field] = entry[field]
+    if include_translations:
+        data['translations'] = translations
+    else:
+        data.pop('translations', None)
+    return data
+
+
+def localize_items(items, locale=None, include_translations=True):
+    """Localize a list of YAML sub-objects (e.g. risk matrix levels)"""
+    if locale is None or not items:
+        return items
+    return [
+        localize(dict(item), item.get('translations'), locale, include_translations)
+        if isinstance(item, dict) else item
+        for item in items
+    ]
+
+
+def available_locales(*translation_blobs):
+    """Normalized locales present in any of the given translations JSONs"""
+    locales = set()
+    for translations in translation_blobs:
+        if translations:
+            locales.update(normalize_locale(key) for key in translations)
+    locales.discard(None)
+    return sorted(locales)
@@ -1,19 +1,39 @@
 # Models package
 from .user import User
-from .library import StoredLibrary, LoadedLibrary
-from .framework import Framework, RequirementNode
+from .library import StoredLibrary, StoredLibraryContent, LoadedLibrary
+from .framework import (Framework, FrameworkTreeSnapshot, RequirementNode, implementation_group_bits,
+                        implementation_group_mask)
 from .reference_control import ReferenceControl
 from .risk_matrix import RiskMatrix
 from .mapping import RequirementMappingSet, RequirementMapping
+from .sync import SyncTombstone, TRACKED_MODELS, track_deletes
+from .urn import Urn, intern_rows, intern_urn_columns, intern_urns
+from .requirement_links import (RequirementReferenceControl, RequirementThreat, REQUIREMENT_LINKS, linked_urns,
+                                linking_requirements)
+from .assessment import (ComplianceAssessment, RequirementAssessment, AssessmentSubtreeScore, RESULT_STATUSES,
+                         ROLLUP_COLUMNS, result_contribution)
+
+track_deletes(Framework, RequirementNode, ReferenceControl, RiskMatrix, RequirementMappingSet)
+intern_urn_columns(RequirementNode, urn_id='urn', parent_urn_id='parent_urn')
+intern_urn_columns(RequirementMapping, source_urn_id='source_requirement_urn', target_urn_id='target_requirement_urn')
 
 __all__ = [
     'User',
     'StoredLibrary',
+    'StoredLibraryContent',
     'LoadedLibrary',
     'Framework',
+    'FrameworkTreeSnapshot',
     'RequirementNode',
     'ReferenceControl',
     'RiskMatrix',
     'RequirementMappingSet',
     'RequirementMapping',
+    'SyncTombstone',
+    'Urn',
+    'RequirementReferenceControl',
+    'RequirementThreat',
+    'ComplianceAssessment',
+    'RequirementAssessment',
+    'AssessmentSubtreeScore',
 ]
@@ -0,0 +1,123 @@
+"""Compliance assessments of a framework, with score rollups per subtree
+
+Results are keyed on the interned requirement URN id (see app.models.urn),
+like the requirement links. Every subtree of the ``parent_urn`` hierarchy
+keeps a rollup row (``AssessmentSubtreeScore``) and the assessment itself
+keeps the whole-framework rollup, so reading a score is one row. Answers
+change rollups by deltas on the changed nodes and their ancestors only
+(see app.assessments).
+"""
+from datetime import datetime
+
+from application import db
+
+RESULT_STATUSES = ('not_assessed', 'compliant', 'partially_compliant', 'non_compliant', 'not_applicable')
+
+# Columns of ScoreRollup, moved by deltas when answers change
+ROLLUP_COLUMNS = ('answered_count', 'scored_count', 'score_sum', 'compliant_count', 'partially_compliant_count',
+                  'non_compliant_count', 'not_applicable_count')
+
+
+def result_contribution(status, score):
+    """Rollup column values contributed by one requirement result"""
+    scored = score is not None and status != 'not_applicable'
+    contribution = {
+        'answered_count': int(status not in (None, 'not_assessed')),
+        'scored_count': int(scored),
+        'score_sum': score if scored else 0,
+    }
+    for counted in ('compliant', 'partially_compliant', 'non_compliant', 'not_applicable'):
+        contribution[f'{counted}_count'] = int(status == counted)
+    return contribution
+
+
+class ScoreRollup:
+    """Rollup columns shared by assessments (whole framework) and subtree rows"""
+    answered_count = db.Column(db.Integer, nullable=False, default=0)
+    scored_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.BigInteger, nullable=False, default=0)
+    compliant_count = db.Column(db.Integer, nullable=False, default=0)
+    partially_compliant_count = db.Column(db.Integer, nullable=False, default=0)
+    non_compliant_count = db.Column(db.Integer, nullable=False, default=0)
+    not_applicable_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def score_summary(self):
+        scored_count = self.scored_count or 0
+        return {
+            'score': round(self.score_sum / scored_count, 2) if scored_count else None,
+            'scored': scored_count,
+            'answered': self.answered_count or 0,
+            'statuses': {
+                status: getattr(self, f'{status}_count') or 0
+                for status in ('compliant', 'partially_compliant', 'non_compliant', 'not_applicable')
+            }
+        }
+
+
+class ComplianceAssessment(ScoreRollup, db.Model):
+    """Assessment of a framework; its rollup covers the whole framework"""
+    __tablename__ = 'compliance_assessments'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    name = db.Column(db.String(500), nullable=False)
+    description = db.Column(db.Text)
+    framework_id = db.Column(db.String(255), db.ForeignKey('frameworks.id'), nullable=False, index=True)
+
+    # Assessable requirements of the framework when the rollups were last built
+    assessable_count = db.Column(db.Integer, nullable=False, default=0)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    framework = db.relationship('Framework', backref=db.backref('assessments', lazy='dynamic',
+                                                                cascade='all, delete-orphan'))
+    results = db.relationship('RequirementAssessment', backref='assessment', lazy='dynamic',
+                              cascade='all, delete-orphan')
+    subtree_scores = db.relationship('AssessmentSubtreeScore', lazy='dynamic', cascade='all, delete-orphan')
+
+    def score_summary(self):
+        summary = super().score_summary()
+        summary['assessable'] = self.assessable_count
+        summary['progress'] = round(self.answered_count / self.assessable_count, 4) if self.assessable_count else None
+        return summary
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'description': self.description,
+            'framework_id': self.framework_id,
+            'summary': self.score_summary(),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class RequirementAssessment(db.Model):
+    """Answer of an assessment for one assessable requirement"""
+    __tablename__ = 'requirement_assessments'
+
+    assessment_id = db.Column(db.Integer, db.ForeignKey('compliance_assessments.id'), primary_key=True)
+    requirement_urn_id = db.Column(db.Integer, db.ForeignKey('urns.id'), primary_key=True)
+    status = db.Column(db.String(30), nullable=False, default='not_assessed')
+    score = db.Column(db.Integer)
+    observation = db.Column(db.Text)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self, requirement_urn=None):
+        return {
+            'requirement_urn': requirement_urn,
+            'status': self.status,
+            'score': self.score,
+            'observation': self.observation,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class AssessmentSubtreeScore(ScoreRollup, db.Model):
+    """Rollup of the results of a requirement node and its descendants"""
+    __tablename__ = 'assessment_subtree_scores'
+
+    assessment_id = db.Column(db.Integer, db.ForeignKey('compliance_assessments.id'), primary_key=True)
+    node_urn_id = db.Column(db.Integer, db.ForeignKey('urns.id'), primary_key=True)
@@ -1,6 +1,26 @@
 """Framework and requirement models"""
 from application import db
+from app.localization import available_locales, localize, normalize_locale
+from app.cache import encode_json
+from app.models.urn import Urn
 from datetime import datetime
+import hashlib
+
+# Bit i of a requirement's ig_mask is the i-th group of its framework's implementation_groups_definition
+IG_MAX_GROUPS = 63
+
+
+def implementation_group_bits(definition):
+    """{group ref_id: bit} for an implementation_groups_definition (groups past IG_MAX_GROUPS get none)"""
+    return {group.get('ref_id'): 1 << index for index, group in enumerate((definition or [])[:IG_MAX_GROUPS])}
+
+
+def implementation_group_mask(groups, bits):
+    """OR of the bits of ``groups``; unknown groups are ignored"""
+    mask = 0
+    for group in groups or []:
+        mask |= bits.get(group, 0)
+    return mask
 
 
 class Framework(db.Model):
@@ -13,22 +33,28 @@ class Framework(db.Model):
     name = db.Column(db.String(500), nullable=False)
     description = db.Column(db.Text)
     
-    library_urn = db.Column(db.String(255), db.ForeignKey('loaded_libraries.urn'))
+    library_urn = db.Column(db.String(255), db.ForeignKey('loaded_libraries.urn'), index=True)
     
     min_score = db.Column(db.Integer)
     max_score = db.Column(db.Integer)
     scores_definition = db.Column(db.JSON)
+    implementation_groups_definition = db.Column(db.JSON)
     
     translations = db.Column(db.JSON)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relationships
     library = db.relationship('LoadedLibrary', backref='frameworks')
     requirements = db.relationship('RequirementNode', backref='framework', lazy='dynamic', cascade='all, delete-orphan')
+    tree_snapshots = db.relationship('FrameworkTreeSnapshot', backref='framework', lazy='dynamic', cascade='all, delete-orphan')
+    reference_control_links = db.relationship('RequirementReferenceControl', lazy='dynamic', cascade='all, delete-orphan')
+    threat_links = db.relationship('RequirementThreat', lazy='dynamic', cascade='all, delete-orphan')
+    # Plain list view of ``requirements`` that can be eager loaded (?include=requirements)
+    requirement_nodes = db.relationship('RequirementNode', viewonly=True, order_by='RequirementNode.order_id')
     
-    def to_dict(self, include_requirements=False):
+    def to_dict(self, include_requirements=False, locale=None, include_translations=True):
         data = {
             'id': self.id,
             'urn': self.urn,
@@ -39,51 +65,197 @@ class Framework(db.Model):
             'min_score': self.min_score,
             'max_score': self.max_score,
             'scores_definition': self.scores_definition,
-            'translations': self.translations,
+            'implementation_groups_definition': self.implementation_groups_definition,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
         
         if include_requirements:
-            data['requirements'] = [req.to_dict() for req in self.requirements]
+            data['requirements'] = [req.to_dict(locale=locale, include_translations=include_translations)
+                                    for req in self.requirement_nodes]
             
-        return data
+        return localize(data, self.translations, locale, include_translations)
     
-    def get_tree(self):
+    def get_tree(self, locale=None, include_translations=True, nodes=None):
         """Get hierarchical tree of requirements"""
-        # Get root requirements (no parent)
-        roots = RequirementNode.query.filter_by(
-            framework_id=self.id,
-            parent_urn=None
-        ).order_by(RequirementNode.order_id).all()
+        # One query for the whole framework, assembled in memory
+        if nodes is None:
+            nodes = RequirementNode.query.filter_by(
+                framework_id=self.id
+            ).order_by(RequirementNode.order_id).all()
+        
+        children_by_parent = {}
+        for node in nodes:
+            children_by_parent.setdefault(node.parent_urn, []).append(node)
         
         def build_tree(node):
-            children = RequirementNode.query.filter_by(
-                framework_id=self.id,
-                parent_urn=node.urn
-            ).order_by(RequirementNode.order_id).all()
-            
-            tree = node.to_dict()
+            tree = node.to_dict(locale=locale, include_translations=include_translations)
+            children = children_by_parent.get(node.urn)
             if children:
                 tree['children'] = [build_tree(child) for child in children]
             return tree
         
-        return [build_tree(root) for root in roots]
+        return [build_tree(root) for root in children_by_parent.get(None, [])]
+    
+    def implementation_group_mask(self, groups):
+        """Bitmask of ``groups`` (ref_ids of implementation_groups_definition) for ig_mask filters"""
+        return implementation_group_mask(groups, implementation_group_bits(self.implementation_groups_definition))
+    
+    @classmethod
+    def implementation_group_masks(cls, groups, framework_id=None):
+        """{framework id: bitmask of ``groups``} for every framework (or one), from a single query"""
+        query = db.select(cls.id, cls.implementation_groups_definition)
+        if framework_id is not None:
+            query = query.where(cls.id == framework_id)
+        return {
+            framework_id: implementation_group_mask(groups, implementation_group_bits(definition))
+            for framework_id, definition in db.session.execute(query)
+        }
+    
+    def implementation_group_nodes(self, groups):
+        """Requirement nodes in one of ``groups`` and their ancestors, in tree order"""
+        return RequirementNode.query.filter(
+            RequirementNode.framework_id == self.id,
+            RequirementNode.in_implementation_groups({self.id: self.implementation_group_mask(groups)})
+        ).order_by(RequirementNode.order_id).all()
+    
+    @property
+    def base_locale(self):
+        """Locale of the stored (untranslated) text"""
+        return normalize_locale(self.library.locale if self.library else None) or 'en'
+    
+    def _tree_views(self, nodes):
+        """(snapshot locale, view locale, is_default) of every snapshot of the framework"""
+        base_locale = self.base_locale
+        locales = available_locales(self.translations, *(node.translations for node in nodes))
+        return [('', None, False)] + [(base_locale, base_locale, True)] + [
+            (locale, locale, False) for locale in locales if locale != base_locale
+        ]
+    
+    def _encode_tree_view(self, snapshot, nodes, locale):
+        """Encode the view of ``locale`` (full view when None) into ``snapshot``"""
+        options = {'locale': locale, 'include_translations': locale is None}
+        framework_json = encode_json(self.to_dict(**options)).rstrip()
+        tree_json = encode_json(self.get_tree(nodes=nodes, **options)).rstrip()
+        snapshot.version = hashlib.sha1(framework_json + b'\0' + tree_json).hexdigest()
+        snapshot.framework_json = framework_json
+        snapshot.tree_json = tree_json
+        snapshot.updated_at = datetime.utcnow()
+    
+    def refresh_tree_snapshots(self):
+        """Serialize the framework and its tree into snapshot rows
+        
+        Writes the full view (locale '') and one localized view per locale
+        found in the framework's translations, the base locale being the
+        fallback. Call after the framework or its requirements change
+        (import, update); a version only moves when its encoded content does.
+        """
+        nodes = RequirementNode.query.filter_by(
+            framework_id=self.id
+        ).order_by(RequirementNode.order_id).all()
+        
+        existing = {snapshot.locale: snapshot for snapshot in self.tree_snapshots}
+        for key, locale, is_default in self._tree_views(nodes):
+            snapshot = existing.pop(key, None)
+            if snapshot is None:
+                snapshot = FrameworkTreeSnapshot(framework_id=self.id, locale=key)
+                db.session.add(snapshot)
+            snapshot.is_default = is_default
+            self._encode_tree_view(snapshot, nodes, locale)
+        
+        # Locales whose translations were removed
+        for snapshot in existing.values():
+            db.session.delete(snapshot)
+    
+    def build_tree_snapshot(self, locale=None):
+        """Unsaved snapshot of the best view for ``locale``, for frameworks without snapshot rows
+        
+        Picks the view as FrameworkTreeSnapshot.lookup_query would and
+        encodes only that one. Nothing is added to the session: tree reads
+        stay read-only, the rows are written by refresh_tree_snapshots.
+        """
+        nodes = RequirementNode.query.filter_by(
+            framework_id=self.id
+        ).order_by(RequirementNode.order_id).all()
+        
+        views = self._tree_views(nodes)
+        if locale is None:
+            view = views[0]
+        else:
+            candidates = [locale] + ([locale.split('-', 1)[0]] if '-' in locale else [])
+            by_key = {key: (key, view_locale, is_default) for key, view_locale, is_default in views}
+            view = next((by_key[candidate] for candidate in candidates if candidate in by_key), views[1])
+        
+        key, view_locale, is_default = view
+        snapshot = FrameworkTreeSnapshot(framework_id=self.id, locale=key, is_default=is_default)
+        self._encode_tree_view(snapshot, nodes, view_locale)
+        return snapshot
+
+
+class FrameworkTreeSnapshot(db.Model):
+    """Pre-encoded framework tree, served as-is by the tree endpoints"""
+    __tablename__ = 'framework_tree_snapshots'
+    
+    framework_id = db.Column(db.String(255), db.ForeignKey('frameworks.id', ondelete='CASCADE'), primary_key=True)
+    locale = db.Column(db.String(10), primary_key=True, default='')  # '' = full view with all translations
+    is_default = db.Column(db.Boolean, default=False)  # localized fallback (base locale)
+    version = db.Column(db.String(40), nullable=False)  # sha1 of the encoded content
+    
+    framework_json = db.Column(db.LargeBinary, nullable=False)
+    tree_json = db.Column(db.LargeBinary, nullable=False)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @classmethod
+    def lookup_query(cls, locale=None):
+        """Query for the best snapshot of a locale (full view when None)
+        
+        Filters on locale fallbacks (fr-ca, fr, base locale) and orders the
+        best match first, so callers add their framework filter and .first().
+        """
+        if locale is None:
+            return cls.query.filter(cls.locale == '')
+        candidates = [locale]
+        if '-' in locale:
+            candidates.append(locale.split('-', 1)[0])
+        return cls.query.filter(
+            db.or_(cls.locale.in_(candidates), cls.is_default.is_(True))
+        ).order_by(
+            db.case({candidate: index for index, candidate in enumerate(candidates)},
+                    value=cls.locale, else_=len(candidates))
+        )
+    
+    def framework_tree_body(self):
+        """Body of the framework tree endpoint: {"framework": ..., "tree": ...}"""
+        return b'{"framework":' + self.framework_json + b',"tree":' + self.tree_json + b'}\n'
+    
+    def tree_body(self):
+        """Body of the loaded library tree endpoint: {"tree": ...}"""
+        return b'{"tree":' + self.tree_json + b'}\n'
 
 
 class RequirementNode(db.Model):
     """Individual requirements within frameworks"""
     __tablename__ = 'requirement_nodes'
+    __table_args__ = (
+        # Whole-framework reads (trees, snapshots) and children of a node, both in order
+        db.Index('ix_requirement_nodes_framework_id_order_id', 'framework_id', 'order_id'),
+        db.Index('ix_requirement_nodes_parent_urn_id_order_id', 'parent_urn_id', 'order_id'),
+    )
     
     id = db.Column(db.String(255), primary_key=True)
-    urn = db.Column(db.String(255), unique=True, index=True)
-    ref_id = db.Column(db.String(100))
+    urn = db.Column(db.String(255))  # Looked up and unique through urn_id, see urn_in()
+    ref_id = db.Column(db.String(100), index=True)
     name = db.Column(db.String(500))
     description = db.Column(db.Text)
     
     framework_id = db.Column(db.String(255), db.ForeignKey('frameworks.id'), nullable=False)
     parent_urn = db.Column(db.String(255))  # Store parent URN but don't enforce FK constraint
     
+    # Interned urn / parent_urn (see app.models.urn), set on flush
+    urn_id = db.Column(db.Integer, db.ForeignKey('urns.id'), unique=True, index=True)
+    parent_urn_id = db.Column(db.Integer, db.ForeignKey('urns.id'))
+    
     order_id = db.Column(db.Integer, default=0)
     level = db.Column(db.Integer, default=0)
     
@@ -91,21 +263,45 @@ class RequirementNode(db.Model):
     assessable = db.Column(db.Boolean, default=True)
     maturity = db.Column(db.Integer)
     
+    # Implementation groups as listed, and as bits of the framework's definition (set at import):
+    # ig_mask for the node itself, ig_subtree_mask for the node and its descendants
+    implementation_groups = db.Column(db.JSON)
+    ig_mask = db.Column(db.BigInteger, nullable=False, default=0)
+    ig_subtree_mask = db.Column(db.BigInteger, nullable=False, default=0)
+    
     translations = db.Column(db.JSON)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    
+    @classmethod
+    def urn_in(cls, urns):
+        """Filter on URNs through the unique urn_id index (``urn`` itself is not indexed)"""
+        return cls.urn_id.in_(db.select(Urn.id).where(Urn.urn.in_(urns)))
+    
+    @classmethod
+    def in_implementation_groups(cls, masks):
+        """Filter on {framework id: group mask}: nodes in one of the groups and their ancestors
+        
+        A plain bitwise test on ig_subtree_mask, so ancestors are kept without
+        walking the tree.
+        """
+        return db.or_(db.false(), *(
+            db.and_(cls.framework_id == framework_id, cls.ig_subtree_mask.bitwise_and(mask) != 0)
+            for framework_id, mask in masks.items() if mask
+        ))
     
     def get_parent(self):
         """Get parent requirement by URN"""
-        if self.parent_urn:
-            return RequirementNode.query.filter_by(urn=self.parent_urn).first()
+        if self.parent_urn_id:
+            return RequirementNode.query.filter_by(urn_id=self.parent_urn_id).first()
         return None
     
     def get_children(self):
         """Get child requirements"""
-        return RequirementNode.query.filter_by(parent_urn=self.urn).order_by(RequirementNode.order_id).all()
+        return RequirementNode.query.filter_by(parent_urn_id=self.urn_id).order_by(RequirementNode.order_id).all()
     
-    def to_dict(self, include_children=False):
+    def to_dict(self, include_children=False, locale=None, include_translations=True):
         data = {
             'id': self.id,
             'urn': self.urn,
@@ -118,12 +314,15 @@ class RequirementNode(db.Model):
             'level': self.level,
             'assessable': self.assessable,
             'maturity': self.maturity,
-            'translations': self.translations,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'implementation_groups': self.implementation_groups,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
         
         if include_children:
             children = self.get_children()
-            data['children'] = [child.to_dict(include_children=True) for child in children]
+            data['children'] = [child.to_dict(include_children=True, locale=locale,
+                                              include_translations=include_translations)
+                                for child in children]
             
-        return data
+        return localize(data, self.translations, locale, include_translations)
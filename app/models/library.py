@@ -1,12 +1,23 @@
 """Library models for framework library management"""
 from application import db
+from app.compression import compress, content_hash, decompress, encode_document
+from app.catalog import catalog_loaded_urns
+from app.localization import localize
 from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.orm.attributes import set_committed_value
 import json
 
 
 class StoredLibrary(db.Model):
     """Catalog of available libraries (not yet loaded)"""
     __tablename__ = 'stored_libraries'
+    __identity_cache_exclude__ = ('legacy_content',)  # large; reloaded on access
+    __table_args__ = (
+        # ?is_loaded=true: the few loaded rows out of the whole catalog
+        db.Index('ix_stored_libraries_loaded', 'urn',
+                 postgresql_where=db.text('is_loaded'), sqlite_where=db.text('is_loaded = 1')),
+    )
     
     id = db.Column(db.String(255), primary_key=True)  # URN
     urn = db.Column(db.String(255), unique=True, nullable=False, index=True)
@@ -23,14 +34,53 @@ class StoredLibrary(db.Model):
     is_published = db.Column(db.Boolean, default=True)
     object_type = db.Column(db.String(100))  # framework, reference_controls, risk_matrix, mapping
     
-    # Full YAML content stored as JSON
-    content = db.Column(db.JSON)
+    # Full YAML content lives compressed in stored_library_contents (see
+    # ``content``); this column only holds rows written before that (the
+    # a7c3e5f19b42 migration moves them) and is never loaded by catalog queries
+    legacy_content = db.deferred(db.Column('content', db.JSON))
     translations = db.Column(db.JSON)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    def to_dict(self, include_content=False):
+    # Loaded only when content is accessed
+    content_blob = db.relationship('StoredLibraryContent', uselist=False, cascade='all, delete-orphan')
+    
+    @property
+    def content_json(self):
+        """Content as compact JSON bytes, without parsing it"""
+        if self.content_blob is not None:
+            return self.content_blob.raw()
+        if self.legacy_content is not None:
+            return encode_document(self.legacy_content)
+        return None
+    
+    @property
+    def content(self):
+        """Parsed library content (decompressed once per instance)"""
+        blob = self.content_blob
+        if blob is None:
+            return self.legacy_content
+        cached = self.__dict__.get('_content_cache')
+        if cached is None or cached[0] != blob.content_hash:
+            cached = (blob.content_hash, json.loads(blob.raw()))
+            self.__dict__['_content_cache'] = cached
+        return cached[1]
+    
+    @content.setter
+    def content(self, document):
+        self.__dict__.pop('_content_cache', None)
+        if document is None:
+            self.content_blob = None
+            self.legacy_content = None
+            return
+        raw = encode_document(document)
+        if self.content_blob is None:
+            self.content_blob = StoredLibraryContent()
+        self.content_blob.store(raw)
+        self.legacy_content = None
+    
+    def to_dict(self, include_content=False, locale=None, include_translations=True):
         data = {
             'id': self.id,
             'urn': self.urn,
@@ -46,7 +96,6 @@ class StoredLibrary(db.Model):
             'is_loaded': self.is_loaded,
             'is_published': self.is_published,
             'object_type': self.object_type,
-            'translations': self.translations,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -54,7 +103,41 @@ class StoredLibrary(db.Model):
         if include_content and self.content:
             data['content'] = self.content
             
-        return data
+        return localize(data, self.translations, locale, include_translations)
+
+
+@event.listens_for(StoredLibrary, 'load')
+def _loaded_state_from_primary(library, context):
+    """Rows read from the bundled catalog take is_loaded from the primary database"""
+    loaded_urns = catalog_loaded_urns()
+    if loaded_urns is not None:
+        set_committed_value(library, 'is_loaded', library.urn in loaded_urns)
+
+
+class StoredLibraryContent(db.Model):
+    """Compressed content of a stored library, kept out of catalog rows"""
+    __tablename__ = 'stored_library_contents'
+    
+    library_id = db.Column(db.String(255), db.ForeignKey('stored_libraries.id', ondelete='CASCADE'), primary_key=True)
+    codec = db.Column(db.String(10), nullable=False)  # zstd or gzip
+    content_hash = db.Column(db.String(64), nullable=False, index=True)  # sha256 of the uncompressed JSON
+    size = db.Column(db.Integer, nullable=False)
+    compressed_size = db.Column(db.Integer, nullable=False)
+    data = db.deferred(db.Column(db.LargeBinary, nullable=False))
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def store(self, raw):
+        digest = content_hash(raw)
+        if digest == self.content_hash:
+            return
+        self.codec, self.data = compress(raw)
+        self.content_hash = digest
+        self.size = len(raw)
+        self.compressed_size = len(self.data)
+    
+    def raw(self):
+        return decompress(self.codec, self.data)
 
 
 class LoadedLibrary(db.Model):
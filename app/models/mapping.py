@@ -13,7 +13,7 @@ class RequirementMappingSet(db.Model):
     name = db.Column(db.String(500), nullable=False)
     description = db.Column(db.Text)
     
-    library_urn = db.Column(db.String(255), db.ForeignKey('loaded_libraries.urn'))
+    library_urn = db.Column(db.String(255), db.ForeignKey('loaded_libraries.urn'), index=True)
     
     source_framework_urn = db.Column(db.String(255))
     target_framework_urn = db.Column(db.String(255))
@@ -21,11 +21,13 @@ class RequirementMappingSet(db.Model):
     translations = db.Column(db.JSON)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relationships
     library = db.relationship('LoadedLibrary', backref='mapping_sets')
     mappings = db.relationship('RequirementMapping', backref='mapping_set', lazy='dynamic', cascade='all, delete-orphan')
+    # Plain list view of ``mappings`` that can be eager loaded (?include=mappings)
+    mapping_list = db.relationship('RequirementMapping', viewonly=True)
     
     def to_dict(self, include_mappings=False):
         data = {
@@ -43,7 +45,7 @@ class RequirementMappingSet(db.Model):
         }
         
         if include_mappings:
-            data['mappings'] = [m.to_dict() for m in self.mappings]
+            data['mappings'] = [m.to_dict() for m in self.mapping_list]
             
         return data
 
@@ -51,13 +53,21 @@ class RequirementMappingSet(db.Model):
 class RequirementMapping(db.Model):
     """Individual requirement-to-requirement mapping"""
     __tablename__ = 'requirement_mappings'
+    __table_args__ = (
+        db.UniqueConstraint('mapping_set_id', 'source_urn_id', 'target_urn_id',
+                            name='uq_requirement_mappings_set_source_target'),
+    )
     
-    id = db.Column(db.String(255), primary_key=True)
-    mapping_set_id = db.Column(db.String(255), db.ForeignKey('requirement_mapping_sets.id'), nullable=False)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    mapping_set_id = db.Column(db.String(255), db.ForeignKey('requirement_mapping_sets.id'), nullable=False, index=True)
     
     source_requirement_urn = db.Column(db.String(255))
     target_requirement_urn = db.Column(db.String(255))
     
+    # Interned source / target URNs (see app.models.urn), set on flush
+    source_urn_id = db.Column(db.Integer, db.ForeignKey('urns.id'), index=True)
+    target_urn_id = db.Column(db.Integer, db.ForeignKey('urns.id'), index=True)
+    
     relationship_type = db.Column(db.String(50))  # equal, subset, superset, related, similar
     strength = db.Column(db.Integer)  # 0-100 mapping confidence
     
@@ -65,9 +75,14 @@ class RequirementMapping(db.Model):
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    @property
+    def public_id(self):
+        """API id: derived from the set and the two URNs, stable across reloads (the primary key is not)"""
+        return f'{self.mapping_set_id}:{self.source_requirement_urn}:{self.target_requirement_urn}'
+    
     def to_dict(self):
         return {
-            'id': self.id,
+            'id': self.public_id,
             'mapping_set_id': self.mapping_set_id,
             'source_requirement_urn': self.source_requirement_urn,
             'target_requirement_urn': self.target_requirement_urn,
@@ -1,5 +1,6 @@
 """Reference control/measure models"""
 from application import db
+from app.localization import localize
 from datetime import datetime
 
 
@@ -9,11 +10,11 @@ class ReferenceControl(db.Model):
     
     id = db.Column(db.String(255), primary_key=True)
     urn = db.Column(db.String(255), unique=True, index=True)
-    ref_id = db.Column(db.String(100))
+    ref_id = db.Column(db.String(100), index=True)
     name = db.Column(db.String(500), nullable=False)
     description = db.Column(db.Text)
     
-    library_urn = db.Column(db.String(255), db.ForeignKey('loaded_libraries.urn'))
+    library_urn = db.Column(db.String(255), db.ForeignKey('loaded_libraries.urn'), index=True)
     
     category = db.Column(db.String(100))  # policy, process, technical, organizational
     csf_function = db.Column(db.String(50))  # govern, identify, protect, detect, respond, recover
@@ -26,13 +27,13 @@ class ReferenceControl(db.Model):
     translations = db.Column(db.JSON)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relationships
     library = db.relationship('LoadedLibrary', backref='reference_controls')
     
-    def to_dict(self):
-        return {
+    def to_dict(self, locale=None, include_translations=True):
+        data = {
             'id': self.id,
             'urn': self.urn,
             'ref_id': self.ref_id,
@@ -44,7 +45,7 @@ class ReferenceControl(db.Model):
             'annotation': self.annotation,
             'typical_evidence': self.typical_evidence,
             'implementation_guidance': self.implementation_guidance,
-            'translations': self.translations,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        return localize(data, self.translations, locale, include_translations)
@@ -0,0 +1,67 @@
+"""Requirement -> reference control / threat links (the URN lists of requirement nodes)
+
+Both ends are interned URN ids (see app.models.urn), so a requirement can
+reference controls and threats of libraries that are not loaded. The
+primary key serves forward lookups (requirement -> targets) and a second
+index the reverse ones (target -> requirements).
+"""
+from application import db
+from app.models.framework import RequirementNode
+from app.models.urn import Urn
+
+
+class RequirementReferenceControl(db.Model):
+    """Reference control listed by a requirement node"""
+    __tablename__ = 'requirement_reference_controls'
+    __table_args__ = (
+        db.Index('ix_requirement_reference_controls_reverse', 'reference_control_urn_id', 'requirement_urn_id'),
+    )
+
+    requirement_urn_id = db.Column(db.Integer, db.ForeignKey('urns.id'), primary_key=True)
+    reference_control_urn_id = db.Column(db.Integer, db.ForeignKey('urns.id'), primary_key=True)
+    framework_id = db.Column(db.String(255), db.ForeignKey('frameworks.id'), nullable=False, index=True)
+
+
+class RequirementThreat(db.Model):
+    """Threat listed by a requirement node"""
+    __tablename__ = 'requirement_threats'
+    __table_args__ = (
+        db.Index('ix_requirement_threats_reverse', 'threat_urn_id', 'requirement_urn_id'),
+    )
+
+    requirement_urn_id = db.Column(db.Integer, db.ForeignKey('urns.id'), primary_key=True)
+    threat_urn_id = db.Column(db.Integer, db.ForeignKey('urns.id'), primary_key=True)
+    framework_id = db.Column(db.String(255), db.ForeignKey('frameworks.id'), nullable=False, index=True)
+
+
+# Requirement node field in library content -> (link model, target id column)
+REQUIREMENT_LINKS = {
+    'reference_controls': (RequirementReferenceControl, RequirementReferenceControl.reference_control_urn_id),
+    'threats': (RequirementThreat, RequirementThreat.threat_urn_id),
+}
+
+
+def linked_urns(field, requirement_urn_ids):
+    """{requirement URN id: [target URNs]} for the ``field`` links of the requirements (one query)"""
+    model, target_column = REQUIREMENT_LINKS[field]
+    linked = {}
+    if not requirement_urn_ids:
+        return linked
+    rows = db.session.execute(
+        db.select(model.requirement_urn_id, Urn.urn)
+        .join(Urn, Urn.id == target_column)
+        .where(model.requirement_urn_id.in_(requirement_urn_ids))
+        .order_by(model.requirement_urn_id, Urn.urn)
+    )
+    for requirement_urn_id, urn in rows:
+        linked.setdefault(requirement_urn_id, []).append(urn)
+    return linked
+
+
+def linking_requirements(field, target_urn):
+    """Query of the requirement nodes whose ``field`` links list ``target_urn``"""
+    model, target_column = REQUIREMENT_LINKS[field]
+    return (RequirementNode.query
+            .join(model, model.requirement_urn_id == RequirementNode.urn_id)
+            .join(Urn, Urn.id == target_column)
+            .filter(Urn.urn == target_urn))
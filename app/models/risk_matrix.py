@@ -1,5 +1,6 @@
 """Risk matrix models"""
 from application import db
+from app.localization import localize, localize_items
 from datetime import datetime
 
 
@@ -13,7 +14,7 @@ class RiskMatrix(db.Model):
     name = db.Column(db.String(500), nullable=False)
     description = db.Column(db.Text)
     
-    library_urn = db.Column(db.String(255), db.ForeignKey('loaded_libraries.urn'))
+    library_urn = db.Column(db.String(255), db.ForeignKey('loaded_libraries.urn'), index=True)
     
     # Matrix definition as JSON
     probability = db.Column(db.JSON)  # List of probability levels
@@ -26,25 +27,25 @@ class RiskMatrix(db.Model):
     translations = db.Column(db.JSON)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # Relationships
     library = db.relationship('LoadedLibrary', backref='risk_matrices')
     
-    def to_dict(self):
-        return {
+    def to_dict(self, locale=None, include_translations=True):
+        data = {
             'id': self.id,
             'urn': self.urn,
             'ref_id': self.ref_id,
             'name': self.name,
             'description': self.description,
             'library_urn': self.library_urn,
-            'probability': self.probability,
-            'impact': self.impact,
+            'probability': localize_items(self.probability, locale, include_translations),
+            'impact': localize_items(self.impact, locale, include_translations),
             'grid': self.grid,
-            'risk_levels': self.risk_levels,
+            'risk_levels': localize_items(self.risk_levels, locale, include_translations),
             'is_enabled': self.is_enabled,
-            'translations': self.translations,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        return localize(data, self.translations, locale, include_translations)
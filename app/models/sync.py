@@ -0,0 +1,45 @@
+"""Tombstones of deleted library objects, for the delta sync feed"""
+from application import db
+from sqlalchemy import event
+from datetime import datetime
+
+# Models whose ORM deletes leave tombstones (see track_deletes)
+TRACKED_MODELS = set()
+
+
+class SyncTombstone(db.Model):
+    """Deleted object of a synced collection"""
+    __tablename__ = 'sync_tombstones'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    object_type = db.Column(db.String(50), nullable=False)  # table name of the deleted object
+    object_id = db.Column(db.String(255), nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    @classmethod
+    def record(cls, connection, model, object_ids):
+        """Insert tombstones for ``object_ids`` of ``model`` (bulk deletes bypass the ORM events)"""
+        if not object_ids:
+            return
+        now = datetime.utcnow()
+        connection.execute(cls.__table__.insert(), [
+            {'object_type': model.__tablename__, 'object_id': object_id, 'deleted_at': now}
+            for object_id in object_ids
+        ])
+
+    def to_dict(self):
+        return {
+            'object_type': self.object_type,
+            'object_id': self.object_id,
+            'deleted_at': self.deleted_at.isoformat() if self.deleted_at else None
+        }
+
+
+def track_deletes(*models):
+    """Write a tombstone whenever the ORM deletes a row of one of ``models``"""
+    def after_delete(mapper, connection, target):
+        SyncTombstone.record(connection, mapper.class_, [target.id])
+
+    for model in models:
+        event.listen(model, 'after_delete', after_delete)
+        TRACKED_MODELS.add(model)
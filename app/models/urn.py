@@ -0,0 +1,91 @@
+"""URN dictionary: compact integer ids for the URNs of library objects
+
+High-cardinality tables (requirement nodes, requirement mappings) store the
+interned id next to each URN column and index and join on the integer; the
+API keeps exposing URNs. Ids are never reused: URNs of deleted objects stay
+in the dictionary.
+"""
+from itertools import chain
+
+from application import db
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+# model -> {id column: URN column}, see intern_urn_columns
+URN_COLUMNS = {}
+
+INTERN_BATCH = 500
+
+# INSERT ... ON CONFLICT DO NOTHING, so concurrent writers can intern the same URN
+_INSERT_IGNORING_CONFLICTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+class Urn(db.Model):
+    """Interned URN"""
+    __tablename__ = 'urns'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    urn = db.Column(db.String(255), unique=True, nullable=False, index=True)
+
+
+def _lookup(connection, urns):
+    ids = {}
+    urns = sorted(urns)
+    for start in range(0, len(urns), INTERN_BATCH):
+        batch = urns[start:start + INTERN_BATCH]
+        ids.update(connection.execute(db.select(Urn.urn, Urn.id).where(Urn.urn.in_(batch))).all())
+    return ids
+
+
+def intern_urns(connection, urns):
+    """{urn: id} for ``urns``, adding the ones not in the dictionary yet"""
+    urns = {urn for urn in urns if urn}
+    if not urns:
+        return {}
+    ids = _lookup(connection, urns)
+    missing = sorted(urns - ids.keys())
+    if missing:
+        insert = _INSERT_IGNORING_CONFLICTS.get(connection.dialect.name)
+        statement = insert(Urn).on_conflict_do_nothing() if insert else db.insert(Urn)
+        for start in range(0, len(missing), INTERN_BATCH):
+            connection.execute(statement, [{'urn': urn} for urn in missing[start:start + INTERN_BATCH]])
+        ids.update(_lookup(connection, missing))
+    return ids
+
+
+def intern_rows(connection, model, rows):
+    """Fill the URN id columns of ``model`` in row dicts (for bulk inserts and updates)"""
+    columns = URN_COLUMNS.get(model)
+    if not columns or not rows:
+        return rows
+    present = {id_column: urn_column for id_column, urn_column in columns.items() if urn_column in rows[0]}
+    ids = intern_urns(connection, (row.get(urn_column) for row in rows for urn_column in present.values()))
+    return [
+        dict(row, **{id_column: ids.get(row.get(urn_column)) for id_column, urn_column in present.items()})
+        for row in rows
+    ]
+
+
+def _intern_pending(session, flush_context, instances):
+    pending = [obj for obj in chain(session.new, session.dirty) if type(obj) in URN_COLUMNS]
+    if not pending:
+        return
+    ids = intern_urns(session.connection(), (
+        getattr(obj, urn_column) for obj in pending for urn_column in URN_COLUMNS[type(obj)].values()
+    ))
+    for obj in pending:
+        for id_column, urn_column in URN_COLUMNS[type(obj)].items():
+            value = ids.get(getattr(obj, urn_column))
+            if getattr(obj, id_column) != value:
+                setattr(obj, id_column, value)
+
+
+def intern_urn_columns(model, **columns):
+    """Keep ``model``'s id columns (keywords) in line with their URN columns (values) on flush"""
+    if not URN_COLUMNS:
+        event.listen(Session, 'before_flush', _intern_pending)
+    URN_COLUMNS[model] = columns
@@ -0,0 +1,131 @@
+"""Items related to requirement nodes, loaded in batches
+
+``related_items(nodes)`` gathers, for any number of requirement nodes, their
+ancestors (root first), children, mapped requirements in other
+frameworks (both directions) and listed reference control / threat URNs. Each kind of item is one loader in
+``RELATED_LOADERS``, and every loader runs a fixed number of set-based
+queries for all nodes at once (on the interned URN ids, see
+``app.models.urn``), so the query count does not grow with the number of
+nodes or the depth of the tree.
+"""
+from sqlalchemy.orm import aliased
+
+from application import db
+from app.models import RequirementMapping, RequirementNode, linked_urns
+
+# name -> loader(nodes, options) -> {node id: items}; the name is the key in the payload
+RELATED_LOADERS = {}
+
+
+def related_loader(name):
+    def decorator(loader):
+        RELATED_LOADERS[name] = loader
+        return loader
+    return decorator
+
+
+@related_loader('ancestors')
+def load_ancestors(nodes, options):
+    """Parent chains, with one recursive query over parent_urn_id and one by id"""
+    parent_ids = {node.parent_urn_id for node in nodes if node.parent_urn_id}
+    by_urn_id = {}
+    if parent_ids:
+        chain = (db.select(RequirementNode.id, RequirementNode.parent_urn_id)
+                 .where(RequirementNode.urn_id.in_(parent_ids))
+                 .cte('ancestors', recursive=True))
+        parent = aliased(RequirementNode)
+        chain = chain.union(db.select(parent.id, parent.parent_urn_id)
+                            .join(chain, parent.urn_id == chain.c.parent_urn_id))
+        # Rows by primary key in a second query: joining the CTE back to
+        # requirement_nodes makes PostgreSQL hash the whole table
+        ancestor_ids = db.session.execute(db.select(chain.c.id)).scalars().all()
+        ancestors = RequirementNode.query.filter(RequirementNode.id.in_(ancestor_ids)).all() if ancestor_ids else []
+        by_urn_id = {ancestor.urn_id: ancestor for ancestor in ancestors}
+
+    related = {}
+    for node in nodes:
+        items = []
+        parent = by_urn_id.get(node.parent_urn_id)
+        while parent is not None and len(items) < len(by_urn_id):  # guards against cycles
+            items.append(parent.to_dict(**options))
+            parent = by_urn_id.get(parent.parent_urn_id)
+        related[node.id] = items[::-1]
+    return related
+
+
+@related_loader('children')
+def load_children(nodes, options):
+    """Direct children in order, with one query on (parent_urn_id, order_id)"""
+    urn_ids = {node.urn_id for node in nodes if node.urn_id}
+    children = {}
+    if urn_ids:
+        rows = RequirementNode.query.filter(RequirementNode.parent_urn_id.in_(urn_ids)).order_by(
+            RequirementNode.parent_urn_id, RequirementNode.order_id)
+        for child in rows:
+            children.setdefault(child.parent_urn_id, []).append(child.to_dict(**options))
+    return {node.id: children.get(node.urn_id, []) for node in nodes}
+
+
+@related_loader('mappings')
+def load_mappings(nodes, options):
+    """Mapped requirements in both directions: two mapping queries and one for the other ends"""
+    urn_ids = {node.urn_id for node in nodes if node.urn_id}
+    if not urn_ids:
+        return {node.id: [] for node in nodes}
+    outgoing = RequirementMapping.query.filter(RequirementMapping.source_urn_id.in_(urn_ids)).order_by(
+        RequirementMapping.id).all()
+    incoming = RequirementMapping.query.filter(RequirementMapping.target_urn_id.in_(urn_ids)).order_by(
+        RequirementMapping.id).all()
+
+    other_ids = {m.target_urn_id for m in outgoing} | {m.source_urn_id for m in incoming}
+    others = {}
+    if other_ids:
+        others = {
+            other.urn_id: other.to_dict(**options)
+            for other in RequirementNode.query.filter(RequirementNode.urn_id.in_(other_ids))
+        }
+
+    mappings = {}
+    for direction, rows, own, other_id, other_urn in (
+        ('outgoing', outgoing, 'source_urn_id', 'target_urn_id', 'target_requirement_urn'),
+        ('incoming', incoming, 'target_urn_id', 'source_urn_id', 'source_requirement_urn'),
+    ):
+        for mapping in rows:
+            mappings.setdefault(getattr(mapping, own), []).append({
+                'direction': direction,
+                'mapping_set_id': mapping.mapping_set_id,
+                'relationship_type': mapping.relationship_type,
+                'strength': mapping.strength,
+                'urn': getattr(mapping, other_urn),
+                # None when the other framework is not loaded
+                'requirement': others.get(getattr(mapping, other_id)),
+            })
+    return {node.id: mappings.get(node.urn_id, []) for node in nodes}
+
+
+def _linked_urns(field, nodes):
+    linked = linked_urns(field, [node.urn_id for node in nodes if node.urn_id])
+    return {node.id: linked.get(node.urn_id, []) for node in nodes}
+
+
+@related_loader('reference_controls')
+def load_reference_controls(nodes, options):
+    """Reference control URNs, with one query on the link table"""
+    return _linked_urns('reference_controls', nodes)
+
+
+@related_loader('threats')
+def load_threats(nodes, options):
+    """Threat URNs, with one query on the link table"""
+    return _linked_urns('threats', nodes)
+
+
+def related_items(nodes, options=None):
+    """{node id: payload} with the node and its related items for each of ``nodes``"""
+    options = options or {}
+    loaded = {name: loader(nodes, options) for name, loader in RELATED_LOADERS.items()}
+    return {
+        node.id: dict({'requirement': node.to_dict(**options)},
+                      **{name: items[node.id] for name, items in loaded.items()})
+        for node in nodes
+    }
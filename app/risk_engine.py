@@ -0,0 +1,164 @@
+"""Vectorized risk matrix evaluation
+
+A ``RiskMatrix`` stores its probability and impact scales and the grid of
+risk levels (``grid[probability][impact]``) as JSON. ``compiled_matrix()``
+turns them into a dense NumPy lookup table once per matrix version
+(``updated_at``), kept in a small per-process LRU, so scoring any number of
+scenarios is a single fancy-indexing call and the aggregates are bincounts.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Compiled matrices kept per process
+MAX_COMPILED_MATRICES = 256
+
+# Grid cells without a level
+UNRATED = -1
+
+
+class InvalidScenarios(ValueError):
+    """Scenario indexes that are not integers or fall outside the matrix scales"""
+
+
+def _is_index(value):
+    # JSON ints only: an int64 cast would truncate 1.5 and turn true into 1
+    return type(value) is int
+
+
+def _index_array(values, message):
+    """1-D int64 array of a list of ints or of an integer NumPy array"""
+    if isinstance(values, np.ndarray):
+        if values.dtype.kind not in 'iu':
+            raise InvalidScenarios(message)
+        return values.astype(np.int64, copy=False).ravel()
+    if not isinstance(values, (list, tuple)) or not all(_is_index(value) for value in values):
+        raise InvalidScenarios(message)
+    try:
+        return np.array(values, dtype=np.int64)
+    except OverflowError:
+        raise InvalidScenarios(message)
+
+
+def split_scenarios(scenarios):
+    """Probability and impact index arrays of [[probability, impact], ...]"""
+    message = 'scenarios must be [probability, impact] pairs of integer indexes'
+    if not isinstance(scenarios, list) or not all(
+            type(pair) is list and len(pair) == 2 and _is_index(pair[0]) and _is_index(pair[1])
+            for pair in scenarios):
+        raise InvalidScenarios(message)
+    try:
+        pairs = np.array(scenarios, dtype=np.int64).reshape(-1, 2)
+    except OverflowError:
+        raise InvalidScenarios(message)
+    return pairs[:, 0], pairs[:, 1]
+
+
+class CompiledMatrix:
+    """Dense (probability x impact -> risk level) lookup of a matrix"""
+
+    def __init__(self, matrix):
+        self.matrix_id = matrix.id
+        self.version = matrix.updated_at.isoformat() if matrix.updated_at else None
+        self.probability = matrix.probability or []
+        self.impact = matrix.impact or []
+        self.risk_levels = matrix.risk_levels or []
+
+        shape = (len(self.probability), len(self.impact))
+        self.lookup = np.full(shape, UNRATED, dtype=np.int16)
+        for p, row in enumerate((matrix.grid or [])[:shape[0]]):
+            for i, level in enumerate((row or [])[:shape[1]]):
+                if isinstance(level, int) and level >= 0:
+                    self.lookup[p, i] = level
+        rated = self.lookup[self.lookup != UNRATED]
+        self.level_count = max(len(self.risk_levels), int(rated.max()) + 1 if rated.size else 0)
+
+    @property
+    def shape(self):
+        return self.lookup.shape
+
+    def indexes(self, probability, impact):
+        """Validated int arrays of probability and impact indexes"""
+        message = 'Probability and impact must be integer indexes'
+        probability = _index_array(probability, message)
+        impact = _index_array(impact, message)
+        if probability.shape != impact.shape:
+            raise InvalidScenarios('Probability and impact must have the same length')
+
+        invalid = (probability < 0) | (probability >= self.shape[0]) | (impact < 0) | (impact >= self.shape[1])
+        if invalid.any():
+            raise InvalidScenarios(
+                f'{int(invalid.sum())} scenarios outside the {self.shape[0]}x{self.shape[1]} matrix '
+                f'(first at position {int(invalid.argmax())})'
+            )
+        return probability, impact
+
+    def score(self, probability, impact):
+        """Risk level of each scenario (UNRATED where the grid has no level)"""
+        probability, impact = self.indexes(probability, impact)
+        return self.lookup[probability, impact]
+
+    def heatmap(self, probability, impact):
+        """Scenario counts per (probability, impact) cell"""
+        return self._heatmap(*self.indexes(probability, impact))
+
+    def _heatmap(self, probability, impact):
+        cells = probability * self.shape[1] + impact
+        return np.bincount(cells, minlength=self.lookup.size).reshape(self.shape)
+
+    def level_counts(self, heatmap):
+        """Scenario counts per risk level, and of unrated scenarios, from a heatmap"""
+        rated = self.lookup != UNRATED
+        counts = np.bincount(self.lookup[rated], weights=heatmap[rated], minlength=self.level_count)
+        return counts.astype(np.int64), int(heatmap[~rated].sum())
+
+    def evaluate(self, probability, impact, include_scores=False):
+        """Level counts and heatmap of the scenarios (and their levels when ``include_scores``)"""
+        probability, impact = self.indexes(probability, impact)
+        heatmap = self._heatmap(probability, impact)
+        counts, unrated = self.level_counts(heatmap)
+
+        levels = []
+        for index, count in enumerate(counts.tolist()):
+            level = self.risk_levels[index] if index < len(self.risk_levels) else {}
+            levels.append({
+                'index': index,
+                'abbreviation': level.get('abbreviation'),
+                'name': level.get('name'),
+                'hexcolor': level.get('hexcolor'),
+                'count': count
+            })
+
+        result = {
+            'matrix_id': self.matrix_id,
+            'version': self.version,
+            'count': int(probability.size),
+            'levels': levels,
+            'unrated': unrated,
+            'heatmap': heatmap.tolist()
+        }
+        if include_scores:
+            result['scores'] = self.lookup[probability, impact].tolist()
+        return result
+
+
+_compiled = OrderedDict()
+_lock = threading.Lock()
+
+
+def compiled_matrix(matrix):
+    """CompiledMatrix of ``matrix``, compiled once per (id, updated_at)"""
+    key = (matrix.id, matrix.updated_at)
+    with _lock:
+        compiled = _compiled.get(key)
+        if compiled is not None:
+            _compiled.move_to_end(key)
+            return compiled
+
+    compiled = CompiledMatrix(matrix)
+    with _lock:
+        _compiled[key] = compiled
+        while len(_compiled) > MAX_COMPILED_MATRICES:
+            _compiled.popitem(last=False)
+    return compiled
@@ -1,16 +1,28 @@
 # Routes package
+from flask import jsonify
+
+from app.includes import IncludeError
 from .stored_libraries import register_library_routes
 from .loaded_libraries import register_loaded_library_routes
 from .frameworks import register_framework_routes
 from .controls_and_matrices import register_control_routes, register_risk_matrix_routes
 from .mappings import register_mapping_routes
+from .metrics import register_metrics_routes
+from .batch import register_batch_routes
+from .sync import register_sync_routes
+from .assessments import register_assessment_routes
 
 
 def register_all_routes(app):
     """Register all API routes"""
+    app.register_error_handler(IncludeError, lambda e: (jsonify({'error': str(e)}), 400))
     register_library_routes(app)
     register_loaded_library_routes(app)
     register_framework_routes(app)
     register_control_routes(app)
     register_risk_matrix_routes(app)
     register_mapping_routes(app)
+    register_metrics_routes(app)
+    register_batch_routes(app)
+    register_sync_routes(app)
+    register_assessment_routes(app)
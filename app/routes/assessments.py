@@ -0,0 +1,344 @@
+"""Compliance assessment routes"""
+from flask import jsonify, request
+from sqlalchemy.exc import IntegrityError
+from application import db, identity_cache
+from app.assessments import (RESULT_WRITE_ATTEMPTS, AssessmentError, rebuild_rollups, subtree_summary,
+                             upsert_results)
+from app.coverage import STATUS_COMPLIANCE, mapping_path, project
+from app.models import ComplianceAssessment, Framework, RequirementAssessment, RequirementNode, Urn
+
+
+def register_assessment_routes(app):
+    """Register compliance assessment routes"""
+    
+    @app.route('/api/assessments/', methods=['GET'])
+    def list_assessments():
+        """
+        List Assessments
+        ---
+        tags:
+          - Assessments
+        summary: List compliance assessments with their score summaries
+        parameters:
+          - name: framework
+            in: query
+            type: string
+            description: Filter by framework ID
+        responses:
+          200:
+            description: Array of assessments
+        """
+        query = ComplianceAssessment.query
+        if framework := request.args.get('framework'):
+            query = query.filter_by(framework_id=framework)
+        
+        assessments = query.order_by(ComplianceAssessment.id).all()
+        return jsonify({'count': len(assessments), 'results': [a.to_dict() for a in assessments]}), 200
+    
+    
+    @app.route('/api/assessments/', methods=['POST'])
+    def create_assessment():
+        """
+        Create Assessment
+        ---
+        tags:
+          - Assessments
+        summary: Start a compliance assessment of a framework
+        parameters:
+          - name: body
+            in: body
+            required: true
+            schema:
+              type: object
+              properties:
+                framework:
+                  type: string
+                name:
+                  type: string
+                description:
+                  type: string
+        responses:
+          201:
+            description: Assessment created
+          400:
+            description: Unknown framework or missing name
+        """
+        data = request.get_json(silent=True) or {}
+        framework = identity_cache.get(Framework, data.get('framework', ''))
+        if not framework:
+            return jsonify({'error': 'Framework not found'}), 400
+        if not data.get('name'):
+            return jsonify({'error': 'Name is required'}), 400
+        
+        assessment = ComplianceAssessment(framework_id=framework.id, name=data['name'],
+                                          description=data.get('description'))
+        db.session.add(assessment)
+        db.session.flush()
+        rebuild_rollups(assessment)
+        db.session.commit()
+        
+        return jsonify(assessment.to_dict()), 201
+    
+    
+    @app.route('/api/assessments/<int:assessment_id>/', methods=['GET'])
+    def get_assessment(assessment_id):
+        """
+        Get Assessment
+        ---
+        tags:
+          - Assessments
+        summary: Assessment with its framework score summary
+        parameters:
+          - name: assessment_id
+            in: path
+            required: true
+            type: integer
+        responses:
+          200:
+            description: Assessment object
+          404:
+            description: Assessment not found
+        """
+        assessment = db.session.get(ComplianceAssessment, assessment_id)
+        
+        if not assessment:
+            return jsonify({'error': 'Assessment not found'}), 404
+        
+        return jsonify(assessment.to_dict()), 200
+    
+    
+    @app.route('/api/assessments/<int:assessment_id>/', methods=['DELETE'])
+    def delete_assessment(assessment_id):
+        """Delete Assessment --- tags: [Assessments]"""
+        assessment = db.session.get(ComplianceAssessment, assessment_id)
+        
+        if assessment:
+            db.session.delete(assessment)
+            db.session.commit()
+        
+        return jsonify({'status': 'success'}), 200
+    
+    
+    @app.route('/api/assessments/<int:assessment_id>/score/', methods=['GET'])
+    def get_assessment_score(assessment_id):
+        """
+        Assessment Score
+        ---
+        tags:
+          - Assessments
+        summary: Score summary of the whole framework, or of one requirement subtree
+        description: Rollups are maintained on every answer, so this reads a single row
+        parameters:
+          - name: assessment_id
+            in: path
+            required: true
+            type: integer
+          - name: node
+            in: query
+            type: string
+            description: Requirement id or URN whose subtree to summarize
+        responses:
+          200:
+            description: Score summary
+          404:
+            description: Assessment or requirement not found
+        """
+        assessment = db.session.get(ComplianceAssessment, assessment_id)
+        
+        if not assessment:
+            return jsonify({'error': 'Assessment not found'}), 404
+        
+        if node_id := request.args.get('node'):
+            node = identity_cache.get(RequirementNode, node_id)
+            if not node or node.framework_id != assessment.framework_id:
+                return jsonify({'error': 'Requirement not found'}), 404
+            return jsonify(dict(subtree_summary(assessment, node), node=node.id)), 200
+        
+        return jsonify(assessment.score_summary()), 200
+    
+    
+    @app.route('/api/assessments/<int:assessment_id>/results/', methods=['GET'])
+    def list_assessment_results(assessment_id):
+        """
+        List Assessment Results
+        ---
+        tags:
+          - Assessments
+        summary: Recorded answers of an assessment
+        parameters:
+          - name: assessment_id
+            in: path
+            required: true
+            type: integer
+          - name: status
+            in: query
+            type: string
+            description: Filter by status
+        responses:
+          200:
+            description: Answers with their requirement URN
+          404:
+            description: Assessment not found
+        """
+        assessment = db.session.get(ComplianceAssessment, assessment_id)
+        
+        if not assessment:
+            return jsonify({'error': 'Assessment not found'}), 404
+        
+        query = db.select(RequirementAssessment, Urn.urn).join(
+            Urn, Urn.id == RequirementAssessment.requirement_urn_id
+        ).where(RequirementAssessment.assessment_id == assessment.id).order_by(Urn.urn)
+        if status := request.args.get('status'):
+            query = query.where(RequirementAssessment.status == status)
+        
+        rows = db.session.execute(query).all()
+        return jsonify({'count': len(rows), 'results': [result.to_dict(urn) for result, urn in rows]}), 200
+    
+    
+    @app.route('/api/assessments/<int:assessment_id>/results/', methods=['PUT', 'PATCH'])
+    def upsert_assessment_results(assessment_id):
+        """
+        Record Assessment Answers
+        ---
+        tags:
+          - Assessments
+        summary: Insert or update many answers at once
+        description: Fields left out of an answer keep their stored value; rollups of the answered requirements and their ancestors are updated in the same transaction
+        parameters:
+          - name: assessment_id
+            in: path
+            required: true
+            type: integer
+          - name: body
+            in: body
+            required: true
+            schema:
+              type: object
+              properties:
+                results:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      requirement:
+                        type: string
+                      status:
+                        type: string
+                        enum: [not_assessed, compliant, partially_compliant, non_compliant, not_applicable]
+                      score:
+                        type: integer
+                      observation:
+                        type: string
+        responses:
+          200:
+            description: Counts of written answers and updated rollups, with the new score summary
+          400:
+            description: Invalid answers (nothing is written)
+          404:
+            description: Assessment not found
+          409:
+            description: Concurrent answers kept colliding (nothing is written)
+        """
+        assessment = db.session.get(ComplianceAssessment, assessment_id)
+        
+        if not assessment:
+            return jsonify({'error': 'Assessment not found'}), 404
+        
+        answers = (request.get_json(silent=True) or {}).get('results')
+        if not isinstance(answers, list):
+            return jsonify({'error': 'results must be a list of answers'}), 400
+        
+        for _ in range(RESULT_WRITE_ATTEMPTS):
+            try:
+                report = upsert_results(assessment, answers)
+                db.session.commit()
+                break
+            except AssessmentError as e:
+                db.session.rollback()
+                return jsonify({'error': str(e)}), 400
+            except IntegrityError:
+                # Another request inserted one of the same first answers: apply ours on top of it
+                db.session.rollback()
+        else:
+            return jsonify({'error': 'Concurrent answers to the same requirements, please retry'}), 409
+        
+        return jsonify(dict(report, summary=assessment.score_summary())), 200
+    
+    
+    @app.route('/api/assessments/<int:assessment_id>/projection/', methods=['GET'])
+    def project_assessment(assessment_id):
+        """
+        Project Assessment onto Another Framework
+        ---
+        tags:
+          - Assessments
+        summary: Estimated coverage of another framework's requirements, inferred through mapping sets
+        description: Answers count as compliant 1, partially compliant 0.5, non compliant 0 (others unknown) and are propagated along the shortest chain of mapping sets, through pivot frameworks when needed
+        parameters:
+          - name: assessment_id
+            in: path
+            required: true
+            type: integer
+          - name: framework
+            in: query
+            type: string
+            required: true
+            description: Target framework id or URN (need not be loaded)
+        responses:
+          200:
+            description: Mapping path, summary and coverage / confidence per target requirement URN
+          400:
+            description: No target framework
+          404:
+            description: Assessment not found, or no mapping path to the target framework
+        """
+        assessment = db.session.get(ComplianceAssessment, assessment_id)
+        
+        if not assessment:
+            return jsonify({'error': 'Assessment not found'}), 404
+        
+        target = request.args.get('framework')
+        if not target:
+            return jsonify({'error': 'Target framework is required'}), 400
+        framework = identity_cache.get(Framework, target)
+        target_urn = framework.urn if framework else target
+        
+        path = mapping_path(assessment.framework.urn, target_urn)
+        if path is None:
+            return jsonify({'error': f'No mapping path from {assessment.framework.urn} to {target_urn}'}), 404
+        
+        compliance = dict(db.session.execute(
+            db.select(RequirementAssessment.requirement_urn_id, RequirementAssessment.status).where(
+                RequirementAssessment.assessment_id == assessment.id,
+                RequirementAssessment.status.in_(STATUS_COMPLIANCE))
+        ).all())
+        ids, coverage, confidence = project(
+            {urn_id: STATUS_COMPLIANCE[status] for urn_id, status in compliance.items()}, path)
+        urns = dict(db.session.execute(db.select(Urn.id, Urn.urn).where(Urn.id.in_(ids.tolist()))).all()) \
+            if ids.size else {}
+        
+        summary = {
+            'mapped': int(ids.size),
+            'estimated_compliance': round(float((coverage * confidence).sum() / confidence.sum()), 4)
+            if ids.size else None
+        }
+        if framework:
+            summary['assessable'] = RequirementNode.query.filter_by(framework_id=framework.id, assessable=True).count()
+        
+        results = sorted(
+            ({'urn': urns.get(urn_id), 'coverage': round(value, 4), 'confidence': round(weight, 4)}
+             for urn_id, value, weight in zip(ids.tolist(), coverage.tolist(), confidence.tolist())),
+            key=lambda result: result['urn'] or ''
+        )
+        return jsonify({
+            'source_framework_urn': assessment.framework.urn,
+            'target_framework_urn': target_urn,
+            'path': [
+                {'mapping_set_id': mapping_set.id, 'reversed': reverse,
+                 'source_framework_urn': mapping_set.source_framework_urn,
+                 'target_framework_urn': mapping_set.target_framework_urn}
+                for mapping_set, reverse in path
+            ],
+            'summary': summary,
+            'results': results
+        }), 200
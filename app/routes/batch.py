@@ -0,0 +1,197 @@
+"""Batch routes: many objects of one type, or many GETs, per HTTP request"""
+import json
+
+from flask import Response, current_app, jsonify, request
+from werkzeug.test import EnvironBuilder
+
+from application import db, identity_cache
+from app.localization import view_options
+from app.models import (StoredLibrary, LoadedLibrary, Framework, RequirementNode, ReferenceControl,
+                        RiskMatrix, RequirementMappingSet)
+
+MAX_BATCH_IDS = 500
+MAX_BATCH_REQUESTS = 50
+
+# Headers of the composite request passed on to every sub-request
+FORWARDED_HEADERS = ('Authorization', 'Accept-Language', 'Cookie')
+
+# (URL collection, model, Swagger tag, to_dict takes locale options)
+BATCH_COLLECTIONS = [
+    ('stored-libraries', StoredLibrary, 'Stored Libraries', True),
+    ('loaded-libraries', LoadedLibrary, 'Loaded Libraries', False),
+    ('frameworks', Framework, 'Frameworks', True),
+    ('requirement-nodes', RequirementNode, 'Requirements', True),
+    ('reference-controls', ReferenceControl, 'Reference Controls', True),
+    ('risk-matrices', RiskMatrix, 'Risk Matrices', True),
+    ('requirement-mapping-sets', RequirementMappingSet, 'Requirement Mappings', False),
+]
+
+
+def requested_ids(name='id'):
+    """Ids from ?id=a&id=b (or id[]=…), comma-separated values allowed"""
+    values = request.args.getlist(name) or request.args.getlist(f'{name}[]')
+    ids = [value.strip() for raw in values for value in raw.split(',') if value.strip()]
+    return list(dict.fromkeys(ids))
+
+
+def batch_get(model, ids, localized=True):
+    """Batch-get payload: results in request order plus the ids that matched nothing"""
+    found = identity_cache.get_many(model, ids)
+    options = view_options() if localized else {}
+    return {
+        'count': len(found),
+        'results': [found[key].to_dict(**options) for key in ids if key in found],
+        'missing': [key for key in ids if key not in found]
+    }
+
+
+def _make_batch_view(model, tag, localized):
+    def batch_get_view():
+        ids = requested_ids()
+        if not ids:
+            return jsonify({'error': 'No ids provided'}), 400
+        if len(ids) > MAX_BATCH_IDS:
+            return jsonify({'error': f'At most {MAX_BATCH_IDS} ids per request'}), 400
+        return jsonify(batch_get(model, ids, localized)), 200
+    
+    batch_get_view.__doc__ = f"""
+        Batch Get {tag}
+        ---
+        tags:
+          - {tag}
+        summary: Get many objects by id or URN in one request
+        parameters:
+          - name: id
+            in: query
+            type: array
+            items:
+              type: string
+            collectionFormat: multi
+            required: true
+            description: Ids or URNs (repeat the parameter or separate with commas)
+        responses:
+          200:
+            description: Found objects in request order, and the ids that matched nothing
+          400:
+            description: No ids or too many ids
+        """
+    return batch_get_view
+
+
+def validate_sub_requests(data):
+    """List of (id, path) from a composite request body, or raise ValueError"""
+    items = data.get('requests') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise ValueError('Body must be {"requests": [{"path": "/api/..."}, ...]}')
+    if len(items) > MAX_BATCH_REQUESTS:
+        raise ValueError(f'At most {MAX_BATCH_REQUESTS} sub-requests per batch')
+    
+    sub_requests = []
+    for index, item in enumerate(items):
+        path = item.get('path') if isinstance(item, dict) else None
+        method = (item.get('method') or 'GET').upper() if isinstance(item, dict) else None
+        if not isinstance(path, str) or not path.startswith('/api/'):
+            raise ValueError(f'Sub-request {index}: path must start with /api/')
+        if method != 'GET':
+            raise ValueError(f'Sub-request {index}: only GET is supported')
+        if path.split('?', 1)[0].rstrip('/') == '/api/batch':
+            raise ValueError(f'Sub-request {index}: batches cannot be nested')
+        sub_requests.append((item.get('id', index), path))
+    return sub_requests
+
+
+def dispatch_sub_request(path, headers):
+    """Run one GET through the app's routing in the current app context
+    
+    The app context (and so the DB session and its connection) is shared
+    with the composite request; only a request context is pushed.
+    """
+    app = current_app._get_current_object()
+    builder = EnvironBuilder(path=path, method='GET', headers=headers)
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+    
+    with app.request_context(environ):
+        try:
+            response = app.full_dispatch_request()
+        except Exception:
+            # One failing item must not fail the batch or poison the shared session
+            app.logger.exception('Batch sub-request failed: GET %s', path)
+            db.session.rollback()
+            response = jsonify({'error': 'Internal server error'})
+            response.status_code = 500
+    return response
+
+
+def encode_sub_response(item_id, response):
+    """JSON bytes of one batch item; JSON bodies are spliced in without re-parsing"""
+    body = response.get_data()
+    if response.is_json and body.strip():
+        body = body.strip()
+    else:
+        body = json.dumps(body.decode('utf-8', errors='replace')).encode('utf-8')
+    head = json.dumps({'id': item_id, 'status': response.status_code})
+    return head[:-1].encode('utf-8') + b', "body": ' + body + b'}'
+
+
+def register_batch_routes(app):
+    """Register /api/<collection>/batch/ for every object type, and /api/batch"""
+    for collection, model, tag, localized in BATCH_COLLECTIONS:
+        app.add_url_rule(
+            f'/api/{collection}/batch/',
+            endpoint=f"batch_get_{collection.replace('-', '_')}",
+            view_func=_make_batch_view(model, tag, localized),
+            methods=['GET']
+        )
+    
+    @app.route('/api/batch', methods=['POST'])
+    def composite_batch():
+        """
+        Composite Request
+        ---
+        tags:
+          - Batch
+        summary: Execute many GET requests in one HTTP call
+        description: Sub-requests run in order inside this request's app context and DB session. Authorization and Accept-Language are forwarded.
+        parameters:
+          - name: body
+            in: body
+            required: true
+            schema:
+              type: object
+              properties:
+                requests:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      id:
+                        type: string
+                      method:
+                        type: string
+                        default: GET
+                      path:
+                        type: string
+                        example: /api/frameworks/urn:intuitem:risk:framework:iso27001-2022/
+        responses:
+          200:
+            description: One {id, status, body} per sub-request, in request order
+          400:
+            description: Malformed batch
+        """
+        try:
+            sub_requests = validate_sub_requests(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+        
+        # Sequential on purpose: they share one session and one pooled connection
+        items = [
+            encode_sub_response(item_id, dispatch_sub_request(path, headers))
+            for item_id, path in sub_requests
+        ]
+        body = b'{"count": ' + str(len(items)).encode() + b', "responses": [' + b', '.join(items) + b']}\n'
+        return Response(body, status=200, mimetype='application/json')
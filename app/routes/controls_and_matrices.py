@@ -1,7 +1,10 @@
 """Reference controls and risk matrices routes"""
 from flask import jsonify, request
-from application import db
-from app.models import ReferenceControl, RiskMatrix
+from application import db, identity_cache
+from app.localization import view_options
+from app.includes import include_options, load_with_includes, requested_includes, serialize
+from app.models import ReferenceControl, RequirementNode, RiskMatrix, linking_requirements
+from app.risk_engine import InvalidScenarios, compiled_matrix, split_scenarios
 
 
 def register_control_routes(app):
@@ -27,23 +30,38 @@ def register_control_routes(app):
         limit = int(request.args.get('limit', 100))
         offset = int(request.args.get('offset', 0))
         
+        includes = requested_includes(ReferenceControl)
         total = query.count()
-        controls = query.limit(limit).offset(offset).all()
+        controls = query.options(*include_options(ReferenceControl, includes)).limit(limit).offset(offset).all()
         
-        return jsonify({'count': total, 'results': [c.to_dict() for c in controls]}), 200
+        options = view_options()
+        return jsonify({'count': total, 'results': [serialize(c, includes, **options) for c in controls]}), 200
     
     
     @app.route('/api/reference-controls/<path:control_id>/', methods=['GET'])
     def get_reference_control(control_id):
         """Get Control Details --- tags: [Reference Controls]"""
-        control = ReferenceControl.query.filter(
-            db.or_(ReferenceControl.id == control_id, ReferenceControl.urn == control_id)
-        ).first()
+        control = identity_cache.get(ReferenceControl, control_id)
         
         if not control:
             return jsonify({'error': 'Control not found'}), 404
         
-        return jsonify(control.to_dict()), 200
+        includes = requested_includes(ReferenceControl)
+        control = load_with_includes(ReferenceControl, control, includes)
+        return jsonify(serialize(control, includes, **view_options())), 200
+    
+    
+    @app.route('/api/reference-controls/<path:control_id>/requirements/', methods=['GET'])
+    def get_reference_control_requirements(control_id):
+        """Requirements Listing a Control (reverse lookup; unloaded controls by URN, ?framework= to narrow) --- tags: [Reference Controls]"""
+        control = identity_cache.get(ReferenceControl, control_id)
+        query = linking_requirements('reference_controls', control.urn if control else control_id)
+        if framework_id := request.args.get('framework'):
+            query = query.filter(RequirementNode.framework_id == framework_id)
+        
+        requirements = query.order_by(RequirementNode.framework_id, RequirementNode.order_id).all()
+        options = view_options()
+        return jsonify({'count': len(requirements), 'results': [r.to_dict(**options) for r in requirements]}), 200
     
     
     @app.route('/api/reference-controls/', methods=['POST'])
@@ -70,9 +88,7 @@ def register_control_routes(app):
     @app.route('/api/reference-controls/<path:control_id>/', methods=['PUT', 'PATCH'])
     def update_reference_control(control_id):
         """Update Control --- tags: [Reference Controls]"""
-        control = ReferenceControl.query.filter(
-            db.or_(ReferenceControl.id == control_id, ReferenceControl.urn == control_id)
-        ).first()
+        control = identity_cache.get(ReferenceControl, control_id)
         
         if not control:
             return jsonify({'error': 'Control not found'}), 404
@@ -89,9 +105,7 @@ def register_control_routes(app):
     @app.route('/api/reference-controls/<path:control_id>/', methods=['DELETE'])
     def delete_reference_control(control_id):
         """Delete Control --- tags: [Reference Controls]"""
-        control = ReferenceControl.query.filter(
-            db.or_(ReferenceControl.id == control_id, ReferenceControl.urn == control_id)
-        ).first()
+        control = identity_cache.get(ReferenceControl, control_id)
         
         if control:
             db.session.delete(control)
@@ -106,21 +120,51 @@ def register_risk_matrix_routes(app):
     @app.route('/api/risk-matrices/', methods=['GET'])
     def list_risk_matrices():
         """List Risk Matrices --- tags: [Risk Matrices]"""
-        matrices = RiskMatrix.query.all()
-        return jsonify({'count': len(matrices), 'results': [m.to_dict() for m in matrices]}), 200
+        includes = requested_includes(RiskMatrix)
+        matrices = RiskMatrix.query.options(*include_options(RiskMatrix, includes)).all()
+        options = view_options()
+        return jsonify({'count': len(matrices), 'results': [serialize(m, includes, **options) for m in matrices]}), 200
     
     
     @app.route('/api/risk-matrices/<path:matrix_id>/', methods=['GET'])
     def get_risk_matrix(matrix_id):
         """Get Risk Matrix Details --- tags: [Risk Matrices]"""
-        matrix = RiskMatrix.query.filter(
-            db.or_(RiskMatrix.id == matrix_id, RiskMatrix.urn == matrix_id)
-        ).first()
+        matrix = identity_cache.get(RiskMatrix, matrix_id)
         
         if not matrix:
             return jsonify({'error': 'Risk matrix not found'}), 404
         
-        return jsonify(matrix.to_dict()), 200
+        includes = requested_includes(RiskMatrix)
+        matrix = load_with_includes(RiskMatrix, matrix, includes)
+        return jsonify(serialize(matrix, includes, **view_options())), 200
+    
+    
+    @app.route('/api/risk-matrices/<path:matrix_id>/evaluate/', methods=['POST'])
+    def evaluate_risk_matrix(matrix_id):
+        """Evaluate Risk Matrix --- tags: [Risk Matrices]"""
+        matrix = identity_cache.get(RiskMatrix, matrix_id)
+        
+        if not matrix:
+            return jsonify({'error': 'Risk matrix not found'}), 404
+        
+        data = request.get_json(silent=True) or {}
+        if 'scenarios' not in data and not ('probability' in data and 'impact' in data):
+            return jsonify({'error': 'Provide scenarios or probability and impact arrays'}), 400
+        
+        max_scenarios = app.config['RISK_EVALUATE_MAX_SCENARIOS']
+        batch = data['scenarios'] if 'scenarios' in data else data['probability']
+        if isinstance(batch, list) and len(batch) > max_scenarios:
+            return jsonify({'error': f'At most {max_scenarios} scenarios per request'}), 400
+        
+        try:
+            if 'scenarios' in data:
+                probability, impact = split_scenarios(data['scenarios'])
+            else:
+                probability, impact = data['probability'], data['impact']
+            result = compiled_matrix(matrix).evaluate(probability, impact, bool(data.get('include_scores')))
+        except InvalidScenarios as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(result), 200
     
     
     @app.route('/api/risk-matrices/', methods=['POST'])
@@ -136,7 +180,8 @@ def register_risk_matrix_routes(app):
             description=data.get('description'),
             probability=data.get('probability', []),
             impact=data.get('impact', []),
-            grid=data.get('grid', [])
+            grid=data.get('grid', []),
+            risk_levels=data.get('risk_levels', [])
         )
         
         db.session.add(matrix)
@@ -148,15 +193,13 @@ def register_risk_matrix_routes(app):
     @app.route('/api/risk-matrices/<path:matrix_id>/', methods=['PUT', 'PATCH'])
     def update_risk_matrix(matrix_id):
         """Update Risk Matrix --- tags: [Risk Matrices]"""
-        matrix = RiskMatrix.query.filter(
-            db.or_(RiskMatrix.id == matrix_id, RiskMatrix.urn == matrix_id)
-        ).first()
+        matrix = identity_cache.get(RiskMatrix, matrix_id)
         
         if not matrix:
             return jsonify({'error': 'Risk matrix not found'}), 404
         
         data = request.get_json()
-        for key in ['name', 'description', 'probability', 'impact', 'grid']:
+        for key in ['name', 'description', 'probability', 'impact', 'grid', 'risk_levels']:
             if key in data:
                 setattr(matrix, key, data[key])
         
@@ -167,9 +210,7 @@ def register_risk_matrix_routes(app):
     @app.route('/api/risk-matrices/<path:matrix_id>/', methods=['DELETE'])
     def delete_risk_matrix(matrix_id):
         """Delete Risk Matrix --- tags: [Risk Matrices]"""
-        matrix = RiskMatrix.query.filter(
-            db.or_(RiskMatrix.id == matrix_id, RiskMatrix.urn == matrix_id)
-        ).first()
+        matrix = identity_cache.get(RiskMatrix, matrix_id)
         
         if matrix:
             db.session.delete(matrix)
@@ -1,7 +1,13 @@
 """Frameworks API routes"""
 from flask import jsonify, request
-from application import db
-from app.models import Framework, RequirementNode
+from application import db, identity_cache, cache
+from app.cache import json_bytes_response
+from app.includes import include_options, load_with_includes, requested_includes, serialize
+from app.localization import localize, view_options
+from app.models import (Framework, FrameworkTreeSnapshot, ReferenceControl, REQUIREMENT_LINKS, RequirementNode,
+                        Urn, linked_urns, linking_requirements)
+from app.related import related_items
+from app.routes.batch import MAX_BATCH_IDS, requested_ids
 
 
 def register_framework_routes(app):
@@ -68,12 +74,14 @@ def register_framework_routes(app):
         limit = int(request.args.get('limit', 20))
         offset = int(request.args.get('offset', 0))
         
+        includes = requested_includes(Framework)
         total = query.count()
-        frameworks = query.limit(limit).offset(offset).all()
+        frameworks = query.options(*include_options(Framework, includes)).limit(limit).offset(offset).all()
         
+        options = view_options()
         return jsonify({
             'count': total,
-            'results': [f.to_dict() for f in frameworks]
+            'results': [serialize(f, includes, **options) for f in frameworks]
         }), 200
     
     
@@ -94,17 +102,14 @@ def register_framework_routes(app):
           200:
             description: Framework object with metadata
         """
-        framework = Framework.query.filter(
-            db.or_(
-                Framework.id == framework_id,
-                Framework.urn == framework_id
-            )
-        ).first()
+        framework = identity_cache.get(Framework, framework_id)
         
         if not framework:
             return jsonify({'error': 'Framework not found'}), 404
         
-        return jsonify(framework.to_dict()), 200
+        includes = requested_includes(Framework)
+        framework = load_with_includes(Framework, framework, includes)
+        return jsonify(serialize(framework, includes, **view_options())), 200
     
     
     @app.route('/api/frameworks/<path:framework_id>/tree/', methods=['GET'])
@@ -121,25 +126,64 @@ def register_framework_routes(app):
             in: path
             required: true
             type: string
+          - name: locale
+            in: query
+            type: string
+            description: Resolve names/descriptions for this locale (else Accept-Language)
+          - name: include_translations
+            in: query
+            type: boolean
+            description: Keep the translations blob in localized views
+          - name: ig
+            in: query
+            type: array
+            items:
+              type: string
+            collectionFormat: multi
+            description: Only requirements in one of these implementation groups (ref_ids of implementation_groups_definition), with their ancestors
         responses:
           200:
             description: Nested requirement structure
         """
-        framework = Framework.query.filter(
-            db.or_(
-                Framework.id == framework_id,
-                Framework.urn == framework_id
-            )
+        options = view_options()
+        
+        if groups := requested_ids('ig'):
+            # Bitwise filter on the precomputed masks: not precomputed as a snapshot
+            framework = identity_cache.get(Framework, framework_id)
+            if not framework:
+                return jsonify({'error': 'Framework not found'}), 404
+            return jsonify({
+                'framework': framework.to_dict(**options),
+                'tree': framework.get_tree(nodes=framework.implementation_group_nodes(groups), **options)
+            }), 200
+        
+        if options.get('include_translations'):
+            # Localized with every translation kept: not precomputed
+            framework = identity_cache.get(Framework, framework_id)
+            if not framework:
+                return jsonify({'error': 'Framework not found'}), 404
+            return jsonify({
+                'framework': framework.to_dict(**options),
+                'tree': framework.get_tree(**options)
+            }), 200
+        
+        # Snapshot written at import/update time: a single-row fetch
+        snapshot = FrameworkTreeSnapshot.lookup_query(options.get('locale')).filter(
+            FrameworkTreeSnapshot.framework_id == framework_id
         ).first()
         
-        if not framework:
-            return jsonify({'error': 'Framework not found'}), 404
+        if snapshot is None:
+            framework = identity_cache.get(Framework, framework_id)
+            
+            if not framework:
+                return jsonify({'error': 'Framework not found'}), 404
+            
+            # Looked up by URN, or created before snapshots existed: built for this response only
+            snapshot = framework.build_tree_snapshot(options.get('locale'))
         
-        tree = framework.get_tree()
-        return jsonify({
-            'framework': framework.to_dict(),
-            'tree': tree
-        }), 200
+        response = json_bytes_response(snapshot.framework_tree_body(), etag=snapshot.version)
+        response.vary.add('Accept-Language')
+        return response
     
     
     @app.route('/api/frameworks/names/', methods=['GET'])
@@ -171,14 +215,14 @@ def register_framework_routes(app):
         
         frameworks = Framework.query.filter(Framework.id.in_(ids)).all()
         
+        options = view_options()
         names_dict = {}
         for framework in frameworks:
-            names_dict[framework.id] = {
+            names_dict[framework.id] = localize({
                 'id': framework.id,
                 'name': framework.name,
-                'ref_id': framework.ref_id,
-                'translations': framework.translations
-            }
+                'ref_id': framework.ref_id
+            }, framework.translations, **options)
         
         return jsonify(names_dict), 200
     
@@ -198,9 +242,10 @@ def register_framework_routes(app):
         # For now, return all frameworks
         # In future, filter based on user permissions
         frameworks = Framework.query.all()
+        options = view_options()
         return jsonify({
             'count': len(frameworks),
-            'results': [f.to_dict() for f in frameworks]
+            'results': [f.to_dict(**options) for f in frameworks]
         }), 200
     
     
@@ -246,6 +291,8 @@ def register_framework_routes(app):
         )
         
         db.session.add(framework)
+        db.session.flush()
+        framework.refresh_tree_snapshots()
         db.session.commit()
         
         return jsonify(framework.to_dict()), 201
@@ -273,12 +320,7 @@ def register_framework_routes(app):
           200:
             description: Framework updated
         """
-        framework = Framework.query.filter(
-            db.or_(
-                Framework.id == framework_id,
-                Framework.urn == framework_id
-            )
-        ).first()
+        framework = identity_cache.get(Framework, framework_id)
         
         if not framework:
             return jsonify({'error': 'Framework not found'}), 404
@@ -298,7 +340,11 @@ def register_framework_routes(app):
         if 'translations' in data:
             framework.translations = data['translations']
         
+        library_urn = framework.library_urn or framework.urn
+        db.session.flush()
+        framework.refresh_tree_snapshots()
         db.session.commit()
+        cache.invalidate_library(library_urn)
         
         return jsonify(framework.to_dict()), 200
     
@@ -320,16 +366,13 @@ def register_framework_routes(app):
           200:
             description: Framework deleted
         """
-        framework = Framework.query.filter(
-            db.or_(
-                Framework.id == framework_id,
-                Framework.urn == framework_id
-            )
-        ).first()
+        framework = identity_cache.get(Framework, framework_id)
         
         if framework:
+            library_urn = framework.library_urn or framework.urn
             db.session.delete(framework)
             db.session.commit()
+            cache.invalidate_library(library_urn)
         
         return jsonify({'status': 'success', 'message': 'Framework deleted'}), 200
     
@@ -357,6 +400,13 @@ def register_framework_routes(app):
             in: query
             type: string
             description: Search in name and description
+          - name: ig
+            in: query
+            type: array
+            items:
+              type: string
+            collectionFormat: multi
+            description: Only requirements in one of these implementation groups, with their ancestors
         responses:
           200:
             description: Array of requirements
@@ -365,6 +415,9 @@ def register_framework_routes(app):
         
         if framework := request.args.get('framework'):
             query = query.filter_by(framework_id=framework)
+        if groups := requested_ids('ig'):
+            query = query.filter(RequirementNode.in_implementation_groups(
+                Framework.implementation_group_masks(groups, framework)))
         if ref_id := request.args.get('ref_id'):
             query = query.filter_by(ref_id=ref_id)
         if search := request.args.get('search'):
@@ -375,10 +428,12 @@ def register_framework_routes(app):
                 )
             )
         
-        requirements = query.all()
+        includes = requested_includes(RequirementNode)
+        requirements = query.options(*include_options(RequirementNode, includes)).all()
+        options = view_options()
         return jsonify({
             'count': len(requirements),
-            'results': [req.to_dict() for req in requirements]
+            'results': [serialize(req, includes, **options) for req in requirements]
         }), 200
     
     
@@ -399,14 +454,220 @@ def register_framework_routes(app):
           200:
             description: Requirement object
         """
-        requirement = RequirementNode.query.filter(
-            db.or_(
-                RequirementNode.id == req_id,
-                RequirementNode.urn == req_id
-            )
-        ).first()
+        requirement = identity_cache.get(RequirementNode, req_id)
+        
+        if not requirement:
+            return jsonify({'error': 'Requirement not found'}), 404
+        
+        includes = requested_includes(RequirementNode)
+        requirement = load_with_includes(RequirementNode, requirement, includes)
+        return jsonify(serialize(requirement, includes, to_dict_kwargs={'include_children': True},
+                                 **view_options())), 200
+    
+    
+    @app.route('/api/requirement-nodes/related/', methods=['GET'])
+    def get_related_for_requirement_nodes():
+        """
+        Related Items of Many Requirements
+        ---
+        tags:
+          - Requirements
+        summary: Ancestors, children, mapped requirements and linked URNs of many requirements in one request
+        description: Same payload as /api/requirement-nodes/{req_id}/related/ for each requirement, loaded with a fixed number of queries
+        parameters:
+          - name: id
+            in: query
+            type: array
+            items:
+              type: string
+            collectionFormat: multi
+            required: true
+            description: Requirement ids or URNs (repeat the parameter or separate with commas)
+        responses:
+          200:
+            description: Related items per requirement in request order, and the ids that matched nothing
+          400:
+            description: No ids or too many ids
+        """
+        ids = requested_ids()
+        if not ids:
+            return jsonify({'error': 'No ids provided'}), 400
+        if len(ids) > MAX_BATCH_IDS:
+            return jsonify({'error': f'At most {MAX_BATCH_IDS} ids per request'}), 400
+        
+        found = identity_cache.get_many(RequirementNode, ids)
+        related = related_items(list({node.id: node for node in found.values()}.values()), view_options())
+        return jsonify({
+            'count': len(found),
+            'results': [related[found[key].id] for key in ids if key in found],
+            'missing': [key for key in ids if key not in found]
+        }), 200
+    
+    
+    @app.route('/api/requirement-nodes/<path:req_id>/related/', methods=['GET'])
+    def get_requirement_node_related(req_id):
+        """
+        Related Items of a Requirement
+        ---
+        tags:
+          - Requirements
+        summary: Requirement with its parent chain, children, mapped requirements and reference control / threat URNs
+        description: Ancestors are ordered from the root; mappings go both ways (outgoing when the requirement is the source), with the other requirement when its framework is loaded
+        parameters:
+          - name: req_id
+            in: path
+            required: true
+            type: string
+        responses:
+          200:
+            description: Requirement and related items
+          404:
+            description: Requirement not found
+        """
+        requirement = identity_cache.get(RequirementNode, req_id)
+        
+        if not requirement:
+            return jsonify({'error': 'Requirement not found'}), 404
+        
+        return jsonify(related_items([requirement], view_options())[requirement.id]), 200
+    
+    
+    @app.route('/api/requirement-nodes/<path:req_id>/reference-controls/', methods=['GET'])
+    def get_requirement_node_reference_controls(req_id):
+        """
+        Reference Controls of a Requirement
+        ---
+        tags:
+          - Requirements
+        summary: Reference controls listed by a requirement, with the control when its library is loaded
+        parameters:
+          - name: req_id
+            in: path
+            required: true
+            type: string
+        responses:
+          200:
+            description: Reference control URNs and controls
+          404:
+            description: Requirement not found
+        """
+        requirement = identity_cache.get(RequirementNode, req_id)
+        
+        if not requirement:
+            return jsonify({'error': 'Requirement not found'}), 404
+        
+        urns = linked_urns('reference_controls', [requirement.urn_id]).get(requirement.urn_id, [])
+        options = view_options()
+        controls = {
+            control.urn: control.to_dict(**options)
+            for control in ReferenceControl.query.filter(ReferenceControl.urn.in_(urns))
+        } if urns else {}
+        return jsonify({
+            'count': len(urns),
+            'results': [{'urn': urn, 'reference_control': controls.get(urn)} for urn in urns]
+        }), 200
+    
+    
+    @app.route('/api/requirement-nodes/<path:req_id>/threats/', methods=['GET'])
+    def get_requirement_node_threats(req_id):
+        """
+        Threats of a Requirement
+        ---
+        tags:
+          - Requirements
+        summary: Threat URNs listed by a requirement
+        parameters:
+          - name: req_id
+            in: path
+            required: true
+            type: string
+        responses:
+          200:
+            description: Threat URNs
+          404:
+            description: Requirement not found
+        """
+        requirement = identity_cache.get(RequirementNode, req_id)
         
         if not requirement:
             return jsonify({'error': 'Requirement not found'}), 404
         
-        return jsonify(requirement.to_dict(include_children=True)), 200
+        urns = linked_urns('threats', [requirement.urn_id]).get(requirement.urn_id, [])
+        return jsonify({'count': len(urns), 'results': [{'urn': urn} for urn in urns]}), 200
+    
+    
+    @app.route('/api/threats/<path:threat_urn>/requirements/', methods=['GET'])
+    def get_threat_requirements(threat_urn):
+        """
+        Requirements Listing a Threat
+        ---
+        tags:
+          - Requirements
+        summary: Requirements of loaded frameworks that list a threat (reverse lookup)
+        parameters:
+          - name: threat_urn
+            in: path
+            required: true
+            type: string
+          - name: framework
+            in: query
+            type: string
+            description: Only requirements of this framework
+        responses:
+          200:
+            description: Requirements in framework order
+        """
+        query = linking_requirements('threats', threat_urn)
+        if framework_id := request.args.get('framework'):
+            query = query.filter(RequirementNode.framework_id == framework_id)
+        
+        requirements = query.order_by(RequirementNode.framework_id, RequirementNode.order_id).all()
+        options = view_options()
+        return jsonify({'count': len(requirements), 'results': [r.to_dict(**options) for r in requirements]}), 200
+    
+    
+    @app.route('/api/frameworks/<path:framework_id>/reference-controls/', methods=['GET'])
+    def get_framework_reference_controls(framework_id):
+        """
+        Reference Control Coverage of a Framework
+        ---
+        tags:
+          - Frameworks
+        summary: Reference controls listed by the requirements of a framework, with the number of requirements for each
+        description: One grouped query over the requirement links; the control is included when its library is loaded
+        parameters:
+          - name: framework_id
+            in: path
+            required: true
+            type: string
+        responses:
+          200:
+            description: Reference controls, most referenced first
+          404:
+            description: Framework not found
+        """
+        framework = identity_cache.get(Framework, framework_id)
+        
+        if not framework:
+            return jsonify({'error': 'Framework not found'}), 404
+        
+        model, target_column = REQUIREMENT_LINKS['reference_controls']
+        requirement_count = db.func.count(model.requirement_urn_id)
+        rows = db.session.execute(
+            db.select(Urn.urn, requirement_count, ReferenceControl)
+            .select_from(model)
+            .join(Urn, Urn.id == target_column)
+            .outerjoin(ReferenceControl, ReferenceControl.urn == Urn.urn)
+            .where(model.framework_id == framework.id)
+            .group_by(Urn.urn, ReferenceControl.id)
+            .order_by(requirement_count.desc(), Urn.urn)
+        ).all()
+        
+        options = view_options()
+        return jsonify({
+            'count': len(rows),
+            'results': [
+                {'urn': urn, 'requirements': count, 'reference_control': control and control.to_dict(**options)}
+                for urn, count, control in rows
+            ]
+        }), 200
@@ -1,7 +1,11 @@
 """Loaded libraries routes"""
 from flask import jsonify, request
-from application import db
-from app.models import LoadedLibrary, Framework, ReferenceControl, RiskMatrix, RequirementMappingSet
+from application import db, identity_cache, cache
+from app.cache import json_bytes_response
+from app.includes import include_options, load_with_includes, requested_includes, serialize
+from app.localization import view_options
+from app.models import LoadedLibrary, Framework, FrameworkTreeSnapshot, ReferenceControl, RiskMatrix, RequirementMappingSet
+from app.routes.batch import requested_ids
 
 
 def register_loaded_library_routes(app):
@@ -38,10 +42,12 @@ def register_loaded_library_routes(app):
         if version := request.args.get('version'):
             query = query.filter_by(version=version)
         
-        libraries = query.all()
+        includes = requested_includes(LoadedLibrary)
+        libraries = query.options(*include_options(LoadedLibrary, includes)).all()
+        options = view_options()
         return jsonify({
             'count': len(libraries),
-            'results': [lib.to_dict() for lib in libraries]
+            'results': [serialize(lib, includes, **options) for lib in libraries]
         }), 200
     
     
@@ -62,11 +68,13 @@ def register_loaded_library_routes(app):
           200:
             description: Library object with all objects
         """
-        library = LoadedLibrary.query.filter_by(urn=library_urn).first()
+        library = identity_cache.get(LoadedLibrary, library_urn)
         if not library:
             return jsonify({'error': 'Loaded library not found'}), 404
         
-        return jsonify(library.to_dict()), 200
+        includes = requested_includes(LoadedLibrary)
+        library = load_with_includes(LoadedLibrary, library, includes)
+        return jsonify(serialize(library, includes, **view_options())), 200
     
     
     @app.route('/api/loaded-libraries/<path:library_urn>/content/', methods=['GET'])
@@ -86,7 +94,7 @@ def register_loaded_library_routes(app):
           200:
             description: Dict with frameworks, controls, matrices, mappings
         """
-        library = LoadedLibrary.query.filter_by(urn=library_urn).first()
+        library = identity_cache.get(LoadedLibrary, library_urn)
         if not library:
             return jsonify({'error': 'Loaded library not found'}), 404
         
@@ -96,11 +104,12 @@ def register_loaded_library_routes(app):
         matrices = RiskMatrix.query.filter_by(library_urn=library_urn).all()
         mappings = RequirementMappingSet.query.filter_by(library_urn=library_urn).all()
         
+        options = view_options()
         return jsonify({
             'library': library.to_dict(),
-            'frameworks': [f.to_dict() for f in frameworks],
-            'reference_controls': [c.to_dict() for c in controls],
-            'risk_matrices': [m.to_dict() for m in matrices],
+            'frameworks': [f.to_dict(**options) for f in frameworks],
+            'reference_controls': [c.to_dict(**options) for c in controls],
+            'risk_matrices': [m.to_dict(**options) for m in matrices],
             'requirement_mapping_sets': [ms.to_dict() for ms in mappings]
         }), 200
     
@@ -118,21 +127,55 @@ def register_loaded_library_routes(app):
             in: path
             required: true
             type: string
+          - name: locale
+            in: query
+            type: string
+            description: Resolve names/descriptions for this locale (else Accept-Language)
+          - name: include_translations
+            in: query
+            type: boolean
+            description: Keep the translations blob in localized views
+          - name: ig
+            in: query
+            type: array
+            items:
+              type: string
+            collectionFormat: multi
+            description: Only requirements in one of these implementation groups, with their ancestors
         responses:
           200:
             description: Nested requirement structure
         """
-        library = LoadedLibrary.query.filter_by(urn=library_urn).first()
+        library = identity_cache.get(LoadedLibrary, library_urn)
         if not library:
             return jsonify({'error': 'Loaded library not found'}), 404
         
-        # Get framework from this library
-        framework = Framework.query.filter_by(library_urn=library_urn).first()
-        if not framework:
-            return jsonify({'tree': []}), 200
+        options = view_options()
+        
+        if groups := requested_ids('ig'):
+            framework = Framework.query.filter_by(library_urn=library.urn).first()
+            nodes = framework.implementation_group_nodes(groups) if framework else []
+            return jsonify({'tree': framework.get_tree(nodes=nodes, **options) if framework else []}), 200
+        
+        if options.get('include_translations'):
+            # Localized with every translation kept: not precomputed
+            framework = Framework.query.filter_by(library_urn=library.urn).first()
+            return jsonify({'tree': framework.get_tree(**options) if framework else []}), 200
+        
+        # Snapshot of the framework from this library
+        snapshot = FrameworkTreeSnapshot.lookup_query(options.get('locale')).join(Framework).filter(
+            Framework.library_urn == library.urn
+        ).first()
+        
+        if snapshot is None:
+            framework = Framework.query.filter_by(library_urn=library.urn).first()
+            if not framework:
+                return jsonify({'tree': []}), 200
+            snapshot = framework.build_tree_snapshot(options.get('locale'))
         
-        tree = framework.get_tree()
-        return jsonify({'tree': tree}), 200
+        response = json_bytes_response(snapshot.tree_body(), etag=snapshot.version)
+        response.vary.add('Accept-Language')
+        return response
     
     
     @app.route('/api/loaded-libraries/<path:library_urn>/', methods=['DELETE'])
@@ -152,7 +195,7 @@ def register_loaded_library_routes(app):
           200:
             description: Library unloaded
         """
-        library = LoadedLibrary.query.filter_by(urn=library_urn).first()
+        library = identity_cache.get(LoadedLibrary, library_urn)
         if library:
             # Also update stored library
             if library.stored_library:
@@ -161,5 +204,7 @@ def register_loaded_library_routes(app):
             # Delete loaded library (cascades will handle related objects)
             db.session.delete(library)
             db.session.commit()
+            cache.invalidate_library(library_urn)
+            cache.invalidate_catalog()
         
         return jsonify({'status': 'success', 'message': 'Library unloaded'}), 200
@@ -1,6 +1,8 @@
 """Requirement mapping routes"""
 from flask import jsonify, request
-from application import db
+from application import db, identity_cache, cache
+from app.cache import encode_json, json_bytes_response, library_namespace
+from app.includes import include_key, include_options, load_with_includes, requested_includes, serialize
 from app.models import RequirementMappingSet, RequirementMapping
 
 
@@ -37,10 +39,11 @@ def register_mapping_routes(app):
                 )
             )
         
-        mapping_sets = query.all()
+        includes = requested_includes(RequirementMappingSet)
+        mapping_sets = query.options(*include_options(RequirementMappingSet, includes)).all()
         return jsonify({
             'count': len(mapping_sets),
-            'results': [ms.to_dict() for ms in mapping_sets]
+            'results': [serialize(ms, includes) for ms in mapping_sets]
         }), 200
     
     
@@ -62,17 +65,23 @@ def register_mapping_routes(app):
           200:
             description: Mapping set object with individual mappings
         """
-        mapping_set = RequirementMappingSet.query.filter(
-            db.or_(
-                RequirementMappingSet.id == mapping_id,
-                RequirementMappingSet.urn == mapping_id
-            )
-        ).first()
+        mapping_set = identity_cache.get(RequirementMappingSet, mapping_id)
         
         if not mapping_set:
             return jsonify({'error': 'Mapping set not found'}), 404
         
-        return jsonify(mapping_set.to_dict(include_mappings=True)), 200
+        includes = requested_includes(RequirementMappingSet)
+        
+        body = cache.get_or_compute(
+            library_namespace(mapping_set.library_urn or mapping_set.urn),
+            f'mapping-set:{mapping_set.id}:{include_key(includes)}',
+            lambda: encode_json(serialize(
+                load_with_includes(RequirementMappingSet, mapping_set, includes),
+                includes,
+                to_dict_kwargs={'include_mappings': True}
+            ))
+        )
+        return json_bytes_response(body)
     
     
     @app.route('/api/requirement-mapping-sets/', methods=['POST'])
@@ -109,12 +118,7 @@ def register_mapping_routes(app):
     @app.route('/api/requirement-mapping-sets/<path:mapping_id>/', methods=['PUT', 'PATCH'])
     def update_requirement_mapping_set(mapping_id):
         """Update Mapping Set --- tags: [Requirement Mappings]"""
-        mapping_set = RequirementMappingSet.query.filter(
-            db.or_(
-                RequirementMappingSet.id == mapping_id,
-                RequirementMappingSet.urn == mapping_id
-            )
-        ).first()
+        mapping_set = identity_cache.get(RequirementMappingSet, mapping_id)
         
         if not mapping_set:
             return jsonify({'error': 'Mapping set not found'}), 404
@@ -124,22 +128,21 @@ def register_mapping_routes(app):
             if key in data:
                 setattr(mapping_set, key, data[key])
         
+        library_urn = mapping_set.library_urn or mapping_set.urn
         db.session.commit()
+        cache.invalidate_library(library_urn)
         return jsonify(mapping_set.to_dict()), 200
     
     
     @app.route('/api/requirement-mapping-sets/<path:mapping_id>/', methods=['DELETE'])
     def delete_requirement_mapping_set(mapping_id):
         """Delete Mapping Set --- tags: [Requirement Mappings]"""
-        mapping_set = RequirementMappingSet.query.filter(
-            db.or_(
-                RequirementMappingSet.id == mapping_id,
-                RequirementMappingSet.urn == mapping_id
-            )
-        ).first()
+        mapping_set = identity_cache.get(RequirementMappingSet, mapping_id)
         
         if mapping_set:
+            library_urn = mapping_set.library_urn or mapping_set.urn
             db.session.delete(mapping_set)
             db.session.commit()
+            cache.invalidate_library(library_urn)
         
         return jsonify({'status': 'success'}), 200
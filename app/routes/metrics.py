@@ -0,0 +1,41 @@
+"""Runtime metrics routes"""
+from flask import current_app, jsonify
+from application import identity_cache, cache
+
+
+def register_metrics_routes(app):
+    """Register metrics API routes"""
+    
+    @app.route('/api/metrics/cache/', methods=['GET'])
+    def get_cache_metrics():
+        """
+        Get Cache Metrics
+        ---
+        tags:
+          - Metrics
+        summary: Hit rates and sizes of the caches
+        description: Per-model identity cache statistics for this worker process and shared response cache statistics
+        responses:
+          200:
+            description: Cache statistics
+        """
+        return jsonify({
+            'identity_cache': identity_cache.stats(),
+            'shared_cache': cache.stats()
+        }), 200
+    
+    
+    @app.route('/api/metrics/database/', methods=['GET'])
+    def get_database_metrics():
+        """
+        Get Database Routing Metrics
+        ---
+        tags:
+          - Metrics
+        summary: Read replica usage and health
+        description: Per-replica session counts, ejections and health for this worker process, and reads that fell back to the primary
+        responses:
+          200:
+            description: Replica statistics
+        """
+        return jsonify(current_app.extensions['replicas'].stats()), 200
@@ -1,11 +1,20 @@
 """Library management routes"""
 from flask import jsonify, request, current_app
-from application import db
-from app.models import StoredLibrary, LoadedLibrary, Framework, RequirementNode, ReferenceControl, RiskMatrix, RequirementMappingSet, RequirementMapping
+from application import db, identity_cache, cache
+from app.cache import CATALOG_NAMESPACE, encode_json, json_bytes_response, library_namespace
+from app.catalog import bundle_reads, catalog_bundled, catalog_loaded_urns, catalog_shadowed_urns
+from app.content_index import PointerError, content_indexes, parse_pointer, resolve_pointer
+from app.includes import include_options, load_with_includes, requested_includes, serialize
+from app.localization import view_options
+from app.assessments import delete_framework_assessments, rebuild_rollups
+from app.models import StoredLibrary, LoadedLibrary, Framework, FrameworkTreeSnapshot, RequirementNode, ReferenceControl, RiskMatrix, RequirementMappingSet, RequirementMapping, SyncTombstone, TRACKED_MODELS, REQUIREMENT_LINKS, implementation_group_bits, implementation_group_mask, intern_rows, intern_urns
+import json
 import yaml
 import os
 from pathlib import Path
 from datetime import datetime
+from contextlib import contextmanager, nullcontext
+from itertools import chain, zip_longest
 
 
 def register_library_routes(app):
@@ -65,44 +74,73 @@ def register_library_routes(app):
           200:
             description: List of stored libraries
         """
-        query = StoredLibrary.query
-        
-        # Filters
-        if urn := request.args.get('urn'):
-            query = query.filter(StoredLibrary.urn.ilike(f'%{urn}%'))
-        if locale := request.args.get('locale'):
-            query = query.filter_by(locale=locale)
-        if version := request.args.get('version'):
-            query = query.filter_by(version=version)
-        if provider := request.args.get('provider'):
-            query = query.filter_by(provider=provider)
-        if object_type := request.args.get('object_type'):
-            query = query.filter_by(object_type=object_type)
-        if request.args.get('is_loaded') is not None:
-            is_loaded = request.args.get('is_loaded').lower() == 'true'
-            query = query.filter_by(is_loaded=is_loaded)
-        
-        # Search
-        if search := request.args.get('search'):
-            query = query.filter(
-                db.or_(
-                    StoredLibrary.name.ilike(f'%{search}%'),
-                    StoredLibrary.description.ilike(f'%{search}%'),
-                    StoredLibrary.ref_id.ilike(f'%{search}%')
-                )
-            )
-        
         # Pagination
         limit = int(request.args.get('limit', 20))
         offset = int(request.args.get('offset', 0))
         
-        total = query.count()
-        libraries = query.limit(limit).offset(offset).all()
+        includes = requested_includes(StoredLibrary)
+        options = view_options()
         
-        return jsonify({
-            'count': total,
-            'results': [lib.to_dict() for lib in libraries]
-        }), 200
+        def _compute():
+            total, results = 0, []
+            # Primary rows first, then the bundle's other libraries
+            for source in catalog_sources():
+                with source:
+                    query = filter_stored_libraries(StoredLibrary.query, request.args)
+                    # Plain COUNT(*): Query.count() wraps a SELECT of every column
+                    count = query.with_entities(db.func.count(StoredLibrary.id)).scalar()
+                    wanted, skipped = limit - len(results), max(offset - total, 0)
+                    if wanted > 0 and skipped < count:
+                        libraries = query.options(*include_options(StoredLibrary, includes)) \
+                            .limit(wanted).offset(skipped).all()
+                        results.extend(serialize(lib, includes, **options) for lib in libraries)
+                    total += count
+            
+            data = {
+                'count': total,
+                'results': results
+            }
+            if request.args.get('facets', 'false').lower() == 'true':
+                data['facets'] = json.loads(get_catalog_facets(request.args))
+            return encode_json(data)
+        
+        # Pages are cached until the catalog changes, like the facets
+        key = 'list:' + '&'.join(f'{key}={value}' for key, value in sorted(request.args.items(multi=True)))
+        key += f"|locale={options.get('locale')}"
+        return json_bytes_response(cache.get_or_compute(CATALOG_NAMESPACE, key, _compute))
+    
+    
+    @app.route('/api/stored-libraries/facets/', methods=['GET'])
+    def get_stored_library_facets():
+        """
+        Get Catalog Facets
+        ---
+        tags:
+          - Stored Libraries
+        summary: Counts per provider, locale, object type, loaded status and packager
+        description: Accepts the same filters as the catalog list; all dimensions come from one grouped query
+        parameters:
+          - name: search
+            in: query
+            type: string
+            description: Search in name and description
+          - name: provider
+            in: query
+            type: string
+            description: Filter by provider
+          - name: object_type
+            in: query
+            type: string
+            description: Filter by object type
+          - name: is_loaded
+            in: query
+            type: boolean
+            description: Filter by loaded status
+        responses:
+          200:
+            description: Dict of dimension -> list of {value, count}
+        """
+        return json_bytes_response(get_catalog_facets(request.args))
     
     
     @app.route('/api/stored-libraries/<path:library_id>/', methods=['GET'])
@@ -125,17 +163,13 @@ def register_library_routes(app):
           404:
             description: Library not found
         """
-        library = StoredLibrary.query.filter(
-            db.or_(
-                StoredLibrary.id == library_id,
-                StoredLibrary.urn == library_id
-            )
-        ).first()
-        
-        if not library:
-            return jsonify({'error': 'Library not found'}), 404
-        
-        return jsonify(library.to_dict()), 200
+        with stored_library(library_id) as library:
+            if not library:
+                return jsonify({'error': 'Library not found'}), 404
+            
+            includes = requested_includes(StoredLibrary)
+            library = load_with_includes(StoredLibrary, library, includes)
+            return jsonify(serialize(library, includes, **view_options())), 200
     
     
     @app.route('/api/stored-libraries/<path:library_id>/content/', methods=['GET'])
@@ -151,21 +185,45 @@ def register_library_routes(app):
             in: path
             required: true
             type: string
+          - name: path
+            in: query
+            type: string
+            description: JSON Pointer into the content, e.g. /objects/framework/requirement_nodes
+          - name: limit
+            in: query
+            type: integer
+            default: 100
+            description: Page size when the path points to an array
+          - name: offset
+            in: query
+            type: integer
+            default: 0
+            description: Page offset when the path points to an array
         responses:
           200:
-            description: Library content with all objects
+            description: Library content with all objects, or the value at path
+          400:
+            description: Invalid JSON Pointer, limit or offset
+          404:
+            description: Library or path not found
         """
-        library = StoredLibrary.query.filter(
-            db.or_(
-                StoredLibrary.id == library_id,
-                StoredLibrary.urn == library_id
-            )
-        ).first()
-        
-        if not library:
-            return jsonify({'error': 'Library not found'}), 404
-        
-        return jsonify(library.to_dict(include_content=True)), 200
+        with stored_library(library_id) as library:
+            if not library:
+                return jsonify({'error': 'Library not found'}), 404
+            
+            if (path := request.args.get('path')) is not None:
+                return get_stored_library_content_at(library, path)
+            
+            def _compute():
+                # Splice the stored JSON in as-is instead of parsing and re-encoding it
+                body = encode_json(library.to_dict())
+                content_json = library.content_json
+                if content_json in (None, b'{}'):
+                    return body
+                return body.rstrip()[:-1] + b', "content": ' + content_json + b'}\n'
+            
+            body = cache.get_or_compute(library_namespace(library.urn), 'stored-content', _compute)
+            return json_bytes_response(body)
     
     
     @app.route('/api/stored-libraries/<path:library_id>/tree/', methods=['GET'])
@@ -185,28 +243,26 @@ def register_library_routes(app):
           200:
             description: Nested requirement hierarchy
         """
-        library = StoredLibrary.query.filter(
-            db.or_(
-                StoredLibrary.id == library_id,
-                StoredLibrary.urn == library_id
-            )
-        ).first()
-        
-        if not library:
-            return jsonify({'error': 'Library not found'}), 404
-        
-        if not library.content or 'objects' not in library.content:
-            return jsonify({'tree': []}), 200
-        
-        # Extract requirement nodes and build tree
-        objects = library.content.get('objects', {})
-        if 'framework' in objects:
-            nodes = objects['framework'].get('requirement_nodes', [])
-            # Build hierarchy
-            tree = build_requirement_tree(nodes)
-            return jsonify({'tree': tree}), 200
-        
-        return jsonify({'tree': []}), 200
+        with stored_library(library_id) as library:
+            if not library:
+                return jsonify({'error': 'Library not found'}), 404
+            
+            def _compute():
+                if not library.content or 'objects' not in library.content:
+                    return encode_json({'tree': []})
+                
+                # Extract requirement nodes and build tree
+                objects = library.content.get('objects', {})
+                if 'framework' in objects:
+                    nodes = objects['framework'].get('requirement_nodes', [])
+                    # Build hierarchy
+                    tree = build_requirement_tree(nodes)
+                    return encode_json({'tree': tree})
+                
+                return encode_json({'tree': []})
+            
+            body = cache.get_or_compute(library_namespace(library.urn), 'stored-tree', _compute)
+            return json_bytes_response(body)
     
     
     @app.route('/api/stored-libraries/<path:library_id>/import/', methods=['POST'])
@@ -230,12 +286,7 @@ def register_library_routes(app):
           404:
             description: Library not found
         """
-        library = StoredLibrary.query.filter(
-            db.or_(
-                StoredLibrary.id == library_id,
-                StoredLibrary.urn == library_id
-            )
-        ).first()
+        library = primary_stored_library(library_id)
         
         if not library:
             return jsonify({'error': 'Library not found'}), 404
@@ -259,6 +310,7 @@ def register_library_routes(app):
         db.session.flush()  # Flush to DB so foreign keys work
         
         # Now parse and import objects from library content
+        mappings = None
         if library.content and 'objects' in library.content:
             objects = library.content['objects']
             
@@ -275,16 +327,85 @@ def register_library_routes(app):
                 import_risk_matrices(objects['risk_matrix'], library.urn)
             
             # Import mapping sets
-            if 'requirement_mapping_sets' in objects:
-                import_mapping_sets(objects['requirement_mapping_sets'], library.urn)
+            if mapping_sets := library_mapping_sets(objects):
+                mappings = ingest_mapping_sets(mapping_sets, library.urn)
         
         # Commit everything
         db.session.commit()
+        cache.invalidate_library(library.urn)
+        cache.invalidate_catalog()
         
-        return jsonify({
+        response = {
             'status': 'success',
             'message': 'Library loaded successfully',
             'library': loaded.to_dict()
+        }
+        if mappings:
+            response['mappings'] = mappings
+        return jsonify(response), 200
+    
+    
+    @app.route('/api/stored-libraries/<path:library_id>/upgrade/', methods=['POST'])
+    def upgrade_stored_library(library_id):
+        """
+        Upgrade Loaded Library
+        ---
+        tags:
+          - Stored Libraries
+        summary: Apply a newer library version to its loaded objects
+        description: Diffs the stored content against the loaded rows by URN and only writes inserted, changed and removed objects. A newer version in the bundled catalog first replaces the stored copy.
+        parameters:
+          - name: library_id
+            in: path
+            required: true
+            type: string
+          - name: force
+            in: query
+            type: boolean
+            description: Resynchronize even if the versions match or the stored one is older
+        responses:
+          200:
+            description: Per-table counts of inserted, updated and deleted rows
+          400:
+            description: Library not loaded or stored version is older
+          404:
+            description: Library not found
+        """
+        library = primary_stored_library(library_id, refresh=True)
+        
+        if not library:
+            return jsonify({'error': 'Library not found'}), 404
+        
+        loaded = identity_cache.get(LoadedLibrary, library.urn)
+        if not library.is_loaded or not loaded:
+            return jsonify({'error': 'Library not loaded'}), 400
+        
+        force = request.args.get('force', 'false').lower() == 'true'
+        comparison = compare_versions(library.version, loaded.version)
+        if not force and comparison == 0:
+            return jsonify({
+                'status': 'success',
+                'message': 'Library already up to date',
+                'library': loaded.to_dict()
+            }), 200
+        if not force and comparison < 0:
+            return jsonify({'error': f'Stored version {library.version} is older than loaded version {loaded.version}'}), 400
+        
+        objects = (library.content or {}).get('objects', {})
+        changes = upgrade_library_objects(objects, library.urn)
+        
+        for key in ('ref_id', 'locale', 'name', 'version', 'provider'):
+            setattr(loaded, key, getattr(library, key))
+        db.session.commit()
+        cache.invalidate_library(library.urn)
+        # The stored row may have been refreshed from the bundle
+        cache.invalidate_catalog()
+        
+        return jsonify({
+            'status': 'success',
+            'message': 'Library upgraded',
+            'library': loaded.to_dict(),
+            'changes': changes
         }), 200
     
     
@@ -305,17 +426,20 @@ def register_library_routes(app):
           200:
             description: Library unloaded
         """
-        library = StoredLibrary.query.filter(
-            db.or_(
-                StoredLibrary.id == library_id,
-                StoredLibrary.urn == library_id
-            )
-        ).first()
-        
+        library = identity_cache.get(StoredLibrary, library_id)
         if library:
             library.is_loaded = False
-            LoadedLibrary.query.filter_by(urn=library.urn).delete()
+            library_urn = library.urn
+        else:
+            # Bundled rows take is_loaded from loaded_libraries alone
+            with bundled_library(library_id) as bundled:
+                library_urn = bundled.urn if bundled else None
+        
+        if library_urn:
+            LoadedLibrary.query.filter_by(urn=library_urn).delete()
             db.session.commit()
+            cache.invalidate_library(library_urn)
+            cache.invalidate_catalog()
         
         return jsonify({'status': 'success', 'message': 'Library unloaded'}), 200
     
@@ -354,6 +478,9 @@ def register_library_routes(app):
             library = create_stored_library_from_yaml(content)
             db.session.add(library)
             db.session.commit()
+            # May shadow the bundled library with the same URN
+            cache.invalidate_library(library.urn)
+            cache.invalidate_catalog()
             
             return jsonify({
                 'status': 'success',
@@ -376,9 +503,8 @@ def register_library_routes(app):
           200:
             description: Dict of provider names
         """
-        providers = db.session.query(StoredLibrary.provider).distinct().all()
         return jsonify({
-            'providers': [p[0] for p in providers if p[0]]
+            'providers': catalog_distinct(StoredLibrary.provider)
         }), 200
     
     
@@ -394,9 +520,8 @@ def register_library_routes(app):
           200:
             description: List of locales
         """
-        locales = db.session.query(StoredLibrary.locale).distinct().all()
         return jsonify({
-            'locales': [l[0] for l in locales if l[0]]
+            'locales': catalog_distinct(StoredLibrary.locale)
         }), 200
     
     
@@ -412,9 +537,8 @@ def register_library_routes(app):
           200:
             description: List of types
         """
-        types = db.session.query(StoredLibrary.object_type).distinct().all()
         return jsonify({
-            'object_types': [t[0] for t in types if t[0]]
+            'object_types': catalog_distinct(StoredLibrary.object_type)
         }), 200
     
     
@@ -434,25 +558,283 @@ def register_library_routes(app):
         responses:
           200:
             description: Library deleted
+          400:
+            description: Library only in the bundled catalog (read-only)
         """
-        library = StoredLibrary.query.filter(
-            db.or_(
-                StoredLibrary.id == library_id,
-                StoredLibrary.urn == library_id
-            )
-        ).first()
+        library = identity_cache.get(StoredLibrary, library_id)
+        
+        if not library:
+            with bundled_library(library_id) as bundled:
+                if bundled:
+                    return jsonify({'error': 'Bundled catalog libraries cannot be deleted'}), 400
         
         if library:
+            library_urn = library.urn
             db.session.delete(library)
             db.session.commit()
+            cache.invalidate_library(library_urn)
+            cache.invalidate_catalog()
         
         return jsonify({'status': 'success', 'message': 'Library deleted'}), 200
 
 
 # ==================== HELPER FUNCTIONS ====================
 
+CATALOG_FILTER_ARGS = ('urn', 'locale', 'version', 'provider', 'object_type', 'is_loaded', 'search')
+FACET_DIMENSIONS = ('provider', 'locale', 'object_type', 'is_loaded', 'packager')
+
+
+def loaded_library_urns():
+    """URNs of the loaded libraries, cached until the catalog changes"""
+    body = cache.get_or_compute(
+        CATALOG_NAMESPACE, 'loaded-urns',
+        lambda: encode_json(sorted(urn for (urn,) in db.session.query(LoadedLibrary.urn)))
+    )
+    return json.loads(body)
+
+
+def primary_library_urns():
+    """URNs of the libraries stored in the primary database, cached until the catalog changes"""
+    body = cache.get_or_compute(
+        CATALOG_NAMESPACE, 'primary-urns',
+        lambda: encode_json(sorted(urn for (urn,) in db.session.query(StoredLibrary.urn)))
+    )
+    return json.loads(body)
+
+
+def bundle_source():
+    """Read context of the bundle, minus the libraries the primary database stores too"""
+    return bundle_reads(loaded_library_urns(), primary_library_urns())
+
+
+def catalog_sources():
+    """Read contexts of the catalog: the primary database, then the bundle minus the primary's URNs
+
+    With a bundle, the primary database is skipped while it stores no library.
+    """
+    if not catalog_bundled():
+        return [nullcontext()]
+    shadowed = primary_library_urns()
+    return ([nullcontext()] if shadowed else []) + [bundle_source()]
+
+
+@contextmanager
+def bundled_library(library_id):
+    """Yield the bundle's stored library with id or URN ``library_id`` (None without one), under bundle reads
+
+    Bundle rows are looked up directly, never through the identity cache.
+    """
+    if not catalog_bundled():
+        yield None
+        return
+    with bundle_source():
+        yield StoredLibrary.query.filter(
+            db.or_(StoredLibrary.id == library_id, StoredLibrary.urn == library_id)
+        ).first()
+
+
+@contextmanager
+def stored_library(library_id):
+    """Yield the stored library with id or URN ``library_id``, or None
+
+    The primary database wins; otherwise the block runs with bundle reads so
+    that the row's content loads from the bundle too.
+    """
+    library = identity_cache.get(StoredLibrary, library_id)
+    if library is not None:
+        yield library
+        return
+    with bundled_library(library_id) as library:
+        yield library
+
+
+STORED_LIBRARY_COPY_EXCLUDE = ('legacy_content', 'is_loaded', 'created_at', 'updated_at')
+
+
+def primary_stored_library(library_id, refresh=False):
+    """The stored library ``library_id`` in the primary database, copied there from the bundle if needed
+
+    Loaded libraries reference their stored row, so importing a library that
+    only the bundle has first copies it (metadata and content) into the
+    primary database. With ``refresh``, a newer bundled version replaces
+    the primary copy, so that rebuilding the bundle makes upgrades
+    available. Returns None when neither database stores the library.
+    """
+    library = identity_cache.get(StoredLibrary, library_id)
+    if not catalog_bundled() or (library is not None and not refresh):
+        return library
+    
+    # Both rows have the same identity: only one may be in the session at a time
+    if library is not None:
+        db.session.expunge(library)
+    with bundled_library(library_id) as bundled:
+        newer = bundled is not None and (library is None or compare_versions(bundled.version, library.version) > 0)
+        if newer:
+            values = {
+                attr.key: getattr(bundled, attr.key)
+                for attr in db.inspect(StoredLibrary).column_attrs if attr.key not in STORED_LIBRARY_COPY_EXCLUDE
+            }
+            content = bundled.content
+        if bundled is not None:
+            db.session.expunge(bundled)
+    if library is not None:
+        db.session.add(library)
+    if not newer:
+        return library
+    
+    if library is None:
+        library = StoredLibrary(is_loaded=False, **values)
+        db.session.add(library)
+    else:
+        for key, value in values.items():
+            setattr(library, key, value)
+    library.content = content
+    db.session.flush()
+    return library
+
+
+def catalog_distinct(column):
+    """Sorted distinct non-empty values of a StoredLibrary column over the whole catalog"""
+    values = set()
+    for source in catalog_sources():
+        with source:
+            values.update(value for (value,) in
+                          filter_stored_libraries(db.session.query(column), {}).distinct() if value)
+    return sorted(values)
+
+
+def is_loaded_column():
+    """``StoredLibrary.is_loaded``, or its value from the primary database during catalog reads"""
+    loaded_urns = catalog_loaded_urns()
+    if loaded_urns is None:
+        return StoredLibrary.is_loaded
+    return db.type_coerce(StoredLibrary.urn.in_(sorted(loaded_urns)), db.Boolean)
+
+
+def filter_stored_libraries(query, args):
+    """Apply the catalog list filters and search of ``args`` to ``query``"""
+    # Filters
+    if urn := args.get('urn'):
+        query = query.filter(StoredLibrary.urn.ilike(f'%{urn}%'))
+    if locale := args.get('locale'):
+        query = query.filter_by(locale=locale)
+    if version := args.get('version'):
+        query = query.filter_by(version=version)
+    if provider := args.get('provider'):
+        query = query.filter_by(provider=provider)
+    if object_type := args.get('object_type'):
+        query = query.filter_by(object_type=object_type)
+    if args.get('is_loaded') is not None:
+        is_loaded = args.get('is_loaded').lower() == 'true'
+        query = query.filter(is_loaded_column() == is_loaded)
+    
+    # Search
+    if search := args.get('search'):
+        query = query.filter(
+            db.or_(
+                StoredLibrary.name.ilike(f'%{search}%'),
+                StoredLibrary.description.ilike(f'%{search}%'),
+                StoredLibrary.ref_id.ilike(f'%{search}%')
+            )
+        )
+    
+    # Bundle reads: libraries the primary database stores too are served from there
+    if shadowed := catalog_shadowed_urns():
+        query = query.filter(StoredLibrary.urn.notin_(sorted(shadowed)))
+    
+    return query
+
+
+def get_catalog_facets(args):
+    """Encoded facet counts for the catalog filtered by ``args``, cached until the catalog changes"""
+    filters = {key: args.get(key) for key in CATALOG_FILTER_ARGS if args.get(key) is not None}
+    
+    def _compute():
+        facets = {dimension: {} for dimension in FACET_DIMENSIONS}
+        total = 0
+        # One grouped query per source (primary, then bundle)
+        for source in catalog_sources():
+            with source:
+                columns = [
+                    is_loaded_column() if dimension == 'is_loaded' else getattr(StoredLibrary, dimension)
+                    for dimension in FACET_DIMENSIONS
+                ]
+                query = filter_stored_libraries(
+                    db.session.query(*columns, db.func.count(StoredLibrary.id)), filters
+                ).group_by(*columns)
+                for *values, count in query:
+                    total += count
+                    for dimension, value in zip(FACET_DIMENSIONS, values):
+                        facets[dimension][value] = facets[dimension].get(value, 0) + count
+        
+        return encode_json({
+            'count': total,
+            'facets': {
+                dimension: [
+                    {'value': value, 'count': count}
+                    for value, count in sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))
+                    if value is not None and value != ''
+                ]
+                for dimension, counts in facets.items()
+            }
+        })
+    
+    key = 'facets:' + '&'.join(f'{key}={value}' for key, value in sorted(filters.items()))
+    return cache.get_or_compute(CATALOG_NAMESPACE, key, _compute)
+
+
+def get_stored_library_content_at(library, path):
+    """Response for ?path= on the content endpoint (paginated for arrays)
+
+    Compressed content is served from its byte-offset index: the value or
+    the requested page is spliced in as raw JSON. Missing paths are 404s
+    and are not cached.
+    """
+    try:
+        limit = int(request.args.get('limit', 100))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    if limit < 0 or offset < 0:
+        return jsonify({'error': 'limit and offset must not be negative'}), 400
+    
+    try:
+        parse_pointer(path)
+    except PointerError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    blob = library.content_blob
+    if blob is None:
+        # Legacy uncompressed content column
+        try:
+            value = resolve_pointer(library.content or {}, path)
+        except (KeyError, IndexError):
+            return jsonify({'error': 'Path not found'}), 404
+        if isinstance(value, list):
+            return jsonify({'path': path, 'count': len(value), 'offset': offset, 'limit': limit,
+                            'results': value[offset:offset + limit]}), 200
+        return jsonify({'path': path, 'value': value}), 200
+    
+    index = content_indexes.get(blob.content_hash, blob.raw)
+    try:
+        page = index.page(path, offset, limit)
+        if page is not None:
+            count, results = page
+            head, field, value = {'path': path, 'count': count, 'offset': offset, 'limit': limit}, 'results', results
+        else:
+            head, field, value = {'path': path}, 'value', index.value(path)
+    except KeyError:
+        return jsonify({'error': 'Path not found'}), 404
+    
+    body = encode_json(head)
+    return json_bytes_response(body.rstrip()[:-1] + f', "{field}": '.encode() + value + b'}\n')
+
+
 def build_requirement_tree(nodes):
     """Build hierarchical tree from flat requirement list"""
+    # Work on copies: the nodes belong to the library's parsed content
+    nodes = [dict(node) for node in nodes if isinstance(node, dict)]
+    
     # Create lookup dict
     node_dict = {node.get('urn'): node for node in nodes if isinstance(node, dict)}
     
@@ -472,22 +854,26 @@ def build_requirement_tree(nodes):
     return roots
 
 
+def library_object_type(objects):
+    """Catalog object type of a library from the keys of its ``objects``"""
+    if not objects:
+        return 'mixed'
+    if 'framework' in objects:
+        return 'framework'
+    if 'reference_controls' in objects:
+        return 'reference_controls'
+    if 'risk_matrix' in objects:
+        return 'risk_matrix'
+    if 'requirement_mapping_sets' in objects or 'requirement_mapping_set' in objects:
+        return 'mapping'
+    return 'mixed'
+
+
 def create_stored_library_from_yaml(content):
     """Create StoredLibrary model from YAML content"""
     urn = content.get('urn', '')
     
-    # Determine object type
-    object_type = 'mixed'
-    if 'objects' in content:
-        objects = content['objects']
-        if 'framework' in objects:
-            object_type = 'framework'
-        elif 'reference_controls' in objects:
-            object_type = 'reference_controls'
-        elif 'risk_matrix' in objects:
-            object_type = 'risk_matrix'
-        elif 'requirement_mapping_sets' in objects:
-            object_type = 'mapping'
+    object_type = library_object_type(content.get('objects'))
     
     library = StoredLibrary(
         id=urn,
@@ -515,62 +901,205 @@ def create_stored_library_from_yaml(content):
     return library
 
 
-def import_framework_from_library(framework_data, library_urn):
-    """Import framework and requirements from library"""
+# ==================== ROW BUILDERS ====================
+# Column values of library objects, shared by first import and upgrade
+
+def framework_row(framework_data, library_urn):
     urn = framework_data.get('urn')
+    return {
+        'id': urn,
+        'urn': urn,
+        'ref_id': framework_data.get('ref_id', ''),
+        'name': framework_data.get('name', ''),
+        'description': framework_data.get('description', ''),
+        'library_urn': library_urn,
+        'min_score': framework_data.get('min_score'),
+        'max_score': framework_data.get('max_score'),
+        'scores_definition': framework_data.get('scores_definition', []),
+        'implementation_groups_definition': framework_data.get('implementation_groups_definition'),
+        'translations': framework_data.get('translations', {})
+    }
+
+
+def implementation_group_masks(framework_data):
+    """{node URN: (ig_mask, ig_subtree_mask)} of the requirement nodes of a framework
     
-    # Create framework
-    framework = Framework(
-        id=urn,
-        urn=urn,
-        ref_id=framework_data.get('ref_id', ''),
-        name=framework_data.get('name', ''),
-        description=framework_data.get('description', ''),
-        library_urn=library_urn,
-        min_score=framework_data.get('min_score'),
-        max_score=framework_data.get('max_score'),
-        scores_definition=framework_data.get('scores_definition', []),
-        translations=framework_data.get('translations', {})
-    )
+    Each node's own bits are pushed up its parent chain, stopping at the
+    first ancestor that already has them (its own ancestors have them too).
+    """
+    bits = implementation_group_bits(framework_data.get('implementation_groups_definition'))
+    nodes = framework_data.get('requirement_nodes', [])
+    own = {node.get('urn'): implementation_group_mask(node.get('implementation_groups'), bits) for node in nodes}
+    parents = {node.get('urn'): node.get('parent_urn') for node in nodes}
+    
+    subtree = dict.fromkeys(own, 0)
+    for urn, mask in own.items():
+        while urn in subtree and subtree[urn] | mask != subtree[urn]:
+            subtree[urn] |= mask
+            urn = parents.get(urn)
+    return {urn: (mask, subtree[urn]) for urn, mask in own.items()}
+
+
+def requirement_node_rows(framework_data):
+    framework_urn = framework_data.get('urn')
+    masks = implementation_group_masks(framework_data)
+    return [
+        {
+            'id': req_data.get('urn'),
+            'urn': req_data.get('urn'),
+            'ref_id': req_data.get('ref_id'),
+            'name': req_data.get('name'),
+            'description': req_data.get('description'),
+            'framework_id': framework_urn,
+            'parent_urn': req_data.get('parent_urn'),
+            'order_id': req_data.get('order_id', 0),
+            'assessable': req_data.get('assessable', True),
+            'implementation_groups': req_data.get('implementation_groups'),
+            'ig_mask': masks[req_data.get('urn')][0],
+            'ig_subtree_mask': masks[req_data.get('urn')][1],
+            'translations': req_data.get('translations', {})
+        }
+        for req_data in framework_data.get('requirement_nodes', [])
+    ]
+
+
+def reference_control_row(control_data, library_urn):
+    return {
+        'id': control_data.get('urn'),
+        'urn': control_data.get('urn'),
+        'ref_id': control_data.get('ref_id'),
+        # Some libraries only give a ref_id; name is mandatory
+        'name': control_data.get('name') or control_data.get('ref_id') or control_data.get('urn'),
+        'description': control_data.get('description'),
+        'library_urn': library_urn,
+        'category': control_data.get('category'),
+        'csf_function': control_data.get('csf_function'),
+        'annotation': control_data.get('annotation'),
+        'typical_evidence': control_data.get('typical_evidence'),
+        'translations': control_data.get('translations', {})
+    }
+
+
+def risk_matrix_row(matrix_data, library_urn):
+    return {
+        'id': matrix_data.get('urn'),
+        'urn': matrix_data.get('urn'),
+        'ref_id': matrix_data.get('ref_id'),
+        'name': matrix_data.get('name'),
+        'description': matrix_data.get('description'),
+        'library_urn': library_urn,
+        'probability': matrix_data.get('probability', []),
+        'impact': matrix_data.get('impact', []),
+        'grid': matrix_data.get('grid', []),
+        'risk_levels': matrix_data.get('risk', []),
+        'translations': matrix_data.get('translations', {})
+    }
+
+
+def mapping_set_row(mapping_data, library_urn):
+    return {
+        'id': mapping_data.get('urn'),
+        'urn': mapping_data.get('urn'),
+        'ref_id': mapping_data.get('ref_id'),
+        'name': mapping_data.get('name'),
+        'description': mapping_data.get('description'),
+        'library_urn': library_urn,
+        'source_framework_urn': mapping_data.get('source_framework_urn'),
+        'target_framework_urn': mapping_data.get('target_framework_urn'),
+        'translations': mapping_data.get('translations', {})
+    }
+
+
+def library_mapping_sets(objects):
+    """Mapping sets of a library: ``requirement_mapping_sets`` (list) or ``requirement_mapping_set`` (one)"""
+    mapping_sets = list(objects.get('requirement_mapping_sets') or [])
+    if objects.get('requirement_mapping_set'):
+        mapping_sets.append(objects['requirement_mapping_set'])
+    return mapping_sets
+
+
+def iter_mapping_rows(mapping_data):
+    """Mapping rows of a set, first occurrence of each (source, target) pair
+    
+    Reads ``requirement_mappings`` entries (source_requirement_urn,
+    target_requirement_urn, relationship, strength_of_relationship) and the
+    older ``mappings`` entries (source, target).
+    """
+    set_urn = mapping_data.get('urn')
+    seen = set()
+    for item in chain(mapping_data.get('requirement_mappings') or [], mapping_data.get('mappings') or []):
+        source = item.get('source_requirement_urn') or item.get('source')
+        target = item.get('target_requirement_urn') or item.get('target')
+        if not source or not target or (source, target) in seen:
+            continue
+        seen.add((source, target))
+        yield {
+            'mapping_set_id': set_urn,
+            'source_requirement_urn': source,
+            'target_requirement_urn': target,
+            'relationship_type': item.get('relationship', 'related'),
+            'strength': item.get('strength_of_relationship', item.get('strength')),
+            'rationale': item.get('rationale')
+        }
+
+
+# ==================== IMPORT ====================
+
+def sync_requirement_links(framework_data):
+    """Bring the requirement -> reference control / threat links of a framework in line with its content
+    
+    The URN lists of every requirement node are interned in one pass, then
+    each link table gets one read, one batched insert and one batched delete
+    at most. Returns per-table counts.
+    """
+    framework_id = framework_data.get('urn')
+    wanted_urns = {
+        field: [(node.get('urn'), urn) for node in framework_data.get('requirement_nodes', [])
+                for urn in node.get(field) or [] if node.get('urn') and urn]
+        for field in REQUIREMENT_LINKS
+    }
+    ids = intern_urns(db.session.connection(),
+                      (urn for pairs in wanted_urns.values() for pair in pairs for urn in pair))
+    
+    changes = {}
+    for field, (model, target_column) in REQUIREMENT_LINKS.items():
+        wanted = {(ids[requirement_urn], ids[target_urn]) for requirement_urn, target_urn in wanted_urns[field]}
+        existing = set(db.session.execute(
+            db.select(model.requirement_urn_id, target_column).where(model.framework_id == framework_id)
+        ))
+        inserts, deletes = wanted - existing, existing - wanted
+        if inserts:
+            db.session.execute(db.insert(model), [
+                {'requirement_urn_id': requirement_id, target_column.key: target_id, 'framework_id': framework_id}
+                for requirement_id, target_id in sorted(inserts)
+            ])
+        for start in range(0, len(deletes), UPGRADE_DELETE_BATCH):
+            batch = sorted(deletes)[start:start + UPGRADE_DELETE_BATCH]
+            db.session.execute(db.delete(model).where(
+                model.framework_id == framework_id,
+                db.tuple_(model.requirement_urn_id, target_column).in_(batch)))
+        changes[model.__tablename__] = {'inserted': len(inserts), 'deleted': len(deletes)}
+    return changes
+
+
+def import_framework_from_library(framework_data, library_urn):
+    """Import framework and requirements from library"""
+    framework = Framework(**framework_row(framework_data, library_urn))
     db.session.add(framework)
     
     # Import requirements
-    if 'requirement_nodes' in framework_data:
-        for req_data in framework_data['requirement_nodes']:
-            req = RequirementNode(
-                id=req_data.get('urn'),
-                urn=req_data.get('urn'),
-                ref_id=req_data.get('ref_id'),
-                name=req_data.get('name'),
-                description=req_data.get('description'),
-                framework_id=urn,
-                parent_urn=req_data.get('parent_urn'),
-                order_id=req_data.get('order_id', 0),
-                assessable=req_data.get('assessable', True),
-                translations=req_data.get('translations', {})
-            )
-            db.session.add(req)
+    for row in requirement_node_rows(framework_data):
+        db.session.add(RequirementNode(**row))
     
     db.session.flush()
+    sync_requirement_links(framework_data)
+    framework.refresh_tree_snapshots()
 
 
 def import_reference_controls(controls_data, library_urn):
     """Import reference controls from library"""
     for control_data in controls_data:
-        control = ReferenceControl(
-            id=control_data.get('urn'),
-            urn=control_data.get('urn'),
-            ref_id=control_data.get('ref_id'),
-            name=control_data.get('name'),
-            description=control_data.get('description'),
-            library_urn=library_urn,
-            category=control_data.get('category'),
-            csf_function=control_data.get('csf_function'),
-            annotation=control_data.get('annotation'),
-            typical_evidence=control_data.get('typical_evidence'),
-            translations=control_data.get('translations', {})
-        )
-        db.session.add(control)
+        db.session.add(ReferenceControl(**reference_control_row(control_data, library_urn)))
     
     db.session.flush()
 
@@ -578,50 +1107,225 @@ def import_reference_controls(controls_data, library_urn):
 def import_risk_matrices(matrices_data, library_urn):
     """Import risk matrices from library"""
     for matrix_data in matrices_data:
-        matrix = RiskMatrix(
-            id=matrix_data.get('urn'),
-            urn=matrix_data.get('urn'),
-            ref_id=matrix_data.get('ref_id'),
-            name=matrix_data.get('name'),
-            description=matrix_data.get('description'),
-            library_urn=library_urn,
-            probability=matrix_data.get('probability', []),
-            impact=matrix_data.get('impact', []),
-            grid=matrix_data.get('grid', []),
-            translations=matrix_data.get('translations', {})
-        )
-        db.session.add(matrix)
+        db.session.add(RiskMatrix(**risk_matrix_row(matrix_data, library_urn)))
     
     db.session.flush()
 
 
-def import_mapping_sets(mappings_data, library_urn):
-    """Import requirement mapping sets from library"""
-    for mapping_data in mappings_data:
-        mapping_set = RequirementMappingSet(
-            id=mapping_data.get('urn'),
-            urn=mapping_data.get('urn'),
-            ref_id=mapping_data.get('ref_id'),
-            name=mapping_data.get('name'),
-            description=mapping_data.get('description'),
-            library_urn=library_urn,
-            source_framework_urn=mapping_data.get('source_framework_urn'),
-            target_framework_urn=mapping_data.get('target_framework_urn'),
-            translations=mapping_data.get('translations', {})
+MAPPING_INSERT_BATCH = 2000
+
+
+def loaded_requirement_urns(framework_urns):
+    """{framework URN: set of requirement URNs} for the loaded frameworks among ``framework_urns`` (one query)"""
+    framework_urns = [urn for urn in set(framework_urns) if urn]
+    requirements = {}
+    if not framework_urns:
+        return requirements
+    rows = db.session.execute(
+        db.select(Framework.urn, RequirementNode.urn)
+        .outerjoin(RequirementNode, RequirementNode.framework_id == Framework.id)
+        .where(Framework.urn.in_(framework_urns))
+    )
+    for framework_urn, requirement_urn in rows:
+        urns = requirements.setdefault(framework_urn, set())
+        if requirement_urn:
+            urns.add(requirement_urn)
+    return requirements
+
+
+def checked_mapping_rows(mapping_sets_data, report):
+    """Mapping rows of ``mapping_sets_data`` whose requirements exist
+    
+    Requirement URNs are checked against the source / target frameworks when
+    those are loaded (one query for all sets); rows pointing to a requirement
+    missing from a loaded framework are counted in ``report['skipped']``.
+    Rows of frameworks not loaded yet are kept.
+    """
+    requirements = loaded_requirement_urns(
+        urn for data in mapping_sets_data for urn in (data.get('source_framework_urn'),
+                                                      data.get('target_framework_urn'))
+    )
+    report.setdefault('skipped', 0)
+    for data in mapping_sets_data:
+        source_urns = requirements.get(data.get('source_framework_urn'))
+        target_urns = requirements.get(data.get('target_framework_urn'))
+        for row in iter_mapping_rows(data):
+            if (source_urns is not None and row['source_requirement_urn'] not in source_urns) or \
+                    (target_urns is not None and row['target_requirement_urn'] not in target_urns):
+                report['skipped'] += 1
+                continue
+            yield row
+
+
+def ingest_mapping_sets(mapping_sets_data, library_urn, batch_size=MAPPING_INSERT_BATCH):
+    """Import requirement mapping sets, inserting their mappings in batches
+    
+    Returns counts of mapping sets, inserted and skipped mappings.
+    """
+    db.session.execute(db.insert(RequirementMappingSet),
+                       [mapping_set_row(data, library_urn) for data in mapping_sets_data])
+    
+    connection = db.session.connection()
+    report = {'mapping_sets': len(mapping_sets_data), 'mappings': 0, 'skipped': 0}
+    batch = []
+    
+    def flush_batch():
+        db.session.execute(db.insert(RequirementMapping), intern_rows(connection, RequirementMapping, batch))
+        report['mappings'] += len(batch)
+        batch.clear()
+    
+    for row in checked_mapping_rows(mapping_sets_data, report):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush_batch()
+    if batch:
+        flush_batch()
+    return report
+
+
+# ==================== UPGRADE ====================
+
+def compare_versions(new_version, old_version):
+    """-1, 0 or 1, comparing dotted versions part by part
+
+    Parts are compared as integers when both are numeric ('1.10' > '1.9'),
+    as strings otherwise; missing trailing parts count as 0 ('1' == '1.0').
+    """
+    new_parts, old_parts = str(new_version or '').split('.'), str(old_version or '').split('.')
+    for new_part, old_part in zip_longest(new_parts, old_parts, fillvalue='0'):
+        if new_part.isdigit() and old_part.isdigit():
+            new_part, old_part = int(new_part), int(old_part)
+        if new_part != old_part:
+            return 1 if new_part > old_part else -1
+    return 0
+
+
+UPGRADE_DELETE_BATCH = 500
+
+
+# Natural keys of the models with surrogate primary keys
+UPGRADE_KEYS = {
+    RequirementMapping: ('mapping_set_id', 'source_requirement_urn', 'target_requirement_urn'),
+}
+
+
+def diff_rows(model, new_rows, existing_query, key=('id',)):
+    """Compare ``new_rows`` with the rows of ``existing_query`` by ``key``
+    
+    Only the columns present in the new rows are compared; updates carry the
+    primary key of the existing row. Returns (inserts, updates, deleted_ids).
+    """
+    def key_of(row):
+        return tuple(row[column] for column in key)
+    
+    new_by_key = {key_of(row): row for row in new_rows}
+    columns = sorted({column for row in new_rows for column in row} | set(key) | {'id'})
+    existing = {
+        key_of(values): values
+        for values in (
+            row._asdict()
+            for row in existing_query.with_entities(*[getattr(model, column) for column in columns])
         )
-        db.session.add(mapping_set)
-        
-        # Import individual mappings
-        if 'mappings' in mapping_data:
-            for map_item in mapping_data['mappings']:
-                mapping = RequirementMapping(
-                    id=f"{mapping_set.urn}:{map_item.get('source')}:{map_item.get('target')}",
-                    mapping_set_id=mapping_set.id,
-                    source_requirement_urn=map_item.get('source'),
-                    target_requirement_urn=map_item.get('target'),
-                    relationship_type=map_item.get('relationship', 'related'),
-                    rationale=map_item.get('rationale')
-                )
-                db.session.add(mapping)
+    }
     
-    db.session.flush()
+    inserts = [row for row_key, row in new_by_key.items() if row_key not in existing]
+    updates = [
+        dict(row, id=existing[row_key]['id']) for row_key, row in new_by_key.items()
+        if row_key in existing and any(existing[row_key].get(column) != value for column, value in row.items())
+    ]
+    deleted_ids = [values['id'] for row_key, values in existing.items() if row_key not in new_by_key]
+    return inserts, updates, deleted_ids
+
+
+def upgrade_library_objects(objects, library_urn):
+    """Bring the loaded objects of a library in line with its new content
+    
+    Rows are matched by URN; only inserted, changed and removed rows are
+    written, with one batched statement per model and kind of change.
+    Returns per-model counts.
+    """
+    framework_data = objects.get('framework')
+    mapping_sets_data = library_mapping_sets(objects)
+    
+    plan = [
+        (Framework,
+         [framework_row(framework_data, library_urn)] if framework_data else [],
+         Framework.query.filter_by(library_urn=library_urn)),
+        (RequirementNode,
+         requirement_node_rows(framework_data) if framework_data else [],
+         RequirementNode.query.join(Framework).filter(Framework.library_urn == library_urn)),
+        (ReferenceControl,
+         [reference_control_row(data, library_urn) for data in objects.get('reference_controls', [])],
+         ReferenceControl.query.filter_by(library_urn=library_urn)),
+        (RiskMatrix,
+         [risk_matrix_row(data, library_urn) for data in objects.get('risk_matrix', [])],
+         RiskMatrix.query.filter_by(library_urn=library_urn)),
+        (RequirementMappingSet,
+         [mapping_set_row(data, library_urn) for data in mapping_sets_data],
+         RequirementMappingSet.query.filter_by(library_urn=library_urn)),
+        (RequirementMapping,
+         list(checked_mapping_rows(mapping_sets_data, {})),
+         RequirementMapping.query.join(RequirementMappingSet).filter(
+             RequirementMappingSet.library_urn == library_urn)),
+    ]
+    
+    connection = db.session.connection()
+    diffs = [
+        (model, diff_rows(model, intern_rows(connection, model, rows), query, UPGRADE_KEYS.get(model, ('id',))))
+        for model, rows, query in plan
+    ]
+    now = datetime.utcnow()
+    
+    # Parents before children for writes, children before parents for deletes
+    for model, (inserts, updates, _) in diffs:
+        if inserts:
+            db.session.execute(db.insert(model), inserts)
+        if updates:
+            if hasattr(model, 'updated_at'):
+                updates = [dict(row, updated_at=now) for row in updates]
+            db.session.execute(db.update(model), updates)
+    
+    for model, (_, _, deleted_ids) in reversed(diffs):
+        for start in range(0, len(deleted_ids), UPGRADE_DELETE_BATCH):
+            batch = deleted_ids[start:start + UPGRADE_DELETE_BATCH]
+            if model is Framework:
+                db.session.execute(db.delete(FrameworkTreeSnapshot).where(
+                    FrameworkTreeSnapshot.framework_id.in_(batch)))
+                for link_model, _ in REQUIREMENT_LINKS.values():
+                    db.session.execute(db.delete(link_model).where(link_model.framework_id.in_(batch)))
+                delete_framework_assessments(batch)
+            db.session.execute(db.delete(model).where(model.id.in_(batch)))
+            if model in TRACKED_MODELS:
+                SyncTombstone.record(db.session.connection(), model, batch)
+    
+    link_changes = sync_requirement_links(framework_data) if framework_data else {}
+    
+    # Compiled mapping matrices (app.coverage) are cached per mapping set updated_at
+    if any(changed for model, diff in diffs if model is RequirementMapping for changed in diff):
+        db.session.execute(db.update(RequirementMappingSet).where(
+            RequirementMappingSet.library_urn == library_urn).values(updated_at=now))
+    
+    # Bulk statements bypass loaded instances
+    db.session.expire_all()
+    
+    changed_frameworks = any(
+        inserts or updates or deleted_ids
+        for model, (inserts, updates, deleted_ids) in diffs
+        if model in (Framework, RequirementNode)
+    )
+    if changed_frameworks:
+        for framework in Framework.query.filter_by(library_urn=library_urn):
+            framework.refresh_tree_snapshots()
+            for assessment in framework.assessments:
+                rebuild_rollups(assessment)
+    
+    changes = {
+        model.__tablename__: {
+            'inserted': len(inserts),
+            'updated': len(updates),
+            'deleted': len(deleted_ids)
+        }
+        for model, (inserts, updates, deleted_ids) in diffs
+    }
+    changes.update(link_changes)
+    return changes
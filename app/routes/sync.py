@@ -0,0 +1,123 @@
+"""Delta sync routes: what changed since a client's last sync"""
+import base64
+import binascii
+from datetime import datetime, timedelta
+
+from flask import jsonify, request
+
+from app.includes import serialize
+from app.localization import view_options
+from app.models import (Framework, RequirementNode, ReferenceControl, RiskMatrix, RequirementMappingSet,
+                        SyncTombstone)
+
+# Collections of the change feed, by table name
+SYNC_COLLECTIONS = {
+    model.__tablename__: model
+    for model in (Framework, RequirementNode, ReferenceControl, RiskMatrix, RequirementMappingSet)
+}
+
+
+class SyncTokenError(ValueError):
+    """Malformed sync token"""
+
+
+def encode_sync_token(moment):
+    return base64.urlsafe_b64encode(moment.isoformat().encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_sync_token(token):
+    """Moment encoded in ``token``; None for an empty token (full sync)"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        return datetime.fromisoformat(base64.urlsafe_b64decode(padded).decode('ascii'))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise SyncTokenError('Invalid sync token') from e
+
+
+def collect_changes(since, until, collections, **options):
+    """Created, updated and deleted objects of ``collections`` in (since, until]
+
+    Without ``since`` every current object is returned as created and no
+    deletions are listed.
+    """
+    changes = {}
+    for name in collections:
+        model = SYNC_COLLECTIONS[name]
+        query = model.query
+        if since is not None:
+            query = query.filter(model.updated_at > since, model.updated_at <= until)
+        created, updated = [], []
+        for instance in query.order_by(model.updated_at, model.id):
+            is_new = since is None or instance.created_at is None or instance.created_at > since
+            (created if is_new else updated).append(serialize(instance, **options))
+        changes[name] = {'created': created, 'updated': updated, 'deleted': []}
+
+    if since is not None:
+        tombstones = SyncTombstone.query.filter(
+            SyncTombstone.object_type.in_(list(collections)),
+            SyncTombstone.deleted_at > since,
+            SyncTombstone.deleted_at <= until
+        ).order_by(SyncTombstone.id)
+        for tombstone in tombstones:
+            changes[tombstone.object_type]['deleted'].append(tombstone.object_id)
+    return changes
+
+
+def register_sync_routes(app):
+    """Register delta sync API routes"""
+
+    @app.route('/api/sync/', methods=['GET'])
+    def get_sync_changes():
+        """
+        Delta Sync
+        ---
+        tags:
+          - Sync
+        summary: Objects created, updated or deleted since a sync token
+        description: >
+          Call without a token for a full sync, then pass the returned next_token
+          on the following call to receive only what changed in between. Apply
+          deletions first, then upsert created and updated objects; an object can
+          be repeated across calls, so upserts must be idempotent. The window ends
+          SYNC_SAFETY_LAG_SECONDS before now, so recent changes show up again on the
+          next call.
+        parameters:
+          - name: since
+            in: query
+            type: string
+            description: next_token of the previous sync (omit for a full sync)
+          - name: types
+            in: query
+            type: string
+            description: Comma-separated collections (frameworks, requirement_nodes, reference_controls, risk_matrices, requirement_mapping_sets); all by default
+          - name: locale
+            in: query
+            type: string
+        responses:
+          200:
+            description: Changes per collection and the token for the next sync
+          400:
+            description: Invalid token or unknown collection
+        """
+        try:
+            since = decode_sync_token(request.args.get('since'))
+        except SyncTokenError as e:
+            return jsonify({'error': str(e)}), 400
+
+        types = request.args.get('types')
+        collections = [name.strip() for name in types.split(',') if name.strip()] if types else list(SYNC_COLLECTIONS)
+        unknown = [name for name in collections if name not in SYNC_COLLECTIONS]
+        if unknown:
+            return jsonify({'error': f'Unknown collections: {", ".join(unknown)}'}), 400
+
+        # updated_at is set at flush time, but the row is only visible once its
+        # transaction commits: end the window before any write still in flight
+        until = datetime.utcnow() - timedelta(seconds=app.config['SYNC_SAFETY_LAG_SECONDS'])
+        changes = collect_changes(since, until, collections, **view_options())
+        return jsonify({
+            'full_sync': since is None,
+            'changes': changes,
+            'next_token': encode_sync_token(until)
+        }), 200
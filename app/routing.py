@@ -0,0 +1,238 @@
+"""Engine routing for the session: bundled catalog, read replicas, primary
+
+Reads go to a read replica when replicas are configured
+(``DATABASE_REPLICA_URLS``) and the read happens in a GET/HEAD request or a
+``read_only()`` block. Everything else, and every statement of a session
+that has already written, uses the primary database.
+
+Read-your-writes: once a session flushes or executes a write it sticks to the
+primary, and the response sets a short-lived cookie so the same client's next
+requests read from the primary too (``REPLICA_STICKY_SECONDS``).
+
+Caches outlive replica lag, so they are filled from the primary:
+``primary_reads()`` blocks send reads to the primary even in GET requests,
+and ``replica_read()`` tells whether the request already read from a
+replica (values computed from those rows are not cached).
+
+Replica health: a replica whose connection fails is ejected for
+``REPLICA_EJECT_SECONDS``; healthy replicas are re-probed with ``SELECT 1`` at
+most every ``REPLICA_CHECK_INTERVAL`` seconds before being used.
+"""
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+import sqlalchemy as sa
+from flask import current_app, g, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+
+from app.catalog import CATALOG_TABLES, catalog_engine, catalog_reads_active
+
+REPLICA_KEY_PREFIX = 'replica_'
+STICKY_COOKIE = 'db_primary_until'
+READ_METHODS = ('GET', 'HEAD')
+
+
+def replica_engine_options(url, engine_options):
+    """Engine options of a replica: the primary's, minus the SSL arguments for SQLite"""
+    options = dict(engine_options)
+    if url.startswith('sqlite'):
+        options['connect_args'] = {}
+    return options
+
+
+@contextmanager
+def read_only():
+    """Allow replica reads outside GET requests (e.g. in scripts or read-only POSTs)"""
+    previous = g.get('replica_reads', False)
+    g.replica_reads = True
+    try:
+        yield
+    finally:
+        g.replica_reads = previous
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary within the block, e.g. rows that a cache will keep"""
+    if not has_app_context():
+        yield
+        return
+    previous = g.get('primary_reads', False)
+    g.primary_reads = True
+    try:
+        yield
+    finally:
+        g.primary_reads = previous
+
+
+def replica_read():
+    """True once the current app context has read from a replica"""
+    return has_app_context() and g.get('replica_read', False)
+
+
+def _replica_reads_allowed():
+    if not has_app_context() or g.get('primary_reads', False):
+        return False
+    if g.get('replica_reads', False):
+        return True
+    if not has_request_context() or request.method not in READ_METHODS:
+        return False
+    try:
+        sticky_until = float(request.cookies.get(STICKY_COOKIE, 0))
+    except ValueError:
+        sticky_until = 0
+    return sticky_until < time.time()
+
+
+class ReplicaSet:
+    """Read replicas of the primary database and their health"""
+
+    def __init__(self, app=None, db=None):
+        self.engines = {}
+        self.keys = []
+        self.sticky_seconds = 5
+        self.eject_seconds = 30
+        self.check_interval = 10
+        self._ejected_until = {}
+        self._checked_at = {}
+        self._round_robin = itertools.count()
+        self._lock = threading.Lock()
+        if app is not None and db is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        """Create the replica engines of ``app`` from ``DATABASE_REPLICA_URLS``
+
+        Use one ReplicaSet per app: it is registered as
+        ``app.extensions['replicas']`` and holds that app's engines and
+        replica health. The engines are not binds of the shared SQLAlchemy
+        extension, which would register replica metadata on the
+        module-level ``db`` for every other app of the process.
+        """
+        urls = app.config.get('DATABASE_REPLICA_URLS') or []
+        engine_options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        self.engines = {
+            f'{REPLICA_KEY_PREFIX}{index}': sa.create_engine(url, **replica_engine_options(url, engine_options))
+            for index, url in enumerate(urls)
+        }
+        self.keys = sorted(self.engines)
+        self.sticky_seconds = app.config.get('REPLICA_STICKY_SECONDS', 5)
+        self.eject_seconds = app.config.get('REPLICA_EJECT_SECONDS', 30)
+        self.check_interval = app.config.get('REPLICA_CHECK_INTERVAL', 10)
+        self._ejected_until = {}
+        self._checked_at = {}
+        self._reset_stats()
+        app.extensions['replicas'] = self
+        if not self.keys:
+            return
+
+        for key, engine in self.engines.items():
+            sa.event.listen(engine, 'handle_error', self._make_error_handler(key))
+        app.after_request(self._set_sticky_cookie)
+
+    def _reset_stats(self):
+        self.reads = {key: 0 for key in self.keys}
+        self.ejections = {key: 0 for key in self.keys}
+        self.fallbacks = 0
+
+    # ==================== SELECTION ====================
+
+    def choose(self):
+        """Engine of a healthy replica (round robin), or None to use the primary"""
+        for _ in range(len(self.keys)):
+            key = self.keys[next(self._round_robin) % len(self.keys)]
+            if self._is_healthy(key, self.engines[key]):
+                self.reads[key] += 1
+                return self.engines[key]
+        self.fallbacks += 1
+        return None
+
+    def _is_healthy(self, key, engine):
+        now = time.monotonic()
+        with self._lock:
+            if self._ejected_until.get(key, 0) > now:
+                return False
+            if now - self._checked_at.get(key, float('-inf')) < self.check_interval:
+                return True
+            self._checked_at[key] = now
+        try:
+            with engine.connect() as connection:
+                connection.execute(sa.text('SELECT 1'))
+        except sa.exc.DBAPIError:
+            self.eject(key)
+            return False
+        return True
+
+    def eject(self, key):
+        now = time.monotonic()
+        with self._lock:
+            if self._ejected_until.get(key, 0) <= now:
+                self.ejections[key] += 1
+            self._ejected_until[key] = now + self.eject_seconds
+
+    def _make_error_handler(self, key):
+        def handle_error(context):
+            if context.is_disconnect or context.connection is None:
+                self.eject(key)
+        return handle_error
+
+    # ==================== STICKINESS ====================
+
+    def _set_sticky_cookie(self, response):
+        # SameSite=None: the API is called cross-site (CORS with credentials),
+        # where a Lax cookie would not be sent back on the next fetch
+        if g.get('primary_sticky', False) and self.sticky_seconds > 0:
+            response.set_cookie(STICKY_COOKIE, f'{time.time() + self.sticky_seconds:.3f}',
+                                max_age=self.sticky_seconds, httponly=True, secure=True, samesite='None')
+        return response
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            'replicas': {
+                key: {
+                    'sessions': self.reads[key],
+                    'ejections': self.ejections[key],
+                    'healthy': self._ejected_until.get(key, 0) <= now,
+                }
+                for key in self.keys
+            },
+            'primary_fallbacks': self.fallbacks,
+        }
+
+
+class RoutingSession(Session):
+    """Session choosing the catalog, a replica or the primary engine per statement"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or isinstance(clause, sa.UpdateBase):
+                self._mark_write()
+            elif mapper is not None:
+                table = sa.inspect(mapper).local_table
+                if table.name in CATALOG_TABLES and catalog_reads_active():
+                    return catalog_engine()
+                engine = self._replica_for(table)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica_for(self, table):
+        if not has_app_context() or self.info.get('wrote') or table.metadata.info.get('bind_key') is not None:
+            return None
+        replicas = current_app.extensions.get('replicas')
+        if replicas is None or not replicas.keys or not _replica_reads_allowed():
+            return None
+        # One replica per session, so the reads of a request see one snapshot
+        if 'replica' not in self.info:
+            self.info['replica'] = replicas.choose()
+        if self.info['replica'] is not None:
+            g.replica_read = True
+        return self.info['replica']
+
+    def _mark_write(self):
+        self.info['wrote'] = True
+        if has_app_context():
+            g.primary_sticky = True
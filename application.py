@@ -9,12 +9,19 @@ from dotenv import load_dotenv
 from pathlib import Path
 import yaml
 from flasgger import Swagger
+from app.identity_cache import IdentityCache
+from app.cache import SharedCache
+from app.content_index import content_indexes
+from app.catalog import init_catalog
+from app.routing import ReplicaSet, RoutingSession
 
 load_dotenv()
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 jwt = JWTManager()
+identity_cache = IdentityCache()
+cache = SharedCache()
 
 
 def _get_int_env(name, default_value):
@@ -82,14 +89,60 @@ def create_app():
     app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
         'pool_pre_ping': True,
         'pool_recycle': 300,
-        'pool_size': 1,  # Serverless functions should use minimal pool
-        'max_overflow': 0,  # No overflow for serverless
-        'pool_timeout': 10,
+        'pool_size': _get_int_env('DB_POOL_SIZE', 1),  # Serverless functions should use minimal pool
+        'max_overflow': _get_int_env('DB_MAX_OVERFLOW', 0),  # No overflow for serverless
+        'pool_timeout': _get_int_env('DB_POOL_TIMEOUT', 10),
         'connect_args': {
             'sslmode': 'require',
             'connect_timeout': 10
         }
     }
+
+    # Embedded SQLite (tests, offline load generation): no SSL, and in-memory
+    # databases share one static connection so pool sizing does not apply
+    if database_url.startswith('sqlite'):
+        engine_options = app.config['SQLALCHEMY_ENGINE_OPTIONS']
+        engine_options['connect_args'] = {}
+        if database_url in ('sqlite://', 'sqlite:///:memory:'):
+            for key in ('pool_size', 'max_overflow', 'pool_timeout'):
+                engine_options.pop(key)
+    
+    # Read replicas (see app/routing.py); reads of GET requests go to them
+    app.config['DATABASE_REPLICA_URLS'] = [
+        url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()
+    ]
+    app.config['REPLICA_STICKY_SECONDS'] = _get_int_env('REPLICA_STICKY_SECONDS', 5)
+    app.config['REPLICA_EJECT_SECONDS'] = _get_int_env('REPLICA_EJECT_SECONDS', 30)
+    app.config['REPLICA_CHECK_INTERVAL'] = _get_int_env('REPLICA_CHECK_INTERVAL', 10)
+    
+    # Bundled read-only catalog (see build_catalog.py); opt-in
+    catalog_path = os.getenv('CATALOG_DB_PATH')
+    if catalog_path and Path(catalog_path).is_file():
+        app.config['CATALOG_DB_PATH'] = str(Path(catalog_path).resolve())
+    else:
+        app.config['CATALOG_DB_PATH'] = None
+    
+    # Identity cache for id/URN lookups (per process)
+    app.config['IDENTITY_CACHE_ENABLED'] = os.getenv('IDENTITY_CACHE_ENABLED', 'true').lower() != 'false'
+    app.config['IDENTITY_CACHE_TTL'] = _get_int_env('IDENTITY_CACHE_TTL', 300)
+    app.config['IDENTITY_CACHE_MAX_SIZE'] = _get_int_env('IDENTITY_CACHE_MAX_SIZE', 512)
+    
+    # Shared cache for computed responses: memory, filesystem or redis
+    app.config['CACHE_BACKEND'] = os.getenv('CACHE_BACKEND', 'memory')
+    app.config['CACHE_DIR'] = os.getenv('CACHE_DIR')
+    app.config['CACHE_REDIS_URL'] = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    app.config['CACHE_DEFAULT_TTL'] = _get_int_env('CACHE_DEFAULT_TTL', 3600)
+    app.config['CACHE_MAX_BYTES'] = _get_int_env('CACHE_MAX_BYTES', 64 * 1024 * 1024)
+    
+    # Byte-offset indexes of library content for ?path= reads (per process)
+    app.config['CONTENT_INDEX_MAX_BYTES'] = _get_int_env('CONTENT_INDEX_MAX_BYTES', 64 * 1024 * 1024)
+    
+    # Delta sync windows end this long before now, so that rows flushed by a
+    # write transaction still open at sync time are in the next window
+    app.config['SYNC_SAFETY_LAG_SECONDS'] = _get_int_env('SYNC_SAFETY_LAG_SECONDS', 60)
+    
+    # Scenarios scored per risk matrix evaluation request
+    app.config['RISK_EVALUATE_MAX_SCENARIOS'] = _get_int_env('RISK_EVALUATE_MAX_SCENARIOS', 100000)
     
     # CORS Configuration
     cors_origins = os.getenv('CORS_ALLOWED_ORIGINS', 'http://localhost:3000').split(',')
@@ -101,6 +154,12 @@ def create_app():
     if os.getenv('VERCEL') != '1':
         migrate.init_app(app, db)
     jwt.init_app(app)
+    identity_cache.init_app(app, db)
+    # One replica set per app (app.extensions['replicas']): engines and health are per app
+    ReplicaSet(app, db)
+    init_catalog(app)
+    cache.init_app(app)
+    content_indexes.init_app(app)
     
     # Swagger/OpenAPI Configuration - enabled everywhere
     swagger_config = {
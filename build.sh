@@ -4,5 +4,8 @@ set -o errexit
 
 pip install -r requirements.txt
 
+# Bundled read-only catalog of libraries/ (served when CATALOG_DB_PATH is set)
+python build_catalog.py catalog.sqlite3
+
 python manage.py collectstatic --no-input
 python manage.py migrate
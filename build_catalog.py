@@ -0,0 +1,71 @@
+"""Compile the YAML libraries of libraries/ into a read-only SQLite catalog
+
+The file has the schema and indexes of the stored library tables and is
+served by the catalog endpoints when CATALOG_DB_PATH points to it (see
+app/catalog.py). Run at build time:
+
+    python build_catalog.py [output path]
+"""
+import os
+import sys
+from pathlib import Path
+
+import yaml
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from load_libraries import apply_library_content
+from app.models import StoredLibrary, StoredLibraryContent
+
+DEFAULT_CATALOG_PATH = Path(__file__).parent / 'catalog.sqlite3'
+CATALOG_TABLES = [StoredLibrary.__table__, StoredLibraryContent.__table__]
+
+# libyaml parser when PyYAML was built with it (much faster on large libraries)
+YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def build_catalog(output_path=DEFAULT_CATALOG_PATH, libraries_path=None):
+    """Write the catalog of ``libraries_path`` to ``output_path``; returns (built, errors)"""
+    output_path = Path(output_path)
+    libraries_path = Path(libraries_path or Path(__file__).parent / 'libraries')
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
+    tmp_path.unlink(missing_ok=True)
+
+    engine = create_engine(f'sqlite:///{tmp_path}')
+    StoredLibrary.metadata.create_all(engine, tables=CATALOG_TABLES)
+
+    built, errors = 0, 0
+    with Session(engine) as session:
+        for yaml_file in sorted(libraries_path.glob('*.yaml')):
+            try:
+                with open(yaml_file, 'r', encoding='utf-8') as f:
+                    content = yaml.load(f, Loader=YamlLoader)
+                urn = content.get('urn', f'urn:intuitem:risk:library:{yaml_file.stem}')
+                if session.get(StoredLibrary, urn) is not None:
+                    print(f"  [SKIP] {yaml_file.name}: duplicate URN {urn}")
+                    continue
+                library = StoredLibrary(id=urn, urn=urn, is_loaded=False)
+                apply_library_content(library, content, yaml_file.stem)
+                with session.begin_nested():
+                    session.add(library)
+                built += 1
+            except Exception as e:
+                errors += 1
+                print(f"  [ERROR] {yaml_file.name}: {e}")
+        session.commit()
+
+    # Planner statistics for the indexes, then compact the file
+    with engine.connect() as connection:
+        connection.execute(text('ANALYZE'))
+        connection.commit()
+        connection.execute(text('VACUUM'))
+    engine.dispose()
+
+    os.replace(tmp_path, output_path)
+    return built, errors
+
+
+if __name__ == '__main__':
+    target = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CATALOG_PATH
+    built, errors = build_catalog(target)
+    print(f"Catalog written to {target}: {built} libraries, {errors} errors")
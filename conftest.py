@@ -0,0 +1,29 @@
+"""Shared test setup: imports from the repository root and an in-memory database"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+
+import pytest
+
+from application import create_app, db
+
+
+@pytest.fixture
+def app_env():
+    """Environment variables set before create_app(), overridden by test files that need some"""
+    return {}
+
+
+@pytest.fixture
+def app(monkeypatch, app_env):
+    """App with the tables created, in an app context; test files override it to add their rows"""
+    for name, value in app_env.items():
+        monkeypatch.setenv(name, value)
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
@@ -1,12 +1,14 @@
 """Create database tables for library management"""
-from application import db, create_app
-from app.models import *
+from flask_migrate import upgrade
+
+from application import create_app
 
 app = create_app()
 
 with app.app_context():
     print("Creating database tables...")
-    db.create_all()
+    # Same schema as `flask db upgrade` (see migrations/), never db.create_all()
+    upgrade()
     print("✓ Database tables created successfully")
     
     print("\nTables created:")
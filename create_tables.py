@@ -1,10 +1,12 @@
 """Script to create database tables"""
-from application import app, db
-from app.models.user import User
+from flask_migrate import upgrade
+
+from application import app
 
 if __name__ == '__main__':
     with app.app_context():
-        # Create all tables
-        db.create_all()
-        print('✓ Users table created successfully')
+        # Migrations, not db.create_all(): a schema created from the models
+        # would miss the migration history and its data steps
+        upgrade()
+        print('✓ Database schema migrated to the latest revision')
         print(f'✓ Database: {app.config["SQLALCHEMY_DATABASE_URI"].split("@")[1]}')
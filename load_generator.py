@@ -0,0 +1,464 @@
+#!/usr/bin/env python
+"""
+Synthetic load generator for the REST API
+
+Drives a weighted mix of realistic traffic (token issuance, framework trees,
+library content, catalog listing, searches and imports) against the Flask app,
+either in-process through the WSGI test client or against a running server,
+and reports throughput, latency percentiles, error rates and DB pool saturation.
+
+Runs fully offline: unless --database-url is given, an embedded SQLite database
+is created in a temporary directory and seeded from the libraries/ folder.
+
+Usage:
+    python load_generator.py --concurrency 8 --duration 30
+    python load_generator.py --concurrency 4 --requests 500 --pool-size 1
+    python load_generator.py --url http://127.0.0.1:5000 --duration 60
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+LIBRARIES_DIR = Path(__file__).resolve().parent / 'libraries'
+MIGRATIONS_DIR = Path(__file__).resolve().parent / 'migrations'
+
+LOAD_USER = {
+    'username': 'loadgen',
+    'email': 'loadgen@example.com',
+    'password': 'LoadGen-Pass-123',
+}
+
+# Relative weights of each traffic type in the default mix
+DEFAULT_MIX = {
+    'token': 5,
+    'framework_tree': 30,
+    'library_content': 10,
+    'catalog_list': 15,
+    'search': 35,
+    'import': 5,
+}
+
+SEARCH_TERMS = ['iso', 'nist', 'security', 'access', 'risk', 'cloud', 'data', 'incident']
+
+
+# ==================== CLIENTS ====================
+
+class WSGIClient:
+    """In-process client using the Flask test client (one per worker thread)"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, payload=None):
+        response = self.client.open(path, method=method, json=payload)
+        body = response.get_data()
+        return response.status_code, body
+
+
+class HTTPClient:
+    """Client for a server already listening on a local address"""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, payload=None):
+        data = None
+        headers = {}
+        if payload is not None:
+            data = json.dumps(payload).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+# ==================== POOL MONITOR ====================
+
+class PoolMonitor:
+    """Samples the SQLAlchemy connection pool while the load runs"""
+
+    def __init__(self, engine, interval=0.01):
+        self.pool = engine.pool
+        self.interval = interval
+        self.samples = 0
+        self.saturated_samples = 0
+        self.max_checked_out = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def capacity(self):
+        size = self.pool.size() if hasattr(self.pool, 'size') else 1
+        overflow = max(getattr(self.pool, '_max_overflow', 0), 0)
+        return size + overflow
+
+    def _checked_out(self):
+        if hasattr(self.pool, 'checkedout'):
+            return self.pool.checkedout()
+        return 0
+
+    def _run(self):
+        capacity = self.capacity
+        while not self._stop.is_set():
+            checked_out = self._checked_out()
+            self.samples += 1
+            self.max_checked_out = max(self.max_checked_out, checked_out)
+            if checked_out >= capacity:
+                self.saturated_samples += 1
+            time.sleep(self.interval)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def report(self):
+        return {
+            'pool_class': type(self.pool).__name__,
+            'capacity': self.capacity,
+            'max_checked_out': self.max_checked_out,
+            'saturation': (self.saturated_samples / self.samples) if self.samples else 0.0,
+            'samples': self.samples,
+        }
+
+
+# ==================== SEEDING ====================
+
+def configure_embedded_database(args):
+    """Point the app at a local database before application.py is imported"""
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        db_dir = tempfile.mkdtemp(prefix='hyperlynx-loadgen-')
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(db_dir, 'loadgen.sqlite')}"
+    os.environ['DB_POOL_SIZE'] = str(args.pool_size)
+    os.environ['DB_MAX_OVERFLOW'] = str(args.max_overflow)
+    os.environ['DB_POOL_TIMEOUT'] = str(args.pool_timeout)
+    os.environ.pop('VERCEL', None)  # seeding runs the migrations through Flask-Migrate
+
+
+def pick_library_files(count):
+    """Pick the smallest framework libraries so seeding stays quick"""
+    candidates = []
+    for path in LIBRARIES_DIR.glob('*.yaml'):
+        with open(path, 'r', encoding='utf-8') as file:
+            if '\n  framework:' not in file.read():
+                continue
+        candidates.append(path)
+    candidates.sort(key=lambda p: (p.stat().st_size, p.name))
+    return candidates[:count]
+
+
+def seed_database(app, args):
+    """Create tables, store catalog libraries, a user and preloaded frameworks"""
+    import yaml
+    from flask_migrate import upgrade
+    from application import db
+    from app.models import StoredLibrary
+    from app.models.user import User
+    from app.routes.stored_libraries import create_stored_library_from_yaml
+    from load_libraries import sanitize_content
+
+    with app.app_context():
+        # The migrated schema, with its migration-only indexes
+        upgrade(directory=str(MIGRATIONS_DIR))
+
+        for path in pick_library_files(args.libraries):
+            with open(path, 'r', encoding='utf-8') as file:
+                content = sanitize_content(yaml.safe_load(file))
+            if StoredLibrary.query.filter_by(urn=content.get('urn')).first():
+                continue
+            db.session.add(create_stored_library_from_yaml(content))
+        db.session.commit()
+
+        if not User.query.filter_by(username=LOAD_USER['username']).first():
+            user = User(username=LOAD_USER['username'], email=LOAD_USER['email'])
+            user.set_password(LOAD_USER['password'])
+            db.session.add(user)
+            db.session.commit()
+
+    client = WSGIClient(app)
+    status, body = client.request('GET', '/api/stored-libraries/?limit=1000&is_loaded=false')
+    libraries = json.loads(body)['results'] if status == 200 else []
+    for library in libraries[:args.preload]:
+        client.request('POST', f"/api/stored-libraries/{library['id']}/import/")
+
+
+class LoadContext:
+    """Ids discovered from the target before the run starts"""
+
+    def __init__(self, client):
+        status, body = client.request('GET', '/api/frameworks/?limit=1000')
+        self.framework_ids = [f['id'] for f in json.loads(body)['results']] if status == 200 else []
+        status, body = client.request('GET', '/api/stored-libraries/?limit=1000')
+        libraries = json.loads(body)['results'] if status == 200 else []
+        self.library_ids = [lib['id'] for lib in libraries]
+
+        # Each catalog library can only be imported once, so imports draw from a pool
+        self._importable = [lib['id'] for lib in libraries if not lib['is_loaded']]
+        random.shuffle(self._importable)
+        self._lock = threading.Lock()
+
+    def next_importable(self):
+        with self._lock:
+            return self._importable.pop() if self._importable else None
+
+
+# ==================== SCENARIOS ====================
+
+def scenario_token(client, ctx):
+    return client.request('POST', '/api/token/', {
+        'username': LOAD_USER['username'],
+        'password': LOAD_USER['password'],
+    })
+
+
+def scenario_framework_tree(client, ctx):
+    if not ctx.framework_ids:
+        return None
+    return client.request('GET', f'/api/frameworks/{random.choice(ctx.framework_ids)}/tree/')
+
+
+def scenario_library_content(client, ctx):
+    if not ctx.library_ids:
+        return None
+    return client.request('GET', f'/api/stored-libraries/{random.choice(ctx.library_ids)}/content/')
+
+
+def scenario_catalog_list(client, ctx):
+    offset = random.choice([0, 0, 0, 20, 40])
+    return client.request('GET', f'/api/stored-libraries/?limit=20&offset={offset}')
+
+
+def scenario_search(client, ctx):
+    term = random.choice(SEARCH_TERMS)
+    path = random.choice([
+        f'/api/stored-libraries/?search={term}',
+        f'/api/frameworks/?search={term}',
+        f'/api/reference-controls/?search={term}&limit=20',
+    ])
+    return client.request('GET', path)
+
+
+def scenario_import(client, ctx):
+    library_id = ctx.next_importable()
+    if library_id is None:
+        return None
+    return client.request('POST', f'/api/stored-libraries/{library_id}/import/')
+
+
+SCENARIOS = {
+    'token': scenario_token,
+    'framework_tree': scenario_framework_tree,
+    'library_content': scenario_library_content,
+    'catalog_list': scenario_catalog_list,
+    'search': scenario_search,
+    'import': scenario_import,
+}
+
+
+# ==================== RUNNER ====================
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100.0 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(samples, elapsed):
+    """Aggregate (scenario, status, latency_seconds, bytes) samples"""
+    def _stats(rows):
+        latencies = sorted(row[2] for row in rows)
+        errors = sum(1 for row in rows if row[1] == 0 or row[1] >= 400)
+        return {
+            'requests': len(rows),
+            'errors': errors,
+            'error_rate': errors / len(rows) if rows else 0.0,
+            'throughput_rps': len(rows) / elapsed if elapsed else 0.0,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p90_ms': percentile(latencies, 90) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'max_ms': (latencies[-1] * 1000) if latencies else 0.0,
+            'bytes': sum(row[3] for row in rows),
+        }
+
+    by_scenario = {}
+    for row in samples:
+        by_scenario.setdefault(row[0], []).append(row)
+
+    return {
+        'elapsed_seconds': elapsed,
+        'overall': _stats(samples),
+        'scenarios': {name: _stats(rows) for name, rows in sorted(by_scenario.items())},
+    }
+
+
+def run_load(client_factory, ctx, mix, concurrency, duration=None, total_requests=None):
+    """Run worker threads until the duration or request budget is exhausted"""
+    names = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in names]
+    samples = []
+    samples_lock = threading.Lock()
+    budget = {'remaining': total_requests}
+    budget_lock = threading.Lock()
+    deadline = time.perf_counter() + duration if duration else None
+
+    def _take_ticket():
+        if deadline is not None and time.perf_counter() >= deadline:
+            return False
+        if budget['remaining'] is None:
+            return True
+        with budget_lock:
+            if budget['remaining'] <= 0:
+                return False
+            budget['remaining'] -= 1
+            return True
+
+    def _worker():
+        client = client_factory()
+        local = []
+        while _take_ticket():
+            name = random.choices(names, weights=weights)[0]
+            started = time.perf_counter()
+            try:
+                result = SCENARIOS[name](client, ctx)
+            except Exception:
+                result = (0, b'')
+            if result is None:
+                # Scenario has nothing left to do (e.g. import pool exhausted)
+                continue
+            status, body = result
+            local.append((name, status, time.perf_counter() - started, len(body)))
+        with samples_lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=_worker, daemon=True) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def parse_mix(value):
+    mix = dict(DEFAULT_MIX)
+    if not value:
+        return mix
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f'Unknown scenario "{name}" (choose from {", ".join(SCENARIOS)})')
+        mix[name] = int(weight)
+    return mix
+
+
+def print_report(report):
+    print(f"\n=== Load Test Summary ({report['elapsed_seconds']:.1f}s) ===")
+    header = f"{'scenario':18} {'reqs':>7} {'err%':>6} {'rps':>8} {'p50':>8} {'p90':>8} {'p95':>8} {'p99':>8} {'max':>8}"
+    print(header)
+    print('-' * len(header))
+    rows = list(report['scenarios'].items()) + [('TOTAL', report['overall'])]
+    for name, stats in rows:
+        print(
+            f"{name:18} {stats['requests']:>7} {stats['error_rate'] * 100:>5.1f}% {stats['throughput_rps']:>8.1f} "
+            f"{stats['p50_ms']:>7.1f}ms {stats['p90_ms']:>6.1f}ms {stats['p95_ms']:>6.1f}ms "
+            f"{stats['p99_ms']:>6.1f}ms {stats['max_ms']:>6.1f}ms"
+        )
+
+    if pool := report.get('pool'):
+        print(f"\nDB pool ({pool['pool_class']}): capacity={pool['capacity']} "
+              f"max_checked_out={pool['max_checked_out']} saturation={pool['saturation'] * 100:.1f}%")
+    if cache := report.get('identity_cache'):
+        print(f"Identity cache: hits={cache['hits']} misses={cache['misses']} hit_rate={cache['hit_rate'] * 100:.1f}%")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Synthetic load generator for the Hyperlynx REST API')
+    parser.add_argument('--url', help='Target a running server instead of the in-process WSGI app')
+    parser.add_argument('--database-url', help='Database for the in-process app (default: embedded SQLite)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Number of concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=None, help='Run for this many seconds')
+    parser.add_argument('--requests', type=int, default=None, help='Stop after this many requests')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(None),
+                        help='Scenario weights, e.g. "framework_tree=50,search=20,import=0"')
+    parser.add_argument('--libraries', type=int, default=25, help='Catalog libraries to seed (embedded DB)')
+    parser.add_argument('--preload', type=int, default=8, help='Libraries imported before the run (embedded DB)')
+    parser.add_argument('--pool-size', type=int, default=1, help='DB pool size (production default: 1)')
+    parser.add_argument('--max-overflow', type=int, default=0, help='DB pool overflow (production default: 0)')
+    parser.add_argument('--pool-timeout', type=int, default=10, help='Seconds to wait for a pooled connection')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for a reproducible traffic mix')
+    parser.add_argument('--verbose', action='store_true', help='Log application errors raised during the run')
+    parser.add_argument('--json', dest='json_path', help='Also write the report as JSON to this path')
+    args = parser.parse_args(argv)
+    if args.duration is None and args.requests is None:
+        args.duration = 10.0
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    monitor = None
+    if args.url:
+        client_factory = lambda: HTTPClient(args.url)
+    else:
+        configure_embedded_database(args)
+        from application import create_app, db
+        app = create_app()
+        if not args.verbose:
+            # Failed requests are counted in the report; keep tracebacks off the console
+            app.logger.disabled = True
+        print(f"[*] Seeding {app.config['SQLALCHEMY_DATABASE_URI']} ...")
+        seed_database(app, args)
+        client_factory = lambda: WSGIClient(app)
+        with app.app_context():
+            monitor = PoolMonitor(db.engine)
+
+    ctx = LoadContext(client_factory())
+    print(f"[*] {len(ctx.framework_ids)} frameworks, {len(ctx.library_ids)} catalog libraries")
+    print(f"[*] Running with concurrency={args.concurrency} "
+          f"{'duration=%ss' % args.duration if args.duration else 'requests=%s' % args.requests}")
+
+    if monitor:
+        monitor.start()
+    samples, elapsed = run_load(client_factory, ctx, args.mix, args.concurrency,
+                                duration=args.duration, total_requests=args.requests)
+    report = summarize(samples, elapsed)
+    if monitor:
+        monitor.stop()
+        report['pool'] = monitor.report()
+        from application import identity_cache
+        report['identity_cache'] = identity_cache.stats()
+
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        print(f"\n[*] Report written to {args.json_path}")
+    return report
+
+
+if __name__ == '__main__':
+    report = main()
+    sys.exit(1 if report['overall']['requests'] == 0 else 0)
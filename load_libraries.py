@@ -4,8 +4,9 @@ import yaml
 import json
 from pathlib import Path
 from datetime import datetime, date
-from application import db, create_app
+from application import db, create_app, cache
 from app.models import StoredLibrary
+from app.routes.stored_libraries import library_object_type
 
 
 class DateEncoder(json.JSONEncoder):
@@ -27,6 +28,31 @@ def sanitize_content(obj):
     return obj
 
 
+def apply_library_content(library, content, stem):
+    """Fill a StoredLibrary from the parsed YAML ``content`` of file ``stem``.yaml"""
+    object_type = library_object_type(content.get('objects'))
+    
+    # Update fields
+    library.ref_id = content.get('ref_id', stem)
+    library.locale = content.get('locale', 'en')
+    library.name = content.get('name', stem)
+    library.description = content.get('description', '')
+    library.copyright = content.get('copyright', '')
+    library.version = str(content.get('version', '1'))
+    library.provider = content.get('provider', '')
+    library.packager = content.get('packager', 'intuitem')
+    library.object_type = object_type
+    library.content = sanitize_content(content)  # Sanitize dates
+    library.translations = content.get('translations', {})
+    
+    # Parse publication date
+    if pub_date := content.get('publication_date'):
+        try:
+            library.publication_date = datetime.strptime(str(pub_date), '%Y-%m-%d').date()
+        except:
+            pass
+
+
 def load_libraries_from_folder():
     """Load all YAML files from libraries folder into database"""
     app = create_app()
@@ -42,6 +68,7 @@ def load_libraries_from_folder():
         loaded_count = 0
         skipped_count = 0
         error_count = 0
+        updated_urns = []
         
         for yaml_file in libraries_path.glob('*.yaml'):
             try:
@@ -57,41 +84,11 @@ def load_libraries_from_folder():
                 if existing:
                     print(f"  → Already exists, updating...")
                     library = existing
+                    updated_urns.append(urn)
                 else:
                     library = StoredLibrary(id=urn, urn=urn)
                 
-                # Determine object type
-                object_type = 'mixed'
-                if 'objects' in content:
-                    objects = content['objects']
-                    if 'framework' in objects:
-                        object_type = 'framework'
-                    elif 'reference_controls' in objects:
-                        object_type = 'reference_controls'
-                    elif 'risk_matrix' in objects:
-                        object_type = 'risk_matrix'
-                    elif 'requirement_mapping_sets' in objects:
-                        object_type = 'mapping'
-                
-                # Update fields
-                library.ref_id = content.get('ref_id', yaml_file.stem)
-                library.locale = content.get('locale', 'en')
-                library.name = content.get('name', yaml_file.stem)
-                library.description = content.get('description', '')
-                library.copyright = content.get('copyright', '')
-                library.version = str(content.get('version', '1'))
-                library.provider = content.get('provider', '')
-                library.packager = content.get('packager', 'intuitem')
-                library.object_type = object_type
-                library.content = sanitize_content(content)  # Sanitize dates
-                library.translations = content.get('translations', {})
-                
-                # Parse publication date
-                if pub_date := content.get('publication_date'):
-                    try:
-                        library.publication_date = datetime.strptime(str(pub_date), '%Y-%m-%d').date()
-                    except:
-                        pass
+                apply_library_content(library, content, yaml_file.stem)
                 
                 db.session.add(library)
                 loaded_count += 1
@@ -103,6 +100,11 @@ def load_libraries_from_folder():
         
         db.session.commit()
         
+        # Drop cached content/trees of updated libraries (shared cache backends)
+        for urn in updated_urns:
+            cache.invalidate_library(urn)
+        cache.invalidate_catalog()
+        
         print(f"\n=== Summary ===")
         print(f"Loaded: {loaded_count}")
         print(f"Errors: {error_count}")
@@ -0,0 +1,79 @@
+"""Compliance assessments
+
+Revision ID: 0b6d4e8f2a17
+Revises: f3a9c1d27e84
+Create Date: 2026-10-19 16:48:03.664310
+
+Assessments of a framework, their per-requirement results (keyed on the
+interned requirement URN id) and the score rollup of every answered
+subtree.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b6d4e8f2a17'
+down_revision = 'f3a9c1d27e84'
+branch_labels = None
+depends_on = None
+
+
+def _rollup_columns():
+    return [
+        sa.Column('answered_count', sa.Integer(), nullable=False),
+        sa.Column('scored_count', sa.Integer(), nullable=False),
+        sa.Column('score_sum', sa.BigInteger(), nullable=False),
+        sa.Column('compliant_count', sa.Integer(), nullable=False),
+        sa.Column('partially_compliant_count', sa.Integer(), nullable=False),
+        sa.Column('non_compliant_count', sa.Integer(), nullable=False),
+        sa.Column('not_applicable_count', sa.Integer(), nullable=False),
+    ]
+
+
+def upgrade():
+    op.create_table('compliance_assessments',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('name', sa.String(length=500), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('framework_id', sa.String(length=255), nullable=False),
+    sa.Column('assessable_count', sa.Integer(), nullable=False),
+    *_rollup_columns(),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['framework_id'], ['frameworks.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_compliance_assessments_framework_id', 'compliance_assessments', ['framework_id'],
+                    unique=False)
+    op.create_index('ix_compliance_assessments_updated_at', 'compliance_assessments', ['updated_at'], unique=False)
+
+    op.create_table('requirement_assessments',
+    sa.Column('assessment_id', sa.Integer(), nullable=False),
+    sa.Column('requirement_urn_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=30), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=True),
+    sa.Column('observation', sa.Text(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['assessment_id'], ['compliance_assessments.id'], ),
+    sa.ForeignKeyConstraint(['requirement_urn_id'], ['urns.id'], ),
+    sa.PrimaryKeyConstraint('assessment_id', 'requirement_urn_id')
+    )
+
+    op.create_table('assessment_subtree_scores',
+    sa.Column('assessment_id', sa.Integer(), nullable=False),
+    sa.Column('node_urn_id', sa.Integer(), nullable=False),
+    *_rollup_columns(),
+    sa.ForeignKeyConstraint(['assessment_id'], ['compliance_assessments.id'], ),
+    sa.ForeignKeyConstraint(['node_urn_id'], ['urns.id'], ),
+    sa.PrimaryKeyConstraint('assessment_id', 'node_urn_id')
+    )
+
+
+def downgrade():
+    op.drop_table('assessment_subtree_scores')
+    op.drop_table('requirement_assessments')
+    op.drop_index('ix_compliance_assessments_updated_at', table_name='compliance_assessments')
+    op.drop_index('ix_compliance_assessments_framework_id', table_name='compliance_assessments')
+    op.drop_table('compliance_assessments')
@@ -33,6 +33,10 @@ def upgrade():
         batch_op.create_index(batch_op.f('ix_users_email'), ['email'], unique=True)
         batch_op.create_index(batch_op.f('ix_users_username'), ['username'], unique=True)
 
+    # The Django tables only exist in databases of the previous backend, not in new ones
+    if not sa.inspect(op.get_bind()).has_table('django_migrations'):
+        return
+
     with op.batch_alter_table('auth_user_user_permissions', schema=None) as batch_op:
         batch_op.drop_index(batch_op.f('auth_user_user_permissions_permission_id_1fbb5f2c'))
         batch_op.drop_index(batch_op.f('auth_user_user_permissions_user_id_a95ead1b'))
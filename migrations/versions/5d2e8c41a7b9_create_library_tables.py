@@ -0,0 +1,237 @@
+"""Create library tables
+
+Revision ID: 5d2e8c41a7b9
+Revises: 3b561050477d
+Create Date: 2026-10-19 09:12:44.118302
+
+The library tables used to come from db.create_all() (create_library_tables.py),
+so tables that already exist are left as they are; only missing tables,
+columns and indexes are added.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2e8c41a7b9'
+down_revision = '3b561050477d'
+branch_labels = None
+depends_on = None
+
+
+def _missing(table_name):
+    return not sa.inspect(op.get_bind()).has_table(table_name)
+
+
+def _index(table_name, name, columns, unique=False):
+    op.create_index(name, table_name, columns, unique=unique, if_not_exists=True)
+
+
+def upgrade():
+    if _missing('stored_libraries'):
+        op.create_table('stored_libraries',
+        sa.Column('id', sa.String(length=255), nullable=False),
+        sa.Column('urn', sa.String(length=255), nullable=False),
+        sa.Column('ref_id', sa.String(length=100), nullable=False),
+        sa.Column('locale', sa.String(length=10), nullable=False),
+        sa.Column('name', sa.String(length=500), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('copyright', sa.Text(), nullable=True),
+        sa.Column('version', sa.String(length=50), nullable=True),
+        sa.Column('publication_date', sa.Date(), nullable=True),
+        sa.Column('provider', sa.String(length=200), nullable=True),
+        sa.Column('packager', sa.String(length=200), nullable=True),
+        sa.Column('is_loaded', sa.Boolean(), nullable=True),
+        sa.Column('is_published', sa.Boolean(), nullable=True),
+        sa.Column('object_type', sa.String(length=100), nullable=True),
+        sa.Column('content', sa.JSON(), nullable=True),
+        sa.Column('translations', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    _index('stored_libraries', 'ix_stored_libraries_urn', ['urn'], unique=True)
+
+    if _missing('stored_library_contents'):
+        op.create_table('stored_library_contents',
+        sa.Column('library_id', sa.String(length=255), nullable=False),
+        sa.Column('codec', sa.String(length=10), nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('compressed_size', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['library_id'], ['stored_libraries.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('library_id')
+        )
+    _index('stored_library_contents', 'ix_stored_library_contents_content_hash', ['content_hash'])
+
+    if _missing('loaded_libraries'):
+        op.create_table('loaded_libraries',
+        sa.Column('id', sa.String(length=255), nullable=False),
+        sa.Column('urn', sa.String(length=255), nullable=False),
+        sa.Column('stored_library_id', sa.String(length=255), nullable=True),
+        sa.Column('ref_id', sa.String(length=100), nullable=True),
+        sa.Column('locale', sa.String(length=10), nullable=True),
+        sa.Column('name', sa.String(length=500), nullable=True),
+        sa.Column('version', sa.String(length=50), nullable=True),
+        sa.Column('provider', sa.String(length=200), nullable=True),
+        sa.Column('loaded_at', sa.DateTime(), nullable=True),
+        sa.Column('loaded_by', sa.String(length=255), nullable=True),
+        sa.ForeignKeyConstraint(['stored_library_id'], ['stored_libraries.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    _index('loaded_libraries', 'ix_loaded_libraries_urn', ['urn'], unique=True)
+
+    if _missing('frameworks'):
+        op.create_table('frameworks',
+        sa.Column('id', sa.String(length=255), nullable=False),
+        sa.Column('urn', sa.String(length=255), nullable=True),
+        sa.Column('ref_id', sa.String(length=100), nullable=False),
+        sa.Column('name', sa.String(length=500), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('library_urn', sa.String(length=255), nullable=True),
+        sa.Column('min_score', sa.Integer(), nullable=True),
+        sa.Column('max_score', sa.Integer(), nullable=True),
+        sa.Column('scores_definition', sa.JSON(), nullable=True),
+        sa.Column('translations', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['library_urn'], ['loaded_libraries.urn'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    _index('frameworks', 'ix_frameworks_urn', ['urn'], unique=True)
+    _index('frameworks', 'ix_frameworks_updated_at', ['updated_at'])
+
+    if _missing('framework_tree_snapshots'):
+        op.create_table('framework_tree_snapshots',
+        sa.Column('framework_id', sa.String(length=255), nullable=False),
+        sa.Column('locale', sa.String(length=10), nullable=False),
+        sa.Column('is_default', sa.Boolean(), nullable=True),
+        sa.Column('version', sa.String(length=40), nullable=False),
+        sa.Column('framework_json', sa.LargeBinary(), nullable=False),
+        sa.Column('tree_json', sa.LargeBinary(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['framework_id'], ['frameworks.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('framework_id', 'locale')
+        )
+
+    if _missing('requirement_nodes'):
+        op.create_table('requirement_nodes',
+        sa.Column('id', sa.String(length=255), nullable=False),
+        sa.Column('urn', sa.String(length=255), nullable=True),
+        sa.Column('ref_id', sa.String(length=100), nullable=True),
+        sa.Column('name', sa.String(length=500), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('framework_id', sa.String(length=255), nullable=False),
+        sa.Column('parent_urn', sa.String(length=255), nullable=True),
+        sa.Column('order_id', sa.Integer(), nullable=True),
+        sa.Column('level', sa.Integer(), nullable=True),
+        sa.Column('assessable', sa.Boolean(), nullable=True),
+        sa.Column('maturity', sa.Integer(), nullable=True),
+        sa.Column('translations', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['framework_id'], ['frameworks.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    elif 'updated_at' not in {c['name'] for c in sa.inspect(op.get_bind()).get_columns('requirement_nodes')}:
+        with op.batch_alter_table('requirement_nodes', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+    _index('requirement_nodes', 'ix_requirement_nodes_urn', ['urn'], unique=True)
+    _index('requirement_nodes', 'ix_requirement_nodes_updated_at', ['updated_at'])
+
+    if _missing('reference_controls'):
+        op.create_table('reference_controls',
+        sa.Column('id', sa.String(length=255), nullable=False),
+        sa.Column('urn', sa.String(length=255), nullable=True),
+        sa.Column('ref_id', sa.String(length=100), nullable=True),
+        sa.Column('name', sa.String(length=500), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('library_urn', sa.String(length=255), nullable=True),
+        sa.Column('category', sa.String(length=100), nullable=True),
+        sa.Column('csf_function', sa.String(length=50), nullable=True),
+        sa.Column('annotation', sa.Text(), nullable=True),
+        sa.Column('typical_evidence', sa.Text(), nullable=True),
+        sa.Column('implementation_guidance', sa.Text(), nullable=True),
+        sa.Column('translations', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['library_urn'], ['loaded_libraries.urn'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    _index('reference_controls', 'ix_reference_controls_urn', ['urn'], unique=True)
+    _index('reference_controls', 'ix_reference_controls_updated_at', ['updated_at'])
+
+    if _missing('risk_matrices'):
+        op.create_table('risk_matrices',
+        sa.Column('id', sa.String(length=255), nullable=False),
+        sa.Column('urn', sa.String(length=255), nullable=True),
+        sa.Column('ref_id', sa.String(length=100), nullable=True),
+        sa.Column('name', sa.String(length=500), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('library_urn', sa.String(length=255), nullable=True),
+        sa.Column('probability', sa.JSON(), nullable=True),
+        sa.Column('impact', sa.JSON(), nullable=True),
+        sa.Column('grid', sa.JSON(), nullable=True),
+        sa.Column('risk_levels', sa.JSON(), nullable=True),
+        sa.Column('is_enabled', sa.Boolean(), nullable=True),
+        sa.Column('translations', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['library_urn'], ['loaded_libraries.urn'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    _index('risk_matrices', 'ix_risk_matrices_urn', ['urn'], unique=True)
+    _index('risk_matrices', 'ix_risk_matrices_updated_at', ['updated_at'])
+
+    if _missing('requirement_mapping_sets'):
+        op.create_table('requirement_mapping_sets',
+        sa.Column('id', sa.String(length=255), nullable=False),
+        sa.Column('urn', sa.String(length=255), nullable=True),
+        sa.Column('ref_id', sa.String(length=100), nullable=True),
+        sa.Column('name', sa.String(length=500), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('library_urn', sa.String(length=255), nullable=True),
+        sa.Column('source_framework_urn', sa.String(length=255), nullable=True),
+        sa.Column('target_framework_urn', sa.String(length=255), nullable=True),
+        sa.Column('translations', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['library_urn'], ['loaded_libraries.urn'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    _index('requirement_mapping_sets', 'ix_requirement_mapping_sets_urn', ['urn'], unique=True)
+    _index('requirement_mapping_sets', 'ix_requirement_mapping_sets_updated_at', ['updated_at'])
+
+    if _missing('requirement_mappings'):
+        op.create_table('requirement_mappings',
+        sa.Column('id', sa.String(length=255), nullable=False),
+        sa.Column('mapping_set_id', sa.String(length=255), nullable=False),
+        sa.Column('source_requirement_urn', sa.String(length=255), nullable=True),
+        sa.Column('target_requirement_urn', sa.String(length=255), nullable=True),
+        sa.Column('relationship_type', sa.String(length=50), nullable=True),
+        sa.Column('strength', sa.Integer(), nullable=True),
+        sa.Column('rationale', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['mapping_set_id'], ['requirement_mapping_sets.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+    if _missing('sync_tombstones'):
+        op.create_table('sync_tombstones',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('object_type', sa.String(length=50), nullable=False),
+        sa.Column('object_id', sa.String(length=255), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+    _index('sync_tombstones', 'ix_sync_tombstones_deleted_at', ['deleted_at'])
+
+
+def downgrade():
+    for table_name in ('sync_tombstones', 'requirement_mappings', 'requirement_mapping_sets', 'risk_matrices',
+                       'reference_controls', 'requirement_nodes', 'framework_tree_snapshots', 'frameworks',
+                       'loaded_libraries', 'stored_library_contents', 'stored_libraries'):
+        op.drop_table(table_name)
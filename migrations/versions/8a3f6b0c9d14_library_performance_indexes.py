@@ -0,0 +1,57 @@
+"""Library performance indexes
+
+Revision ID: 8a3f6b0c9d14
+Revises: 5d2e8c41a7b9
+Create Date: 2026-10-19 09:47:05.550931
+
+Indexes for the filters and orderings of the hot library queries, checked
+with EXPLAIN QUERY PLAN in test_query_plans.py:
+
+- library_urn on frameworks, reference controls, risk matrices and mapping
+  sets (loaded library views, upgrades, unloads)
+- requirement_nodes (framework_id, order_id): whole framework in order
+  (trees, snapshots, ?include=requirements); (parent_urn, order_id):
+  children of a node in order; ref_id: the requirement list filter
+- requirement_mappings mapping_set_id and the source / target requirement URNs
+- reference_controls ref_id
+- stored_libraries urn WHERE is_loaded (partial): the loaded subset of the
+  catalog
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a3f6b0c9d14'
+down_revision = '5d2e8c41a7b9'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('frameworks', 'ix_frameworks_library_urn', ['library_urn']),
+    ('reference_controls', 'ix_reference_controls_library_urn', ['library_urn']),
+    ('reference_controls', 'ix_reference_controls_ref_id', ['ref_id']),
+    ('risk_matrices', 'ix_risk_matrices_library_urn', ['library_urn']),
+    ('requirement_mapping_sets', 'ix_requirement_mapping_sets_library_urn', ['library_urn']),
+    ('requirement_nodes', 'ix_requirement_nodes_framework_id_order_id', ['framework_id', 'order_id']),
+    ('requirement_nodes', 'ix_requirement_nodes_parent_urn_order_id', ['parent_urn', 'order_id']),
+    ('requirement_nodes', 'ix_requirement_nodes_ref_id', ['ref_id']),
+    ('requirement_mappings', 'ix_requirement_mappings_mapping_set_id', ['mapping_set_id']),
+    ('requirement_mappings', 'ix_requirement_mappings_source_requirement_urn', ['source_requirement_urn']),
+    ('requirement_mappings', 'ix_requirement_mappings_target_requirement_urn', ['target_requirement_urn']),
+]
+
+
+def upgrade():
+    for table_name, name, columns in INDEXES:
+        op.create_index(name, table_name, columns, unique=False, if_not_exists=True)
+    op.create_index('ix_stored_libraries_loaded', 'stored_libraries', ['urn'], unique=False, if_not_exists=True,
+                    postgresql_where=sa.text('is_loaded'), sqlite_where=sa.text('is_loaded = 1'))
+
+
+def downgrade():
+    op.drop_index('ix_stored_libraries_loaded', table_name='stored_libraries', if_exists=True)
+    for table_name, name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table_name, if_exists=True)
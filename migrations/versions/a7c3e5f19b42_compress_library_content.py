@@ -0,0 +1,79 @@
+"""Compress legacy stored library content
+
+Revision ID: a7c3e5f19b42
+Revises: 0b6d4e8f2a17
+Create Date: 2026-10-19 17:26:41.903572
+
+Moves the content of stored libraries still held uncompressed in
+stored_libraries.content into stored_library_contents (zstd when the
+zstandard package is installed, gzip otherwise, with the sha256 of the
+canonical JSON) and clears the legacy column. Rows are converted one at a
+time so that only one library's content is in memory.
+
+"""
+import gzip
+import hashlib
+import json
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e5f19b42'
+down_revision = '0b6d4e8f2a17'
+branch_labels = None
+depends_on = None
+
+# Same as app.compression
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+
+stored_libraries = sa.table('stored_libraries', sa.column('id', sa.String), sa.column('content', sa.JSON))
+stored_library_contents = sa.table('stored_library_contents', sa.column('library_id', sa.String),
+                                   sa.column('codec', sa.String), sa.column('content_hash', sa.String),
+                                   sa.column('size', sa.Integer), sa.column('compressed_size', sa.Integer),
+                                   sa.column('data', sa.LargeBinary), sa.column('updated_at', sa.DateTime))
+
+
+def _encode(document):
+    # Same canonical form as app.compression.encode_document, so hashes match
+    return json.dumps(document, ensure_ascii=False, sort_keys=True,
+                      separators=(',', ':'), default=str).encode('utf-8')
+
+
+def _compress(raw):
+    try:
+        import zstandard
+    except ImportError:
+        return 'gzip', gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+    return 'zstd', zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+
+
+def upgrade():
+    connection = op.get_bind()
+    library_ids = connection.scalars(
+        sa.select(stored_libraries.c.id).where(stored_libraries.c.content.isnot(None)).order_by(stored_libraries.c.id)
+    ).all()
+    compressed = set(connection.scalars(sa.select(stored_library_contents.c.library_id)))
+    for library_id in library_ids:
+        # A content row always wins over the legacy column (see StoredLibrary.content)
+        document = None
+        if library_id not in compressed:
+            document = connection.scalar(
+                sa.select(stored_libraries.c.content).where(stored_libraries.c.id == library_id))
+        if document is not None:
+            raw = _encode(document)
+            codec, data = _compress(raw)
+            connection.execute(stored_library_contents.insert().values(
+                library_id=library_id, codec=codec, content_hash=hashlib.sha256(raw).hexdigest(),
+                size=len(raw), compressed_size=len(data), data=data, updated_at=datetime.utcnow()))
+        connection.execute(stored_libraries.update().where(stored_libraries.c.id == library_id)
+                           .values(content=sa.null()))
+
+
+def downgrade():
+    # The schema is unchanged and the models read the compressed rows:
+    # nothing to move back
+    pass
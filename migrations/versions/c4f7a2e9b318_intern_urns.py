@@ -0,0 +1,134 @@
+"""Intern URNs as integer ids
+
+Revision ID: c4f7a2e9b318
+Revises: 8a3f6b0c9d14
+Create Date: 2026-10-19 11:20:37.402118
+
+Adds the urns dictionary, interned urn / parent_urn ids on requirement_nodes
+(the unique urn_id index replaces the one on the urn string) and rebuilds requirement_mappings with an integer primary key, interned
+source / target ids and a unique (set, source, target) key instead of the
+concatenated-URN string id.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f7a2e9b318'
+down_revision = '8a3f6b0c9d14'
+branch_labels = None
+depends_on = None
+
+
+def _urn_id(column):
+    return f'(SELECT urns.id FROM urns WHERE urns.urn = {column})'
+
+
+def upgrade():
+    op.create_table('urns',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('urn', sa.String(length=255), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_urns_urn', 'urns', ['urn'], unique=True)
+    op.execute(
+        'INSERT INTO urns (urn) '
+        'SELECT urn FROM requirement_nodes WHERE urn IS NOT NULL '
+        'UNION SELECT parent_urn FROM requirement_nodes WHERE parent_urn IS NOT NULL '
+        'UNION SELECT source_requirement_urn FROM requirement_mappings WHERE source_requirement_urn IS NOT NULL '
+        'UNION SELECT target_requirement_urn FROM requirement_mappings WHERE target_requirement_urn IS NOT NULL'
+    )
+
+    with op.batch_alter_table('requirement_nodes') as batch_op:
+        batch_op.add_column(sa.Column('urn_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('parent_urn_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_requirement_nodes_urn_id', 'urns', ['urn_id'], ['id'])
+        batch_op.create_foreign_key('fk_requirement_nodes_parent_urn_id', 'urns', ['parent_urn_id'], ['id'])
+    op.execute(f"UPDATE requirement_nodes SET urn_id = {_urn_id('requirement_nodes.urn')}, "
+               f"parent_urn_id = {_urn_id('requirement_nodes.parent_urn')}")
+    op.drop_index('ix_requirement_nodes_parent_urn_order_id', table_name='requirement_nodes')
+    op.create_index('ix_requirement_nodes_urn_id', 'requirement_nodes', ['urn_id'], unique=True)
+    # URN lookups and uniqueness go through urn_id from now on
+    op.drop_index('ix_requirement_nodes_urn', table_name='requirement_nodes')
+    op.create_index('ix_requirement_nodes_parent_urn_id_order_id', 'requirement_nodes',
+                    ['parent_urn_id', 'order_id'], unique=False)
+
+    op.create_table('requirement_mappings_new',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('mapping_set_id', sa.String(length=255), nullable=False),
+    sa.Column('source_requirement_urn', sa.String(length=255), nullable=True),
+    sa.Column('target_requirement_urn', sa.String(length=255), nullable=True),
+    sa.Column('source_urn_id', sa.Integer(), nullable=True),
+    sa.Column('target_urn_id', sa.Integer(), nullable=True),
+    sa.Column('relationship_type', sa.String(length=50), nullable=True),
+    sa.Column('strength', sa.Integer(), nullable=True),
+    sa.Column('rationale', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['mapping_set_id'], ['requirement_mapping_sets.id'], ),
+    sa.ForeignKeyConstraint(['source_urn_id'], ['urns.id'], ),
+    sa.ForeignKeyConstraint(['target_urn_id'], ['urns.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('mapping_set_id', 'source_urn_id', 'target_urn_id',
+                        name='uq_requirement_mappings_set_source_target')
+    )
+    op.execute(
+        'INSERT INTO requirement_mappings_new (mapping_set_id, source_requirement_urn, target_requirement_urn, '
+        'source_urn_id, target_urn_id, relationship_type, strength, rationale, created_at) '
+        'SELECT mapping_set_id, source_requirement_urn, target_requirement_urn, '
+        f"{_urn_id('requirement_mappings.source_requirement_urn')}, "
+        f"{_urn_id('requirement_mappings.target_requirement_urn')}, "
+        'relationship_type, strength, rationale, created_at FROM requirement_mappings ORDER BY requirement_mappings.id'
+    )
+    op.drop_table('requirement_mappings')
+    op.rename_table('requirement_mappings_new', 'requirement_mappings')
+    op.create_index('ix_requirement_mappings_mapping_set_id', 'requirement_mappings', ['mapping_set_id'],
+                    unique=False)
+    op.create_index('ix_requirement_mappings_source_urn_id', 'requirement_mappings', ['source_urn_id'],
+                    unique=False)
+    op.create_index('ix_requirement_mappings_target_urn_id', 'requirement_mappings', ['target_urn_id'],
+                    unique=False)
+
+
+def downgrade():
+    op.create_table('requirement_mappings_old',
+    sa.Column('id', sa.String(length=255), nullable=False),
+    sa.Column('mapping_set_id', sa.String(length=255), nullable=False),
+    sa.Column('source_requirement_urn', sa.String(length=255), nullable=True),
+    sa.Column('target_requirement_urn', sa.String(length=255), nullable=True),
+    sa.Column('relationship_type', sa.String(length=50), nullable=True),
+    sa.Column('strength', sa.Integer(), nullable=True),
+    sa.Column('rationale', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['mapping_set_id'], ['requirement_mapping_sets.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute(
+        'INSERT INTO requirement_mappings_old (id, mapping_set_id, source_requirement_urn, target_requirement_urn, '
+        'relationship_type, strength, rationale, created_at) '
+        "SELECT mapping_set_id || ':' || COALESCE(source_requirement_urn, 'None') || ':' "
+        "|| COALESCE(target_requirement_urn, 'None'), mapping_set_id, source_requirement_urn, "
+        'target_requirement_urn, relationship_type, strength, rationale, created_at FROM requirement_mappings'
+    )
+    op.drop_table('requirement_mappings')
+    op.rename_table('requirement_mappings_old', 'requirement_mappings')
+    op.create_index('ix_requirement_mappings_mapping_set_id', 'requirement_mappings', ['mapping_set_id'],
+                    unique=False)
+    op.create_index('ix_requirement_mappings_source_requirement_urn', 'requirement_mappings',
+                    ['source_requirement_urn'], unique=False)
+    op.create_index('ix_requirement_mappings_target_requirement_urn', 'requirement_mappings',
+                    ['target_requirement_urn'], unique=False)
+
+    op.create_index('ix_requirement_nodes_urn', 'requirement_nodes', ['urn'], unique=True)
+    op.drop_index('ix_requirement_nodes_parent_urn_id_order_id', table_name='requirement_nodes')
+    op.drop_index('ix_requirement_nodes_urn_id', table_name='requirement_nodes')
+    with op.batch_alter_table('requirement_nodes') as batch_op:
+        batch_op.drop_constraint('fk_requirement_nodes_parent_urn_id', type_='foreignkey')
+        batch_op.drop_constraint('fk_requirement_nodes_urn_id', type_='foreignkey')
+        batch_op.drop_column('parent_urn_id')
+        batch_op.drop_column('urn_id')
+    op.create_index('ix_requirement_nodes_parent_urn_order_id', 'requirement_nodes', ['parent_urn', 'order_id'],
+                    unique=False)
+
+    op.drop_index('ix_urns_urn', table_name='urns')
+    op.drop_table('urns')
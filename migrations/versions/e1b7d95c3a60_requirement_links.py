@@ -0,0 +1,126 @@
+"""Requirement reference control and threat links
+
+Revision ID: e1b7d95c3a60
+Revises: c4f7a2e9b318
+Create Date: 2026-10-19 14:05:12.518734
+
+Association tables for the reference_controls / threats URN lists of
+requirement nodes, keyed on interned URN ids with an index for each
+direction. They are filled when libraries are imported or upgraded;
+frameworks already loaded are backfilled from the content of the stored
+library they were loaded from.
+
+"""
+import gzip
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1b7d95c3a60'
+down_revision = 'c4f7a2e9b318'
+branch_labels = None
+depends_on = None
+
+
+# (table, target URN id column, requirement node field)
+LINK_TABLES = [
+    ('requirement_reference_controls', 'reference_control_urn_id', 'reference_controls'),
+    ('requirement_threats', 'threat_urn_id', 'threats'),
+]
+
+# Same as app.models.urn.INTERN_BATCH
+INTERN_BATCH = 500
+
+frameworks = sa.table('frameworks', sa.column('id', sa.String))
+urns = sa.table('urns', sa.column('id', sa.Integer), sa.column('urn', sa.String))
+
+
+def _decompress(codec, data):
+    if codec == 'gzip':
+        return gzip.decompress(data)
+    import zstandard  # only present where zstd content was written
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+def _loaded_contents(connection):
+    """Content of the stored library of each loaded library"""
+    rows = connection.execute(sa.text(
+        'SELECT c.codec, c.data, s.content FROM loaded_libraries l '
+        'JOIN stored_libraries s ON s.id = l.stored_library_id '
+        'LEFT JOIN stored_library_contents c ON c.library_id = s.id'
+    ))
+    for codec, data, legacy in rows:
+        if data is not None:
+            yield json.loads(_decompress(codec, bytes(data)))
+        elif legacy is not None:
+            yield json.loads(legacy) if isinstance(legacy, (str, bytes)) else legacy
+
+
+def _lookup(connection, values):
+    ids = {}
+    values = sorted(values)
+    for start in range(0, len(values), INTERN_BATCH):
+        ids.update(connection.execute(
+            sa.select(urns.c.urn, urns.c.id).where(urns.c.urn.in_(values[start:start + INTERN_BATCH]))).all())
+    return ids
+
+
+def _intern(connection, values):
+    """{urn: id} for ``values``, adding the ones not in the urns table yet"""
+    values = set(values)
+    ids = _lookup(connection, values)
+    missing = sorted(values - ids.keys())
+    if missing:
+        connection.execute(urns.insert(), [{'urn': urn} for urn in missing])
+        ids.update(_lookup(connection, missing))
+    return ids
+
+
+def _backfill(connection):
+    framework_ids = set(connection.scalars(sa.select(frameworks.c.id)))
+    for content in _loaded_contents(connection):
+        framework = (content or {}).get('objects', {}).get('framework')
+        if not framework or framework.get('urn') not in framework_ids:
+            continue
+        pairs = {
+            field: {(node.get('urn'), urn) for node in framework.get('requirement_nodes') or []
+                    for urn in node.get(field) or [] if node.get('urn') and urn}
+            for _, _, field in LINK_TABLES
+        }
+        ids = _intern(connection, (urn for links in pairs.values() for pair in links for urn in pair))
+        for table_name, target_column, field in LINK_TABLES:
+            rows = {(ids[requirement_urn], ids[target_urn]) for requirement_urn, target_urn in pairs[field]}
+            if rows:
+                table = sa.table(table_name, sa.column('requirement_urn_id'), sa.column(target_column),
+                                 sa.column('framework_id'))
+                connection.execute(table.insert(), [
+                    {'requirement_urn_id': requirement_id, target_column: target_id, 'framework_id': framework['urn']}
+                    for requirement_id, target_id in sorted(rows)
+                ])
+
+
+def upgrade():
+    for table_name, target_column, _ in LINK_TABLES:
+        op.create_table(table_name,
+        sa.Column('requirement_urn_id', sa.Integer(), nullable=False),
+        sa.Column(target_column, sa.Integer(), nullable=False),
+        sa.Column('framework_id', sa.String(length=255), nullable=False),
+        sa.ForeignKeyConstraint(['framework_id'], ['frameworks.id'], ),
+        sa.ForeignKeyConstraint(['requirement_urn_id'], ['urns.id'], ),
+        sa.ForeignKeyConstraint([target_column], ['urns.id'], ),
+        sa.PrimaryKeyConstraint('requirement_urn_id', target_column)
+        )
+        op.create_index(f'ix_{table_name}_framework_id', table_name, ['framework_id'], unique=False)
+        op.create_index(f'ix_{table_name}_reverse', table_name, [target_column, 'requirement_urn_id'],
+                        unique=False)
+    _backfill(op.get_bind())
+
+
+def downgrade():
+    for table_name, _, _ in reversed(LINK_TABLES):
+        op.drop_index(f'ix_{table_name}_reverse', table_name=table_name)
+        op.drop_index(f'ix_{table_name}_framework_id', table_name=table_name)
+        op.drop_table(table_name)
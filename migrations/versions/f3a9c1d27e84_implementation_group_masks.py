@@ -0,0 +1,114 @@
+"""Implementation group masks
+
+Revision ID: f3a9c1d27e84
+Revises: e1b7d95c3a60
+Create Date: 2026-10-19 15:32:48.120957
+
+Stores the implementation_groups_definition of frameworks and, on
+requirement nodes, the implementation_groups list with its bitmask for the
+node (ig_mask) and for the node and its descendants (ig_subtree_mask).
+Existing frameworks and requirement nodes are backfilled from the content
+of the stored library they were loaded from.
+
+"""
+import gzip
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9c1d27e84'
+down_revision = 'e1b7d95c3a60'
+branch_labels = None
+depends_on = None
+
+# Same as app.models.framework.IG_MAX_GROUPS
+IG_MAX_GROUPS = 63
+
+frameworks = sa.table('frameworks', sa.column('id', sa.String),
+                      sa.column('implementation_groups_definition', sa.JSON))
+requirement_nodes = sa.table('requirement_nodes', sa.column('id', sa.String),
+                             sa.column('implementation_groups', sa.JSON),
+                             sa.column('ig_mask', sa.BigInteger), sa.column('ig_subtree_mask', sa.BigInteger))
+
+
+def _decompress(codec, data):
+    if codec == 'gzip':
+        return gzip.decompress(data)
+    import zstandard  # only present where zstd content was written
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+def _loaded_contents(connection):
+    """Content of the stored library of each loaded library"""
+    rows = connection.execute(sa.text(
+        'SELECT c.codec, c.data, s.content FROM loaded_libraries l '
+        'JOIN stored_libraries s ON s.id = l.stored_library_id '
+        'LEFT JOIN stored_library_contents c ON c.library_id = s.id'
+    ))
+    for codec, data, legacy in rows:
+        if data is not None:
+            yield json.loads(_decompress(codec, bytes(data)))
+        elif legacy is not None:
+            yield json.loads(legacy) if isinstance(legacy, (str, bytes)) else legacy
+
+
+def _masks(framework):
+    """{node URN: (groups, ig_mask, ig_subtree_mask)}, as the library import computes them"""
+    definition = framework.get('implementation_groups_definition') or []
+    bits = {group.get('ref_id'): 1 << index for index, group in enumerate(definition[:IG_MAX_GROUPS])}
+    nodes = framework.get('requirement_nodes') or []
+    own = {}
+    for node in nodes:
+        mask = 0
+        for group in node.get('implementation_groups') or []:
+            mask |= bits.get(group, 0)
+        own[node.get('urn')] = mask
+    parents = {node.get('urn'): node.get('parent_urn') for node in nodes}
+    subtree = dict.fromkeys(own, 0)
+    for urn, mask in own.items():
+        while urn in subtree and subtree[urn] | mask != subtree[urn]:
+            subtree[urn] |= mask
+            urn = parents.get(urn)
+    return {node.get('urn'): (node.get('implementation_groups'), own[node.get('urn')], subtree[node.get('urn')])
+            for node in nodes}
+
+
+def _backfill(connection):
+    for content in _loaded_contents(connection):
+        framework = (content or {}).get('objects', {}).get('framework')
+        if not framework or not framework.get('urn'):
+            continue
+        connection.execute(frameworks.update().where(frameworks.c.id == framework['urn']).values(
+            implementation_groups_definition=framework.get('implementation_groups_definition')))
+        rows = [{'node_id': urn, 'groups': groups, 'mask': mask, 'subtree_mask': subtree_mask}
+                for urn, (groups, mask, subtree_mask) in _masks(framework).items()
+                if urn and (groups or subtree_mask)]
+        if rows:
+            connection.execute(
+                requirement_nodes.update().where(requirement_nodes.c.id == sa.bindparam('node_id')).values(
+                    implementation_groups=sa.bindparam('groups', type_=sa.JSON),
+                    ig_mask=sa.bindparam('mask'), ig_subtree_mask=sa.bindparam('subtree_mask')),
+                rows
+            )
+
+
+def upgrade():
+    with op.batch_alter_table('frameworks') as batch_op:
+        batch_op.add_column(sa.Column('implementation_groups_definition', sa.JSON(), nullable=True))
+    with op.batch_alter_table('requirement_nodes') as batch_op:
+        batch_op.add_column(sa.Column('implementation_groups', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('ig_mask', sa.BigInteger(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('ig_subtree_mask', sa.BigInteger(), nullable=False, server_default='0'))
+    _backfill(op.get_bind())
+
+
+def downgrade():
+    with op.batch_alter_table('requirement_nodes') as batch_op:
+        batch_op.drop_column('ig_subtree_mask')
+        batch_op.drop_column('ig_mask')
+        batch_op.drop_column('implementation_groups')
+    with op.batch_alter_table('frameworks') as batch_op:
+        batch_op.drop_column('implementation_groups_definition')
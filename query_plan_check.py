@@ -0,0 +1,393 @@
+#!/usr/bin/env python
+"""
+Query plan capture and regression check for the hot API endpoints
+
+Seeds a local database with a deterministic library (frameworks, requirement
+tree, controls, mappings), requests each hot endpoint in-process, captures
+its SQL through engine events and explains every SELECT:
+
+- PostgreSQL: EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON); plan, cost, buffers
+  and execution time are recorded
+- SQLite: EXPLAIN QUERY PLAN (no costs)
+
+Plans are normalized (tree of node descriptions, aliases folded to table
+names) and compared with the committed baseline (query_plan_baseline.json,
+one section per database dialect). Regressions make the check fail:
+
+- a full table scan (Seq Scan / SCAN table) the baseline query did not have
+- more queries per endpoint than the baseline (N+1)
+- a planner cost above the baseline by more than --cost-tolerance (PostgreSQL)
+
+Other plan changes (e.g. a different index) are reported without failing.
+--database-url must point to an empty scratch database.
+
+Usage:
+    python query_plan_check.py                    # compare with the baseline
+    python query_plan_check.py --update           # rewrite this dialect's baseline
+    python query_plan_check.py --database-url postgresql://localhost/plans --scale 500 --update
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+from sqlalchemy import event
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'query_plan_baseline.json'
+MIGRATIONS_DIR = Path(__file__).resolve().parent / 'migrations'
+LIBRARY_URN = 'urn:plan-check:library'
+
+# Endpoint name -> URL, against the seeded data
+HOT_ENDPOINTS = {
+    'loaded_library_content': f'/api/loaded-libraries/{LIBRARY_URN}/content/',
+    'loaded_library_tree': f'/api/loaded-libraries/{LIBRARY_URN}/tree/',
+    'frameworks_with_requirements': '/api/frameworks/?include=requirements',
+    'framework_detail': '/api/frameworks/fw-0/',
+    'framework_tree': '/api/frameworks/fw-0/tree/',
+    'requirement_nodes_by_framework': '/api/requirement-nodes/?framework=fw-0',
+    'requirement_nodes_by_ref_id': '/api/requirement-nodes/?ref_id=3.3',
+    'requirement_node_detail': '/api/requirement-nodes/fw-0-req-3/',
+    'requirement_node_related': '/api/requirement-nodes/fw-0-req-3/related/',
+    'reference_controls': '/api/reference-controls/?limit=50',
+    'reference_control_requirements': '/api/reference-controls/control-0/requirements/',
+    'framework_reference_controls': '/api/frameworks/fw-0/reference-controls/',
+    'mapping_set_detail': '/api/requirement-mapping-sets/mapping-set/',
+    'mapping_sets_with_mappings': '/api/requirement-mapping-sets/?include=mappings',
+    'stored_libraries_loaded': '/api/stored-libraries/?is_loaded=true',
+    'stored_library_content': f'/api/stored-libraries/{LIBRARY_URN}/content/',
+}
+
+SEQ_SCAN_PATTERNS = [
+    re.compile(r'^\s*SCAN (\w+)$'),        # SQLite (an index-ordered scan reads "SCAN t USING INDEX")
+    re.compile(r'^\s*Seq Scan on (\w+)'),  # PostgreSQL
+]
+
+
+# ==================== DATABASE ====================
+
+def configure_database(args):
+    """Point the app at the plan database before application.py is imported"""
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        db_dir = tempfile.mkdtemp(prefix='hyperlynx-plans-')
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(db_dir, 'plans.sqlite')}"
+    # Every lookup must reach the database to be explained
+    os.environ['IDENTITY_CACHE_ENABLED'] = 'false'
+    os.environ['CACHE_BACKEND'] = 'memory'
+    os.environ.pop('DATABASE_REPLICA_URLS', None)
+    os.environ.pop('CATALOG_DB_PATH', None)
+    os.environ.pop('VERCEL', None)  # seeding runs the migrations through Flask-Migrate
+
+
+def seed_database(app, scale):
+    """One loaded library with two frameworks of 10 * scale requirements each, controls and mappings"""
+    from flask_migrate import upgrade
+    from application import db
+    from app.models import (Framework, LoadedLibrary, ReferenceControl, RequirementMapping, RequirementMappingSet,
+                            RequirementNode, RequirementReferenceControl, RiskMatrix, StoredLibrary, intern_urns)
+
+    with app.app_context():
+        # The migrated schema, with its migration-only indexes
+        upgrade(directory=str(MIGRATIONS_DIR))
+        if db.session.query(Framework.id).first() is not None:
+            raise SystemExit('[!] The database already has frameworks: use an empty scratch database')
+
+        db.session.add(StoredLibrary(id=LIBRARY_URN, urn=LIBRARY_URN, ref_id='plan-check', name='Plan check',
+                                     is_loaded=True, object_type='framework', content={'objects': {}}))
+        db.session.add(LoadedLibrary(id=LIBRARY_URN, urn=LIBRARY_URN, stored_library_id=LIBRARY_URN,
+                                     ref_id='plan-check', name='Plan check'))
+        for f in range(2):
+            framework_id = f'fw-{f}'
+            db.session.add(Framework(id=framework_id, urn=f'urn:plan-check:{framework_id}', ref_id=framework_id,
+                                     name=f'Framework {f}', library_urn=LIBRARY_URN))
+            # 'scale' sections of 9 requirements each
+            order = 0
+            for section in range(scale):
+                section_urn = f'urn:plan-check:{framework_id}:req:{order}'
+                db.session.add(RequirementNode(id=f'{framework_id}-req-{order}', urn=section_urn,
+                                               framework_id=framework_id, ref_id=str(section),
+                                               name=f'Section {section}', order_id=order, level=0,
+                                               assessable=False))
+                order += 1
+                for child in range(9):
+                    db.session.add(RequirementNode(id=f'{framework_id}-req-{order}',
+                                                   urn=f'urn:plan-check:{framework_id}:req:{order}',
+                                                   framework_id=framework_id, ref_id=f'{section}.{child}',
+                                                   name=f'Requirement {section}.{child}', order_id=order,
+                                                   level=1, parent_urn=section_urn))
+                    order += 1
+        for c in range(5 * scale):
+            db.session.add(ReferenceControl(id=f'control-{c}', urn=f'urn:plan-check:control:{c}', ref_id=f'C{c}',
+                                            name=f'Control {c}', library_urn=LIBRARY_URN))
+        db.session.add(RiskMatrix(id='matrix', urn='urn:plan-check:matrix', name='Matrix', library_urn=LIBRARY_URN))
+        db.session.add(RequirementMappingSet(id='mapping-set', urn='urn:plan-check:mapping-set', name='Mappings',
+                                             library_urn=LIBRARY_URN, source_framework_urn='urn:plan-check:fw-0',
+                                             target_framework_urn='urn:plan-check:fw-1'))
+        for m in range(10 * scale):
+            db.session.add(RequirementMapping(mapping_set_id='mapping-set',
+                                              source_requirement_urn=f'urn:plan-check:fw-0:req:{m}',
+                                              target_requirement_urn=f'urn:plan-check:fw-1:req:{m}',
+                                              relationship_type='equal', strength=100))
+        # Every requirement of fw-0 lists one of the controls
+        links = [(f'urn:plan-check:fw-0:req:{r}', f'urn:plan-check:control:{r % (5 * scale)}')
+                 for r in range(10 * scale)]
+        ids = intern_urns(db.session.connection(), (urn for link in links for urn in link))
+        db.session.execute(db.insert(RequirementReferenceControl), [
+            {'requirement_urn_id': ids[requirement], 'reference_control_urn_id': ids[control], 'framework_id': 'fw-0'}
+            for requirement, control in links
+        ])
+        # Tree snapshots, as written by an import
+        for framework in Framework.query.all():
+            framework.refresh_tree_snapshots()
+        db.session.commit()
+
+        if db.engine.dialect.name == 'postgresql':
+            with db.engine.connect() as connection:
+                connection.exec_driver_sql('ANALYZE')
+                connection.commit()
+
+
+# ==================== CAPTURE ====================
+
+def capture_statements(app, url):
+    """SELECT (and WITH ... SELECT) statements, with parameters, issued while serving ``url``"""
+    from application import db
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        response = app.test_client().get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+    if response.status_code != 200:
+        raise RuntimeError(f'GET {url} returned {response.status_code}')
+    return statements
+
+
+def normalize_sql(statement, table_names=()):
+    """Whitespace, bind markers, expanded IN lists and table aliases folded"""
+    statement = ' '.join(statement.split())
+    statement = re.sub(r'%\(\w+\)s|\$\d+|:\w+', '?', statement)
+    statement = re.sub(r'\(\?(?:, \?)+\)', '(?...)', statement)
+    return fold_aliases(statement, table_names)
+
+
+def fold_aliases(text, table_names):
+    """requirement_nodes_1 -> requirement_nodes (SQLAlchemy's eager load aliases)"""
+    for table in table_names:
+        text = re.sub(rf'\b{table}_\d+\b', table, text)
+    return text
+
+
+def explain_sqlite(connection, statement, parameters, table_names):
+    rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+    depths = {0: -1}
+    plan = []
+    for node_id, parent_id, _, detail in rows:
+        depths[node_id] = depths.get(parent_id, -1) + 1
+        plan.append('  ' * depths[node_id] + fold_aliases(detail, table_names))
+    return {'plan': plan, 'cost': None}
+
+
+def explain_postgresql(connection, statement, parameters, table_names):
+    result = connection.exec_driver_sql('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + statement, parameters)
+    document = result.scalar()
+    if isinstance(document, str):
+        document = json.loads(document)
+    root = document[0]
+    plan = []
+
+    def walk(node, depth):
+        description = node['Node Type']
+        if node.get('Index Name'):
+            description += f" using {node['Index Name']}"
+        if node.get('Relation Name'):
+            description += f" on {node['Relation Name']}"
+        plan.append('  ' * depth + fold_aliases(description, table_names))
+        for child in node.get('Plans', []):
+            walk(child, depth + 1)
+
+    walk(root['Plan'], 0)
+    return {
+        'plan': plan,
+        'cost': root['Plan']['Total Cost'],
+        'buffers': root['Plan'].get('Shared Hit Blocks', 0) + root['Plan'].get('Shared Read Blocks', 0),
+        'time_ms': root.get('Execution Time'),
+    }
+
+
+EXPLAINERS = {
+    'sqlite': explain_sqlite,
+    'postgresql': explain_postgresql,
+}
+
+
+def seq_scans(plan):
+    tables = []
+    for line in plan:
+        for pattern in SEQ_SCAN_PATTERNS:
+            match = pattern.match(line)
+            if match:
+                tables.append(match.group(1))
+    return sorted(set(tables))
+
+
+def capture_plans(app, endpoints=None):
+    """{endpoint name: [{sql, plan, seq_scans, cost, ...}]} for the hot endpoints"""
+    from application import db
+
+    endpoints = HOT_ENDPOINTS if endpoints is None else endpoints
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        table_names = sorted(db.metadata.tables, key=len, reverse=True)
+    if dialect not in EXPLAINERS:
+        raise SystemExit(f'[!] No EXPLAIN support for the {dialect} dialect')
+    explain = EXPLAINERS[dialect]
+
+    plans = {}
+    for name, url in endpoints.items():
+        statements = capture_statements(app, url)
+        queries = []
+        with app.app_context(), db.engine.connect() as connection:
+            for statement, parameters in statements:
+                query = {'sql': normalize_sql(statement, table_names)}
+                query.update(explain(connection, statement, parameters, table_names))
+                query['seq_scans'] = seq_scans(query['plan'])
+                queries.append(query)
+            connection.rollback()
+        plans[name] = queries
+    return dialect, plans
+
+
+# ==================== BASELINE ====================
+
+def load_baseline(path):
+    path = Path(path)
+    if not path.is_file():
+        return {}
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def write_baseline(path, dialect, scale, plans):
+    """Replace this dialect's section of the baseline file"""
+    baseline = load_baseline(path)
+    baseline[dialect] = {'scale': scale, 'endpoints': plans}
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(baseline, file, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+def compare_plans(baseline, current, cost_tolerance=0.5):
+    """(regressions, changes) between two {endpoint: [query]} maps, as readable lines"""
+    regressions, changes = [], []
+    for name, queries in sorted(current.items()):
+        if name not in baseline:
+            changes.append(f'{name}: not in the baseline')
+            continue
+        expected = baseline[name]
+        if len(queries) > len(expected):
+            regressions.append(f'{name}: {len(queries)} queries (baseline {len(expected)})')
+        elif len(queries) < len(expected):
+            changes.append(f'{name}: {len(queries)} queries (baseline {len(expected)})')
+
+        by_sql = {}
+        for query in expected:
+            by_sql.setdefault(query['sql'], []).append(query)
+        endpoint_scans = {table for query in expected for table in query['seq_scans']}
+        for query in queries:
+            matches = by_sql.get(query['sql'])
+            previous = matches.pop(0) if matches else None
+            known_scans = set(previous['seq_scans']) if previous else endpoint_scans
+            for table in query['seq_scans']:
+                if table not in known_scans:
+                    regressions.append(f'{name}: new full scan of {table} in {_shorten(query["sql"])}')
+            if previous is None:
+                changes.append(f'{name}: new query {_shorten(query["sql"])}')
+                continue
+            if query['plan'] != previous['plan']:
+                changes.append(f'{name}: plan changed for {_shorten(query["sql"])}')
+            if query.get('cost') is not None and previous.get('cost'):
+                if query['cost'] > previous['cost'] * (1 + cost_tolerance):
+                    regressions.append(f'{name}: cost {query["cost"]:.1f} (baseline {previous["cost"]:.1f}) '
+                                       f'for {_shorten(query["sql"])}')
+    return regressions, changes
+
+
+def _shorten(sql, width=90):
+    return sql if len(sql) <= width else sql[:width - 3] + '...'
+
+
+# ==================== CLI ====================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Capture query plans of the hot endpoints and diff the baseline')
+    parser.add_argument('--database-url', help='Empty scratch database (default: embedded SQLite)')
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Baseline JSON file')
+    parser.add_argument('--update', action='store_true', help="Write the captured plans as this dialect's baseline")
+    parser.add_argument('--scale', type=int, default=None,
+                        help="Seed size (10 * scale requirements per framework; default: the baseline's, else 1)")
+    parser.add_argument('--cost-tolerance', type=float, default=0.5,
+                        help='Allowed relative cost increase before failing (PostgreSQL)')
+    parser.add_argument('--json', dest='json_path', help='Also write the captured plans and the diff to this path')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Returns the report: {dialect, plans, regressions, changes}"""
+    args = parse_args(argv)
+    configure_database(args)
+    from application import create_app
+
+    app = create_app()
+    baseline = load_baseline(args.baseline)
+    with app.app_context():
+        from application import db
+        dialect = db.engine.dialect.name
+    section = baseline.get(dialect, {})
+    scale = args.scale or section.get('scale', 1)
+
+    print(f"[*] Seeding {app.config['SQLALCHEMY_DATABASE_URI']} (scale {scale}) ...")
+    seed_database(app, scale)
+    dialect, plans = capture_plans(app)
+    report = {'dialect': dialect, 'scale': scale, 'plans': plans, 'regressions': [], 'changes': []}
+
+    if args.update:
+        write_baseline(args.baseline, dialect, scale, plans)
+        print(f"[*] Baseline for {dialect} written to {args.baseline} "
+              f"({sum(len(q) for q in plans.values())} queries, {len(plans)} endpoints)")
+    elif not section:
+        print(f"[!] No {dialect} baseline in {args.baseline}; run with --update to create it")
+    elif section.get('scale') != scale:
+        print(f"[!] The {dialect} baseline was captured at scale {section.get('scale')}, not {scale}")
+        report['regressions'].append('scale mismatch')
+    else:
+        report['regressions'], report['changes'] = compare_plans(section['endpoints'], plans, args.cost_tolerance)
+        for line in report['changes']:
+            print(f"  [CHANGED] {line}")
+        for line in report['regressions']:
+            print(f"  [REGRESSION] {line}")
+        print(f"[*] {len(report['regressions'])} regressions, {len(report['changes'])} other changes "
+              f"({dialect}, {len(plans)} endpoints)")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        print(f"[*] Report written to {args.json_path}")
+    return report
+
+
+if __name__ == '__main__':
+    report = main()
+    sys.exit(1 if report['regressions'] else 0)
@@ -0,0 +1,141 @@
+"""Tests for compliance assessments and their incremental score rollups"""
+import pytest
+from sqlalchemy import event
+
+from application import db
+from app import assessments
+from app.assessments import rebuild_rollups
+from app.models import (AssessmentSubtreeScore, ComplianceAssessment, Framework, LoadedLibrary, ROLLUP_COLUMNS,
+                        RequirementNode)
+
+
+@pytest.fixture
+def app_env():
+    return {'IDENTITY_CACHE_ENABLED': 'false'}
+
+
+@pytest.fixture
+def app(app):
+    db.session.add(LoadedLibrary(id='urn:lib', urn='urn:lib', name='Library'))
+    db.session.add(Framework(id='fw', urn='urn:fw', ref_id='fw', name='Framework', library_urn='urn:lib',
+                             min_score=0, max_score=4))
+    # s1 > (a, b > (b1, b2)); s2 > c (s1, s2, b not assessable)
+    for node, parent, assessable in [('s1', None, False), ('a', 's1', True), ('b', 's1', False),
+                                     ('b1', 'b', True), ('b2', 'b', True), ('s2', None, False),
+                                     ('c', 's2', True)]:
+        db.session.add(RequirementNode(id=node, urn=f'urn:{node}', framework_id='fw', assessable=assessable,
+                                       parent_urn=f'urn:{parent}' if parent else None))
+    db.session.commit()
+    return app
+
+
+def _create(client):
+    response = client.post('/api/assessments/', json={'framework': 'fw', 'name': 'Audit'})
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+def _rollups(assessment_id):
+    return {
+        (row.node_urn_id, tuple(getattr(row, column) for column in ROLLUP_COLUMNS))
+        for row in AssessmentSubtreeScore.query.filter_by(assessment_id=assessment_id)
+    }
+
+
+def test_answers_roll_up_to_subtrees_and_framework(app):
+    client = app.test_client()
+    assessment_id = _create(client)
+    assert client.get(f'/api/assessments/{assessment_id}/score/').get_json()['assessable'] == 4
+
+    response = client.put(f'/api/assessments/{assessment_id}/results/', json={'results': [
+        {'requirement': 'a', 'status': 'compliant', 'score': 4},
+        {'requirement': 'urn:b1', 'status': 'partially_compliant', 'score': 2},
+        {'requirement': 'b2', 'status': 'not_applicable', 'score': 0},
+    ]})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert (data['inserted'], data['updated'], data['rollups_updated']) == (3, 0, 5)  # a, b1, b2, b, s1
+    assert data['summary']['score'] == 3.0 and data['summary']['answered'] == 3
+    assert data['summary']['progress'] == 0.75
+    b = client.get(f'/api/assessments/{assessment_id}/score/?node=b').get_json()
+    assert (b['score'], b['scored'], b['statuses']['not_applicable']) == (2.0, 1, 1)
+    s2 = client.get(f'/api/assessments/{assessment_id}/score/?node=s2').get_json()
+    assert (s2['score'], s2['answered']) == (None, 0)
+
+    changed = client.patch(f'/api/assessments/{assessment_id}/results/', json={'results': [
+        {'requirement': 'b1', 'score': 4}, {'requirement': 'a', 'observation': 'Seen'}]}).get_json()
+    assert (changed['updated'], changed['rollups_updated']) == (2, 3)  # b1, b, s1: the observation moves nothing
+    assert changed['summary']['score'] == 4.0
+    results = client.get(f'/api/assessments/{assessment_id}/results/').get_json()['results']
+    assert [(r['requirement_urn'], r['score'], r['observation']) for r in results] == [
+        ('urn:a', 4, 'Seen'), ('urn:b1', 4, None), ('urn:b2', 0, None)]
+
+
+def test_incremental_rollups_match_a_rebuild(app):
+    client = app.test_client()
+    assessment_id = _create(client)
+    for batch in ([{'requirement': 'a', 'status': 'compliant', 'score': 3}, {'requirement': 'c', 'score': 1}],
+                  [{'requirement': 'c', 'status': 'non_compliant'}, {'requirement': 'b2', 'status': 'compliant'}],
+                  [{'requirement': 'a', 'status': 'not_assessed', 'score': None}]):
+        assert client.put(f'/api/assessments/{assessment_id}/results/', json={'results': batch}).status_code == 200
+    incremental = _rollups(assessment_id)
+    summary = client.get(f'/api/assessments/{assessment_id}/score/').get_json()
+
+    assessment = db.session.get(ComplianceAssessment, assessment_id)
+    rebuild_rollups(assessment)
+    db.session.commit()
+
+    assert {row for row in _rollups(assessment_id) if any(row[1])} == {row for row in incremental if any(row[1])}
+    assert client.get(f'/api/assessments/{assessment_id}/score/').get_json() == summary
+
+
+def test_invalid_answers_write_nothing(app):
+    client = app.test_client()
+    assessment_id = _create(client)
+
+    for results in ([{'requirement': 'nope', 'status': 'compliant'}], [{'requirement': 's1', 'status': 'compliant'}],
+                    [{'requirement': 'a', 'status': 'great'}], [{'requirement': 'a', 'score': 9}],
+                    [{'requirement': 'a', 'score': 1}, {'status': 'compliant'}]):
+        response = client.put(f'/api/assessments/{assessment_id}/results/', json={'results': results})
+        assert response.status_code == 400, results
+    assert client.get(f'/api/assessments/{assessment_id}/results/').get_json()['count'] == 0
+    assert client.post('/api/assessments/', json={'framework': 'nope', 'name': 'x'}).status_code == 400
+
+
+def test_score_reads_are_one_row(app):
+    client = app.test_client()
+    assessment_id = _create(client)
+    client.put(f'/api/assessments/{assessment_id}/results/', json={'results': [
+        {'requirement': node, 'status': 'compliant', 'score': 2} for node in ('a', 'b1', 'b2', 'c')]})
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    assert client.get(f'/api/assessments/{assessment_id}/score/').get_json()['progress'] == 1.0
+    assert len(statements) == 1 and 'requirement_nodes' not in statements[0]
+
+
+def test_colliding_first_answer_is_retried_as_update(app, monkeypatch):
+    client = app.test_client()
+    assessment_id = _create(client)
+    assert client.put(f'/api/assessments/{assessment_id}/results/', json={'results': [
+        {'requirement': 'a', 'status': 'compliant', 'score': 4}]}).status_code == 200
+
+    # The first read misses the answer, as if another request inserted it meanwhile
+    stored_results = assessments._stored_results
+    calls = []
+
+    def racing_read(*args):
+        calls.append(args)
+        return {} if len(calls) == 1 else stored_results(*args)
+
+    monkeypatch.setattr(assessments, '_stored_results', racing_read)
+
+    response = client.put(f'/api/assessments/{assessment_id}/results/', json={'results': [
+        {'requirement': 'a', 'status': 'non_compliant', 'score': 0}]})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert len(calls) == 2 and (data['inserted'], data['updated']) == (0, 1)
+    assert data['summary']['answered'] == 1 and data['summary']['score'] == 0.0
@@ -0,0 +1,63 @@
+"""Tests for the batch-get endpoints"""
+import pytest
+from sqlalchemy import event
+
+from application import db
+from app.models import ReferenceControl, RiskMatrix
+
+
+@pytest.fixture
+def app(app):
+    for i in range(5):
+        db.session.add(ReferenceControl(id=f'c{i}', urn=f'urn:control:{i}', name=f'Control {i}',
+                                        translations={'fr': {'name': f'Mesure {i}'}}))
+    db.session.add(RiskMatrix(id='rm', urn='urn:matrix', name='Matrix'))
+    db.session.commit()
+    return app
+
+
+def test_batch_get_in_one_query_with_missing(app):
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    data = app.test_client().get(
+        '/api/reference-controls/batch/?id=c3&id=urn:control:1,nope&id=c3'
+    ).get_json()
+
+    assert [c['id'] for c in data['results']] == ['c3', 'c1']
+    assert data['missing'] == ['nope']
+    assert len(statements) == 1
+
+
+def test_batch_get_uses_identity_cache_and_locale(app):
+    client = app.test_client()
+    client.get('/api/reference-controls/batch/?id=c0&id=c1')
+
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    data = client.get('/api/reference-controls/batch/?id=c0&id=c1&locale=fr').get_json()
+
+    assert statements == []
+    assert [c['name'] for c in data['results']] == ['Mesure 0', 'Mesure 1']
+
+
+def test_batch_get_every_collection_and_limits(app):
+    client = app.test_client()
+    for collection in ('stored-libraries', 'loaded-libraries', 'frameworks', 'requirement-nodes',
+                       'reference-controls', 'risk-matrices', 'requirement-mapping-sets'):
+        response = client.get(f'/api/{collection}/batch/?id=urn:matrix')
+        assert response.status_code == 200
+
+    assert client.get('/api/risk-matrices/batch/?id=urn:matrix').get_json()['results'][0]['id'] == 'rm'
+    assert client.get('/api/risk-matrices/batch/').status_code == 400
+    too_many = '&'.join(f'id=x{i}' for i in range(501))
+    assert client.get(f'/api/risk-matrices/batch/?{too_many}').status_code == 400
+
+
+def test_batch_routes_documented(app):
+    spec = app.test_client().get('/apispec.json').get_json()
+    operation = spec['paths']['/api/frameworks/batch/']['get']
+    assert operation['tags'] == ['Frameworks']
+    assert operation['parameters'][0]['name'] == 'id'
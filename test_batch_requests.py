@@ -0,0 +1,48 @@
+"""Tests for the composite /api/batch endpoint"""
+import pytest
+
+from application import db
+from app.models import Framework, ReferenceControl, RiskMatrix
+
+
+@pytest.fixture
+def app(app):
+    db.session.add(Framework(id='fw', urn='fw', ref_id='fw', name='Framework',
+                             translations={'fr': {'name': 'Référentiel'}}))
+    db.session.add(ReferenceControl(id='c1', urn='c1', name='Control'))
+    db.session.add(RiskMatrix(id='rm', urn='rm', name='Matrix'))
+    db.session.commit()
+    return app
+
+
+def test_batch_runs_sub_requests_in_order(app):
+    response = app.test_client().post('/api/batch', json={'requests': [
+        {'id': 'framework', 'path': '/api/frameworks/fw/'},
+        {'id': 'tree', 'path': '/api/frameworks/fw/tree/'},
+        {'path': '/api/reference-controls/batch/?id=c1&id=zz'},
+        {'id': 'missing', 'path': '/api/risk-matrices/nope/'},
+    ]}, headers={'Accept-Language': 'fr'})
+
+    data = response.get_json()
+    assert response.status_code == 200
+    assert data['count'] == 4
+    items = data['responses']
+    assert [item['id'] for item in items] == ['framework', 'tree', 2, 'missing']
+    assert items[0]['body']['name'] == 'Référentiel'
+    assert items[1]['body']['tree'] == []
+    assert items[2]['body']['missing'] == ['zz']
+    assert items[3]['status'] == 404
+
+
+def test_batch_rejects_invalid_requests(app):
+    client = app.test_client()
+    assert client.post('/api/batch', json={}).status_code == 400
+    assert client.post('/api/batch', json={'requests': [{'path': '/auth/profile'}]}).status_code == 400
+    assert client.post('/api/batch', json={'requests': [{'path': '/api/x/', 'method': 'DELETE'}]}).status_code == 400
+    assert client.post('/api/batch', json={'requests': [{'path': '/api/batch'}]}).status_code == 400
+    assert client.post('/api/batch', json={'requests': [{'path': '/api/x/'}] * 51}).status_code == 400
+
+
+def test_batch_unknown_route_is_item_status(app):
+    data = app.test_client().post('/api/batch', json={'requests': [{'path': '/api/unknown/'}]}).get_json()
+    assert data['responses'][0]['status'] == 404
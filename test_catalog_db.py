@@ -0,0 +1,190 @@
+"""Tests for the bundled read-only catalog database"""
+import pytest
+from sqlalchemy import event
+
+from application import db, identity_cache
+from app.models import LoadedLibrary, StoredLibrary
+from build_catalog import build_catalog
+
+LIBRARY_YAML = """
+urn: urn:test:library:{name}
+ref_id: {name}
+name: Library {name}
+provider: {provider}
+version: 1
+objects:
+  framework:
+    urn: urn:test:framework:{name}
+    requirement_nodes:
+      - urn: urn:test:req:{name}:1
+        ref_id: '1'
+"""
+
+
+@pytest.fixture
+def catalog_path(tmp_path):
+    libraries = tmp_path / 'libraries'
+    libraries.mkdir()
+    for name, provider in (('one', 'ACME'), ('two', 'ACME'), ('three', 'Other')):
+        (libraries / f'{name}.yaml').write_text(LIBRARY_YAML.format(name=name, provider=provider))
+    path = tmp_path / 'catalog.sqlite3'
+    assert build_catalog(path, libraries) == (3, 0)
+    return path
+
+
+@pytest.fixture
+def app_env(catalog_path):
+    return {'CATALOG_DB_PATH': str(catalog_path)}
+
+
+@pytest.fixture
+def app(app):
+    # The primary database only knows the loaded library and a later upload
+    db.session.add(LoadedLibrary(id='urn:test:library:two', urn='urn:test:library:two', name='Library two'))
+    db.session.add(StoredLibrary(id='urn:test:upload', urn='urn:test:upload', ref_id='upload',
+                                 name='Uploaded', provider='Local', is_loaded=True, content={'objects': {}}))
+    db.session.commit()
+    return app
+
+
+def _statements(engine):
+    statements = []
+    event.listen(engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+def test_catalog_reads_merge_bundle_and_primary(app):
+    client = app.test_client()
+    catalog = _statements(app.extensions['catalog_engine'])
+
+    data = client.get('/api/stored-libraries/?limit=10').get_json()
+
+    assert data['count'] == 4
+    assert {lib['urn']: lib['is_loaded'] for lib in data['results']} == {
+        'urn:test:upload': True,
+        'urn:test:library:one': False,
+        'urn:test:library:two': True,
+        'urn:test:library:three': False,
+    }
+    assert catalog
+    content = client.get('/api/stored-libraries/urn:test:library:one/content/').get_json()
+    assert content['content']['objects']['framework']['urn'] == 'urn:test:framework:one'
+
+
+def test_loaded_filter_and_facets_use_primary_state(app):
+    client = app.test_client()
+    loaded = client.get('/api/stored-libraries/?is_loaded=true').get_json()
+    assert [lib['urn'] for lib in loaded['results']] == ['urn:test:upload', 'urn:test:library:two']
+
+    facets = client.get('/api/stored-libraries/facets/').get_json()['facets']
+    assert {f['value']: f['count'] for f in facets['is_loaded']} == {True: 2, False: 2}
+    assert {f['value']: f['count'] for f in facets['provider']} == {'ACME': 2, 'Other': 1, 'Local': 1}
+
+
+def test_pages_span_primary_and_bundle(app):
+    client = app.test_client()
+    pages = [client.get(f'/api/stored-libraries/?limit=3&offset={offset}').get_json() for offset in (0, 3)]
+    assert [page['count'] for page in pages] == [4, 4]
+    urns = [lib['urn'] for page in pages for lib in page['results']]
+    assert len(urns) == len(set(urns)) == 4
+    assert urns[0] == 'urn:test:upload'
+
+
+def test_primary_row_shadows_bundle_row(app):
+    with app.app_context():
+        db.session.add(StoredLibrary(id='urn:test:library:one', urn='urn:test:library:one', ref_id='one',
+                                     name='Edited one', provider='ACME', content={'objects': {}}))
+        db.session.commit()
+    client = app.test_client()
+
+    data = client.get('/api/stored-libraries/?limit=10').get_json()
+    assert data['count'] == 4
+    assert [lib['name'] for lib in data['results'] if lib['urn'] == 'urn:test:library:one'] == ['Edited one']
+    assert client.get('/api/stored-libraries/urn:test:library:one/').get_json()['name'] == 'Edited one'
+    assert client.get('/api/stored-libraries/provider/').get_json()['providers'] == ['ACME', 'Local', 'Other']
+
+
+def test_detail_reads_primary_then_bundle(app):
+    client = app.test_client()
+    catalog = _statements(app.extensions['catalog_engine'])
+    response = client.get('/api/stored-libraries/urn:test:upload/')
+    assert response.status_code == 200
+    assert response.get_json()['name'] == 'Uploaded'
+    assert not catalog
+
+    assert client.get('/api/stored-libraries/urn:test:library:three/').get_json()['name'] == 'Library three'
+    assert client.get('/api/stored-libraries/urn:test:nope/').status_code == 404
+
+
+def test_bundle_rows_not_identity_cached(app):
+    identity_cache.clear()
+    client = app.test_client()
+    for _ in range(2):
+        assert client.get('/api/stored-libraries/urn:test:library:three/').status_code == 200
+        assert client.get('/api/stored-libraries/urn:test:upload/').status_code == 200
+    with app.app_context():
+        assert identity_cache.get(StoredLibrary, 'urn:test:library:three') is None
+        assert identity_cache.get(StoredLibrary, 'urn:test:upload').name == 'Uploaded'
+
+
+def test_writes_go_to_primary(app):
+    primary = _statements(db.engines[None])
+    response = app.test_client().post('/api/stored-libraries/urn:test:upload/unload/')
+    assert response.status_code == 200
+    assert any(s.lstrip().upper().startswith('UPDATE') for s in primary)
+
+
+def test_bundled_library_imports_into_primary(app):
+    client = app.test_client()
+    response = client.post('/api/stored-libraries/urn:test:library:one/import/')
+    assert response.status_code == 200
+    assert client.post('/api/stored-libraries/urn:test:library:one/import/').status_code == 400
+
+    with app.app_context():
+        library = db.session.get(StoredLibrary, 'urn:test:library:one')
+        assert library.is_loaded and library.content['objects']['framework']['urn'] == 'urn:test:framework:one'
+    data = client.get('/api/stored-libraries/?limit=10').get_json()
+    assert data['count'] == 4
+    assert {lib['urn']: lib['is_loaded'] for lib in data['results']}['urn:test:library:one'] is True
+
+    assert client.post('/api/stored-libraries/urn:test:library:one/unload/').status_code == 200
+    assert client.get('/api/stored-libraries/urn:test:library:one/').get_json()['is_loaded'] is False
+
+
+def test_upgrade_picks_up_newer_bundle(app, catalog_path):
+    client = app.test_client()
+    assert client.post('/api/stored-libraries/urn:test:library:one/import/').status_code == 200
+    libraries = catalog_path.parent / 'libraries'
+    (libraries / 'one.yaml').write_text(
+        LIBRARY_YAML.format(name='one', provider='ACME').replace('version: 1', 'version: 2'))
+    build_catalog(catalog_path, libraries)
+    app.extensions['catalog_engine'].dispose()
+
+    response = client.post('/api/stored-libraries/urn:test:library:one/upgrade/')
+    assert response.status_code == 200
+    assert response.get_json()['library']['version'] == '2'
+    assert client.get('/api/stored-libraries/urn:test:library:one/').get_json()['version'] == '2'
+
+
+def test_bundle_only_library_cannot_be_deleted(app):
+    client = app.test_client()
+    assert client.delete('/api/stored-libraries/urn:test:library:one/').status_code == 400
+    assert client.delete('/api/stored-libraries/urn:test:upload/').status_code == 200
+
+
+def test_catalog_reads_skip_primary_once_cached(app):
+    with app.app_context():
+        db.session.delete(db.session.get(StoredLibrary, 'urn:test:upload'))
+        db.session.commit()
+    client = app.test_client()
+    primary = _statements(db.engines[None])
+    catalog = _statements(app.extensions['catalog_engine'])
+
+    first = client.get('/api/stored-libraries/?limit=2&facets=true').get_json()
+    assert first['count'] == 3
+    # Only the cached loaded/stored URN lookups: no COUNT or page query on the primary
+    assert len(primary) == 2 and not any('count(' in s.lower() for s in primary)
+    primary.clear(), catalog.clear()
+    assert client.get('/api/stored-libraries/?limit=2&facets=true').get_json() == first
+    assert not primary and not catalog
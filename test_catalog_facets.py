@@ -0,0 +1,62 @@
+"""Tests for the faceted catalog endpoint"""
+import pytest
+from sqlalchemy import event
+
+from application import db
+from app.models import StoredLibrary
+
+
+LIBRARIES = [
+    ('a', 'Alpha controls', 'intuitem', 'en', 'framework'),
+    ('b', 'Beta controls', 'intuitem', 'fr', 'framework'),
+    ('c', 'Gamma matrix', 'anssi', 'fr', 'risk_matrix'),
+]
+
+
+@pytest.fixture
+def app(app):
+    for urn, name, provider, locale, object_type in LIBRARIES:
+        db.session.add(StoredLibrary(id=urn, urn=urn, ref_id=urn, name=name, provider=provider,
+                                     locale=locale, object_type=object_type, packager='intuitem'))
+    db.session.commit()
+    return app
+
+
+def _counts(facet):
+    return {item['value']: item['count'] for item in facet}
+
+
+def test_facets_in_one_query(app):
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    data = app.test_client().get('/api/stored-libraries/facets/').get_json()
+
+    assert len(statements) == 1
+    assert data['count'] == 3
+    assert _counts(data['facets']['provider']) == {'intuitem': 2, 'anssi': 1}
+    assert _counts(data['facets']['locale']) == {'fr': 2, 'en': 1}
+    assert _counts(data['facets']['is_loaded']) == {False: 3}
+
+
+def test_facets_follow_search_and_are_cached(app):
+    client = app.test_client()
+    data = client.get('/api/stored-libraries/facets/?search=controls').get_json()
+    assert _counts(data['facets']['object_type']) == {'framework': 2}
+
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    client.get('/api/stored-libraries/facets/?search=controls')
+    assert statements == []
+
+
+def test_list_with_facets_and_invalidation_on_delete(app):
+    client = app.test_client()
+    data = client.get('/api/stored-libraries/?facets=true').get_json()
+    assert data['count'] == 3 and data['facets']['count'] == 3
+
+    client.delete('/api/stored-libraries/c/')
+    data = client.get('/api/stored-libraries/facets/').get_json()
+    assert _counts(data['facets']['provider']) == {'intuitem': 2}
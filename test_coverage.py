@@ -0,0 +1,102 @@
+"""Tests for cross-framework coverage inferred through mapping sets"""
+import time
+from pathlib import Path
+
+import pytest
+import yaml
+
+from application import db
+from app.coverage import STATUS_COMPLIANCE, mapping_path, project
+from app.models import (Framework, LoadedLibrary, RequirementAssessment, RequirementMapping, RequirementMappingSet,
+                        RequirementNode)
+from app.routes.stored_libraries import create_stored_library_from_yaml
+from load_libraries import sanitize_content
+
+LIBRARIES = Path(__file__).parent / 'libraries'
+
+
+@pytest.fixture
+def app_env():
+    return {'IDENTITY_CACHE_ENABLED': 'false'}
+
+
+def _add_mappings(set_id, source, target, mappings):
+    db.session.add(RequirementMappingSet(id=set_id, urn=f'urn:{set_id}', name=set_id, library_urn='urn:lib',
+                                         source_framework_urn=f'urn:{source}', target_framework_urn=f'urn:{target}'))
+    for source_req, target_req, relationship, strength in mappings:
+        db.session.add(RequirementMapping(mapping_set_id=set_id, source_requirement_urn=f'urn:{source_req}',
+                                          target_requirement_urn=f'urn:{target_req}',
+                                          relationship_type=relationship, strength=strength))
+
+
+@pytest.fixture
+def frameworks(app):
+    db.session.add(LoadedLibrary(id='urn:lib', urn='urn:lib', name='Library'))
+    db.session.add(Framework(id='urn:a', urn='urn:a', ref_id='a', name='A', library_urn='urn:lib'))
+    for node in ('a1', 'a2', 'a3'):
+        db.session.add(RequirementNode(id=f'urn:{node}', urn=f'urn:{node}', framework_id='urn:a'))
+    _add_mappings('a-to-b', 'a', 'b', [
+        ('a1', 'b1', 'equal', None),
+        ('a2', 'b1', 'intersect', None),   # b1: (1 * 1 + 0.5 * 0) / 1.5
+        ('a2', 'b2', 'subset', None),
+        ('a3', 'b3', 'equal', None),       # a3 not assessed: b3 unknown
+    ])
+    # Read backwards: "c1 subset b1" becomes "b1 superset c1"
+    _add_mappings('c-to-b', 'c', 'b', [('c1', 'b1', 'subset', 2), ('c2', 'b2', 'equal', 1)])
+    db.session.commit()
+    client = app.test_client()
+    assessment_id = client.post('/api/assessments/', json={'framework': 'urn:a', 'name': 'A audit'}).get_json()['id']
+    client.put(f'/api/assessments/{assessment_id}/results/', json={'results': [
+        {'requirement': 'urn:a1', 'status': 'compliant'}, {'requirement': 'urn:a2', 'status': 'non_compliant'}]})
+    return assessment_id
+
+
+def test_projection_through_one_mapping_set(app, frameworks):
+    data = app.test_client().get(f'/api/assessments/{frameworks}/projection/?framework=urn:b').get_json()
+
+    assert [(step['mapping_set_id'], step['reversed']) for step in data['path']] == [('a-to-b', False)]
+    assert [(r['urn'], r['coverage'], r['confidence']) for r in data['results']] == [
+        ('urn:b1', 0.6667, 1.0), ('urn:b2', 0.0, 0.5)]
+    assert data['summary']['mapped'] == 2
+
+
+def test_projection_chains_through_a_pivot_framework(app, frameworks):
+    assert [(s.id, reverse) for s, reverse in mapping_path('urn:a', 'urn:c')] == [('a-to-b', False),
+                                                                                  ('c-to-b', True)]
+    data = app.test_client().get(f'/api/assessments/{frameworks}/projection/?framework=urn:c').get_json()
+
+    # c1 from b1 (superset, strength 2/2); c2 from b2 (equal, strength 1/2) with b2's confidence 0.5
+    assert [(r['urn'], r['coverage'], r['confidence']) for r in data['results']] == [
+        ('urn:c1', 0.6667, 1.0), ('urn:c2', 0.0, 0.25)]
+    assert app.test_client().get(f'/api/assessments/{frameworks}/projection/?framework=urn:z').status_code == 404
+    assert app.test_client().get(f'/api/assessments/{frameworks}/projection/').status_code == 400
+
+
+def _import(client, name):
+    with open(LIBRARIES / name, 'r', encoding='utf-8') as file:
+        content = sanitize_content(yaml.safe_load(file))
+    db.session.add(create_stored_library_from_yaml(content))
+    db.session.commit()
+    assert client.post(f"/api/stored-libraries/{content['urn']}/import/").status_code == 200
+    return content
+
+
+def test_real_assessment_projects_in_milliseconds(app):
+    client = app.test_client()
+    framework_urn = _import(client, 'iso27001-2022.yaml')['objects']['framework']['urn']
+    _import(client, 'mapping-nist-csf-2.0-to-iso27001-2022.yaml')
+    mapping_set = RequirementMappingSet.query.filter_by(target_framework_urn=framework_urn).first()
+    target_urn = mapping_set.source_framework_urn
+    nodes = RequirementNode.query.filter_by(framework_id=framework_urn, assessable=True).all()
+    statuses = list(STATUS_COMPLIANCE)
+    compliance = {node.urn_id: STATUS_COMPLIANCE[statuses[i % 3]] for i, node in enumerate(nodes)}
+
+    path = mapping_path(framework_urn, target_urn)
+    project(compliance, path)  # compiles the mapping set
+    start = time.perf_counter()
+    ids, coverage, confidence = project(compliance, path)
+    elapsed = time.perf_counter() - start
+
+    assert ids.size > 0 and ((coverage >= 0) & (coverage <= 1)).all() and (confidence > 0).all()
+    assert elapsed < 0.05
+    assert RequirementAssessment.query.count() == 0
@@ -0,0 +1,105 @@
+"""Tests for the id/URN identity cache"""
+import pytest
+from sqlalchemy import event
+
+from application import db, identity_cache
+from app.models import Framework
+
+
+@pytest.fixture
+def app(app):
+    db.session.add(Framework(id='fw-1', urn='urn:test:framework:one', ref_id='one', name='One'))
+    db.session.commit()
+    return app
+
+
+def _count_selects(app):
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute',
+                 lambda conn, cursor, stmt, *args: statements.append(stmt) if stmt.startswith('SELECT') else None)
+    return statements
+
+
+def test_lookup_by_id_and_urn_hits_cache(app):
+    first = identity_cache.get(Framework, 'fw-1')
+    assert first.name == 'One'
+    db.session.remove()
+
+    selects = _count_selects(app)
+    by_urn = identity_cache.get(Framework, 'urn:test:framework:one')
+    by_id = identity_cache.get(Framework, 'fw-1')
+
+    assert by_urn.id == by_id.id == 'fw-1'
+    assert selects == []
+    stats = identity_cache.stats()['models']['frameworks']
+    assert stats['hits'] == 2
+    assert stats['misses'] == 1
+
+
+def test_update_and_delete_invalidate(app):
+    framework = identity_cache.get(Framework, 'fw-1')
+    framework.name = 'Renamed'
+    db.session.commit()
+    db.session.remove()
+
+    assert identity_cache.get(Framework, 'urn:test:framework:one').name == 'Renamed'
+
+    db.session.delete(identity_cache.get(Framework, 'fw-1'))
+    db.session.commit()
+    db.session.remove()
+
+    assert identity_cache.get(Framework, 'fw-1') is None
+
+
+def test_bulk_delete_clears_model_cache(app):
+    identity_cache.get(Framework, 'fw-1')
+    Framework.query.filter_by(id='fw-1').delete()
+    db.session.commit()
+
+    assert identity_cache.get(Framework, 'urn:test:framework:one') is None
+
+
+def test_cache_metrics_endpoint(app):
+    identity_cache.get(Framework, 'fw-1')
+    response = app.test_client().get('/api/metrics/cache/')
+    assert response.status_code == 200
+    assert 'frameworks' in response.get_json()['identity_cache']['models']
+
+
+def test_snapshots_are_not_shared(app):
+    framework = identity_cache.get(Framework, 'fw-1')
+    framework.translations = {'fr': {'name': 'Un'}}
+    db.session.commit()
+    db.session.remove()
+
+    cached = identity_cache.get(Framework, 'fw-1')
+    cached.translations['fr']['name'] = 'Changed in place'
+    db.session.remove()
+
+    assert identity_cache.get(Framework, 'fw-1').translations == {'fr': {'name': 'Un'}}
+
+
+def test_load_racing_an_invalidation_is_not_cached(app):
+    cache = identity_cache._cache_for(Framework)
+    generation = cache.generation
+    stale = {'id': 'fw-1', 'urn': 'urn:test:framework:one', 'ref_id': 'one', 'name': 'Stale'}
+
+    # A commit invalidates the row while the load is still running
+    cache.discard(('fw-1',))
+    cache.put(('fw-1', 'urn:test:framework:one'), stale, generation)
+
+    assert cache.get('fw-1') is None
+
+
+def test_write_requests_bypass_cache(app):
+    identity_cache.get(Framework, 'fw-1')
+    db.session.remove()
+
+    with app.test_request_context('/', method='PUT'):
+        selects = _count_selects(app)
+        assert identity_cache.get(Framework, 'fw-1').name == 'One'
+        assert selects
+    with app.test_request_context('/', method='GET'):
+        selects = _count_selects(app)
+        assert identity_cache.get(Framework, 'fw-1').name == 'One'
+        assert selects == []
@@ -0,0 +1,79 @@
+"""Tests for implementation group masks and ?ig= filters"""
+import pytest
+from sqlalchemy import event
+
+from application import db
+from app.models import RequirementNode
+from app.routes.stored_libraries import create_stored_library_from_yaml, implementation_group_masks
+
+FRAMEWORK = {
+    'urn': 'urn:test:framework', 'ref_id': 'fw', 'name': 'Framework',
+    'implementation_groups_definition': [{'ref_id': 'IG1', 'name': 'Basic'}, {'ref_id': 'IG2', 'name': 'Standard'},
+                                         {'ref_id': 'IG3', 'name': 'Advanced'}],
+    # s1 > (c1: IG1 IG2 IG3, c2: IG3 > c2.1: IG2); s2 > c3: IG3
+    'requirement_nodes': [
+        {'urn': 'urn:test:s1', 'ref_id': 's1', 'assessable': False},
+        {'urn': 'urn:test:c1', 'ref_id': 'c1', 'parent_urn': 'urn:test:s1', 'implementation_groups': ['IG1', 'IG2', 'IG3']},
+        {'urn': 'urn:test:c2', 'ref_id': 'c2', 'parent_urn': 'urn:test:s1', 'implementation_groups': ['IG3']},
+        {'urn': 'urn:test:c2.1', 'ref_id': 'c2.1', 'parent_urn': 'urn:test:c2', 'implementation_groups': ['IG2', 'X']},
+        {'urn': 'urn:test:s2', 'ref_id': 's2', 'assessable': False},
+        {'urn': 'urn:test:c3', 'ref_id': 'c3', 'parent_urn': 'urn:test:s2', 'implementation_groups': ['IG3']},
+    ],
+}
+
+
+@pytest.fixture
+def app_env():
+    return {'IDENTITY_CACHE_ENABLED': 'false'}
+
+
+@pytest.fixture
+def app(app):
+    db.session.add(create_stored_library_from_yaml({
+        'urn': 'urn:test:library', 'ref_id': 'lib', 'name': 'Library', 'version': '1',
+        'objects': {'framework': FRAMEWORK},
+    }))
+    db.session.commit()
+    assert app.test_client().post('/api/stored-libraries/urn:test:library/import/').status_code == 200
+    return app
+
+
+def _refs(tree):
+    return [(node['ref_id'], _refs(node.get('children', []))) for node in tree]
+
+
+def test_masks_cover_own_groups_and_descendants():
+    masks = implementation_group_masks(FRAMEWORK)
+
+    assert masks['urn:test:c1'] == (0b111, 0b111)
+    assert masks['urn:test:c2'] == (0b100, 0b110)
+    assert masks['urn:test:c2.1'] == (0b010, 0b010)  # unknown group X has no bit
+    assert masks['urn:test:s1'] == (0, 0b111)
+    assert masks['urn:test:s2'] == (0, 0b100)
+
+
+def test_trees_filtered_by_group_keep_ancestors(app):
+    client = app.test_client()
+
+    data = client.get('/api/frameworks/urn:test:framework/tree/?ig=IG2').get_json()
+    assert _refs(data['tree']) == [('s1', [('c1', []), ('c2', [('c2.1', [])])])]
+    assert data['framework']['implementation_groups_definition'][0]['ref_id'] == 'IG1'
+    library = client.get('/api/loaded-libraries/urn:test:library/tree/?ig=IG1').get_json()
+    assert _refs(library['tree']) == [('s1', [('c1', [])])]
+    assert client.get('/api/frameworks/urn:test:framework/tree/?ig=IG1,IG3').get_json()['tree'][1] == \
+        client.get('/api/frameworks/urn:test:framework/tree/').get_json()['tree'][1]
+    assert client.get('/api/frameworks/urn:test:framework/tree/?ig=nope').get_json()['tree'] == []
+
+
+def test_requirement_list_filter_is_one_bitwise_query(app):
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    data = app.test_client().get('/api/requirement-nodes/?ig=IG3&framework=urn:test:framework').get_json()
+
+    assert [r['ref_id'] for r in data['results']] == ['s1', 'c1', 'c2', 's2', 'c3']
+    assert data['results'][2]['implementation_groups'] == ['IG3']
+    node_queries = [s for s in statements if 'FROM requirement_nodes' in s]
+    assert len(node_queries) == 1 and '&' in node_queries[0]
+    assert db.session.get(RequirementNode, 'urn:test:c2.1').ig_mask == 0b010
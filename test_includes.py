@@ -0,0 +1,55 @@
+"""Tests for ?include= of related objects"""
+import pytest
+from sqlalchemy import event
+
+from application import db
+from app.models import Framework, LoadedLibrary, RequirementNode
+
+
+@pytest.fixture
+def app(app):
+    db.session.add(LoadedLibrary(id='lib', urn='urn:lib', name='Library'))
+    for f in range(4):
+        db.session.add(Framework(id=f'fw{f}', urn=f'urn:fw:{f}', ref_id=f'fw{f}', name=f'Framework {f}', library_urn='urn:lib'))
+        for r in range(3):
+            db.session.add(RequirementNode(id=f'fw{f}-r{r}', urn=f'urn:fw:{f}:r{r}', framework_id=f'fw{f}',
+                                           ref_id=str(r), order_id=r))
+    db.session.commit()
+    return app
+
+
+def _count_statements():
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+def test_list_include_uses_fixed_number_of_queries(app):
+    client = app.test_client()
+    db.session.expunge_all()
+    statements = _count_statements()
+
+    data = client.get('/api/frameworks/?include=library,requirements').get_json()
+
+    assert len(data['results']) == 4
+    for framework in data['results']:
+        assert framework['library']['urn'] == 'urn:lib'
+        assert [r['ref_id'] for r in framework['requirements']] == ['0', '1', '2']
+    selects = [s for s in statements if s.lstrip().upper().startswith('SELECT')]
+    assert len(selects) <= 3
+
+
+def test_nested_include_on_detail(app):
+    data = app.test_client().get('/api/loaded-libraries/lib/?include=frameworks.requirements').get_json()
+
+    assert sorted(f['id'] for f in data['frameworks']) == ['fw0', 'fw1', 'fw2', 'fw3']
+    assert len(data['frameworks'][0]['requirements']) == 3
+
+
+def test_invalid_includes_rejected(app):
+    client = app.test_client()
+    response = client.get('/api/frameworks/?include=nope')
+    assert response.status_code == 400
+    assert 'nope' in response.get_json()['error']
+    assert client.get('/api/loaded-libraries/?include=frameworks.library.frameworks').status_code == 400
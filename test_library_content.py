@@ -0,0 +1,152 @@
+"""Tests for compressed, separately stored library content"""
+import json
+
+import pytest
+from sqlalchemy import event, text
+
+from application import cache, db
+from app.compression import compress, decompress, encode_document
+from app.content_index import ContentIndex, ContentIndexCache
+from app.models import StoredLibrary, StoredLibraryContent
+
+
+CONTENT = {
+    'urn': 'urn:test:library',
+    'name': 'Library',
+    'objects': {'framework': {'requirement_nodes': [
+        {'urn': f'urn:test:req:{i}', 'name': f'Requirement {i}', 'description': 'Text ' * 20}
+        for i in range(200)
+    ]}},
+}
+
+
+@pytest.fixture
+def app(app):
+    db.session.add(StoredLibrary(id='urn:test:library', urn='urn:test:library', ref_id='lib',
+                                 name='Library', content=CONTENT))
+    db.session.commit()
+    db.session.expunge_all()
+    return app
+
+
+def test_compress_round_trip():
+    for codec in ('gzip', None):
+        name, data = compress(b'{"a": 1}' * 100, codec)
+        assert decompress(name, data) == b'{"a": 1}' * 100
+
+
+def test_content_is_compressed_with_hash(app):
+    blob = db.session.get(StoredLibraryContent, 'urn:test:library')
+    assert len(blob.content_hash) == 64
+    assert blob.compressed_size * 5 < blob.size
+    assert db.session.get(StoredLibrary, 'urn:test:library').content == CONTENT
+
+
+def test_catalog_queries_do_not_load_content(app):
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    response = app.test_client().get('/api/stored-libraries/')
+
+    assert response.get_json()['count'] == 1
+    assert not any('stored_library_contents' in s or 'stored_libraries.content' in s for s in statements)
+
+
+def test_content_endpoint_returns_full_document(app):
+    data = app.test_client().get('/api/stored-libraries/urn:test:library/content/').get_json()
+    assert data['name'] == 'Library'
+    assert data['content'] == CONTENT
+
+
+def test_legacy_column_is_read_and_migrated_on_write(app):
+    db.session.execute(text(
+        "INSERT INTO stored_libraries (id, urn, ref_id, locale, name, content) "
+        "VALUES ('legacy', 'legacy', 'legacy', 'en', 'Legacy', '{\"objects\": {}}')"
+    ))
+    db.session.commit()
+
+    library = db.session.get(StoredLibrary, 'legacy')
+    assert library.content == {'objects': {}}
+
+    library.content = {'objects': {'risk_matrix': []}}
+    db.session.commit()
+    db.session.expunge_all()
+
+    library = db.session.get(StoredLibrary, 'legacy')
+    assert library.legacy_content is None
+    assert library.content == {'objects': {'risk_matrix': []}}
+
+
+def test_stored_tree_does_not_mutate_content(app):
+    client = app.test_client()
+    client.get('/api/stored-libraries/urn:test:library/tree/')
+    library = db.session.get(StoredLibrary, 'urn:test:library')
+    assert 'children' not in library.content['objects']['framework']['requirement_nodes'][0]
+
+
+def test_content_path_paginates_arrays(app):
+    client = app.test_client()
+    url = '/api/stored-libraries/urn:test:library/content/'
+
+    response = client.get(url + '?path=/objects/framework/requirement_nodes&offset=10&limit=5')
+    data = response.get_json()
+
+    assert data['count'] == 200
+    assert [node['urn'] for node in data['results']] == [f'urn:test:req:{i}' for i in range(10, 15)]
+    assert len(response.data) < 2000
+
+    assert client.get(url + '?path=objects/framework/requirement_nodes/3/name').get_json()['value'] == 'Requirement 3'
+    assert client.get(url + '?path=/objects/missing').status_code == 404
+    assert client.get(url + '?path=/objects/~2').status_code == 400
+    for query in ('limit=abc', 'offset=1.5', 'limit=-1'):
+        assert client.get(url + f'?path=/objects/framework/requirement_nodes&{query}').status_code == 400, query
+
+
+def test_content_path_misses_and_pages_are_not_cached(app):
+    client = app.test_client()
+    url = '/api/stored-libraries/urn:test:library/content/'
+    keys = cache.stats()['keys']
+
+    for offset in range(20):
+        assert client.get(url + f'?path=/objects/missing{offset}').status_code == 404
+        client.get(url + f'?path=/objects/framework/requirement_nodes&offset={offset}')
+
+    assert cache.stats()['keys'] == keys
+
+
+def test_content_index_slices_raw_bytes():
+    document = {'b': [1, {'x': 'é', 'y': [True, None]}, 'three'], 'a/b': {'m~n': 2.5}, 'c': {}}
+    index = ContentIndex(encode_document(document))
+
+    for pointer, value in (('/b/1', document['b'][1]), ('/b/1/x', 'é'), ('/a~1b/m~0n', 2.5),
+                           ('/c', {}), ('', document)):
+        assert json.loads(index.value(pointer)) == value
+    assert index.page('/b', 1, 5) == (3, encode_document(document['b'][1:]))
+    assert index.page('/b', 5, 5) == (3, b'[]')
+    assert index.page('/c', 0, 5) is None
+    for missing in ('/b/3', '/b/01', '/b/2/x', '/d'):
+        with pytest.raises(KeyError):
+            index.locate(missing)
+
+    # Non-canonical input is re-encoded before indexing
+    assert json.loads(ContentIndex(b'{"z": [1, 2],  "a": 1}').value('/z')) == [1, 2]
+
+
+def test_content_index_cache_is_bounded_by_bytes():
+    indexes = ContentIndexCache(max_bytes=1600)
+    raw = encode_document({'nodes': ['x' * 300]})
+    for digest in ('one', 'two', 'three'):
+        indexes.get(digest, lambda: raw)
+
+    assert list(indexes._indexes) == ['two', 'three']
+    assert indexes.bytes <= 1600
+
+
+def test_resolve_pointer_escapes():
+    from app.content_index import resolve_pointer
+    document = {'a/b': {'m~n': [1, 2]}}
+    assert resolve_pointer(document, '/a~1b/m~0n/1') == 2
+    assert resolve_pointer(document, '') is document
+    with pytest.raises(KeyError):
+        resolve_pointer(document, '/a~1b/m~0n/01')
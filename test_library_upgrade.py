@@ -0,0 +1,97 @@
+"""Tests for diff-based upgrades of loaded libraries"""
+import copy
+
+import pytest
+from sqlalchemy import event
+
+from application import db
+from app.models import Framework, ReferenceControl, RequirementNode, StoredLibrary
+from app.routes.stored_libraries import compare_versions
+
+
+def _content(version, nodes):
+    return {
+        'urn': 'urn:test:library',
+        'version': version,
+        'objects': {
+            'framework': {
+                'urn': 'urn:test:framework', 'ref_id': 'fw', 'name': 'Framework',
+                'requirement_nodes': [
+                    {'urn': f'urn:test:req:{i}', 'ref_id': str(i), 'name': name}
+                    for i, name in nodes
+                ],
+            },
+            'reference_controls': [{'urn': 'urn:test:control', 'ref_id': 'C1'}],
+        },
+    }
+
+
+@pytest.fixture
+def app(app):
+    db.session.add(StoredLibrary(id='urn:test:library', urn='urn:test:library', ref_id='lib',
+                                 name='Library', version='1',
+                                 content=_content(1, [(i, f'Req {i}') for i in range(100)])))
+    db.session.commit()
+    assert app.test_client().post('/api/stored-libraries/urn:test:library/import/').status_code == 200
+    return app
+
+
+def _publish(version, nodes):
+    library = db.session.get(StoredLibrary, 'urn:test:library')
+    library.version = str(version)
+    library.content = _content(version, nodes)
+    db.session.commit()
+
+
+def test_compare_versions():
+    assert compare_versions('10', '9') == 1
+    assert compare_versions('5', '5') == 0
+    assert compare_versions('1.0', '1.1') == -1
+    assert compare_versions('1.10', '1.9') == 1
+    assert compare_versions('2.0.1', '2.0') == 1
+    assert compare_versions('1', '1.0') == 0
+    assert compare_versions('1.0-rc2', '1.0-rc1') == 1
+    assert compare_versions(3, None) == 1
+
+
+def test_import_falls_back_to_ref_id_for_nameless_controls(app):
+    assert db.session.get(ReferenceControl, 'urn:test:control').name == 'C1'
+
+
+def test_upgrade_writes_only_changed_rows(app):
+    nodes = [(i, f'Req {i}') for i in range(1, 100)]  # node 0 removed
+    nodes[0] = (1, 'Renamed')
+    nodes.append((100, 'New'))
+    _publish(2, nodes)
+
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, params, context, executemany:
+                 statements.append((statement, params if executemany else [params])))
+
+    response = app.test_client().post('/api/stored-libraries/urn:test:library/upgrade/')
+    changes = response.get_json()['changes']['requirement_nodes']
+
+    assert changes == {'inserted': 1, 'updated': 1, 'deleted': 1}
+    written = [s for s in statements if s[0].split()[0] in ('INSERT', 'UPDATE', 'DELETE')
+               and 'requirement_nodes' in s[0]]
+    assert len(written) == 3
+    assert db.session.get(RequirementNode, 'urn:test:req:1').name == 'Renamed'
+    assert db.session.get(RequirementNode, 'urn:test:req:0') is None
+
+    tree = app.test_client().get('/api/frameworks/urn:test:framework/tree/').get_json()['tree']
+    assert len(tree) == 100 and tree[0]['name'] == 'Renamed'
+    assert app.test_client().get('/api/loaded-libraries/urn:test:library/').get_json()['version'] == '2'
+
+
+def test_upgrade_same_or_older_version(app):
+    client = app.test_client()
+    response = client.post('/api/stored-libraries/urn:test:library/upgrade/')
+    assert response.get_json()['message'] == 'Library already up to date'
+
+    _publish(0, [])
+    assert client.post('/api/stored-libraries/urn:test:library/upgrade/').status_code == 400
+
+    forced = client.post('/api/stored-libraries/urn:test:library/upgrade/?force=true').get_json()
+    assert forced['changes']['requirement_nodes']['deleted'] == 100
+    assert Framework.query.count() == 1
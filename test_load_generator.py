@@ -0,0 +1,30 @@
+"""Smoke test for the synthetic load generator (embedded SQLite, in-process)"""
+import os
+
+import load_generator
+
+
+def test_percentile():
+    values = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
+    assert load_generator.percentile(values, 50) == 0.5
+    assert load_generator.percentile(values, 99) == 1.0
+    assert load_generator.percentile([], 95) == 0.0
+
+
+def test_load_run_reports_latency_and_pool(monkeypatch):
+    # configure_embedded_database() writes these; let monkeypatch restore them
+    for key in ('DATABASE_URL', 'DB_POOL_SIZE', 'DB_MAX_OVERFLOW', 'DB_POOL_TIMEOUT', 'VERCEL'):
+        monkeypatch.setenv(key, os.environ.get(key, ''))
+
+    report = load_generator.main([
+        '--requests', '40', '--concurrency', '2',
+        '--libraries', '3', '--preload', '2', '--seed', '7',
+        '--mix', 'token=1,framework_tree=5,catalog_list=2,search=2,library_content=0,import=0',
+    ])
+
+    assert report['overall']['requests'] == 40
+    assert set(report['scenarios']) <= {'token', 'framework_tree', 'catalog_list', 'search'}
+    assert report['scenarios']['framework_tree']['errors'] == 0
+    assert report['overall']['p50_ms'] <= report['overall']['p99_ms']
+    assert report['pool']['capacity'] == 1
+    assert 0.0 <= report['pool']['saturation'] <= 1.0
@@ -0,0 +1,85 @@
+"""Tests for localized views (?locale= / Accept-Language)"""
+import pytest
+
+from application import db
+from app.localization import localize, resolve_translation
+from app.models import FrameworkTreeSnapshot, LoadedLibrary, RiskMatrix
+from app.routes.stored_libraries import import_framework_from_library
+
+
+FRAMEWORK_DATA = {
+    'urn': 'urn:test:framework:fw',
+    'ref_id': 'fw',
+    'name': 'Framework',
+    'translations': {'fr': {'name': 'Référentiel'}, 'de': {'name': 'Rahmenwerk'}},
+    'requirement_nodes': [
+        {'urn': 'urn:test:req:1', 'ref_id': '1', 'name': 'Root', 'description': 'Root text',
+         'translations': {'fr': {'name': 'Racine'}}},
+    ],
+}
+
+
+@pytest.fixture
+def app(app):
+    db.session.add(LoadedLibrary(id='urn:test:library', urn='urn:test:library', name='Library', locale='en'))
+    db.session.flush()
+    import_framework_from_library(FRAMEWORK_DATA, 'urn:test:library')
+    db.session.add(RiskMatrix(id='rm', urn='rm', name='Matrix', probability=[
+        {'id': 0, 'name': 'Low', 'translations': {'fr': {'name': 'Faible'}}}
+    ]))
+    db.session.commit()
+    return app
+
+
+def test_resolve_translation_falls_back_to_language():
+    translations = {'fr': {'name': 'Nom'}, 'pt_BR': {'name': 'Nome'}}
+    assert resolve_translation(translations, 'fr-ca') == {'name': 'Nom'}
+    assert resolve_translation(translations, 'pt-br') == {'name': 'Nome'}
+    assert resolve_translation(translations, 'de') is None
+
+
+def test_localize_keeps_legacy_view_without_locale():
+    data = localize({'name': 'Name'}, {'fr': {'name': 'Nom'}})
+    assert data == {'name': 'Name', 'translations': {'fr': {'name': 'Nom'}}}
+
+
+def test_detail_is_localized_and_drops_translations(app):
+    client = app.test_client()
+
+    data = client.get('/api/frameworks/urn:test:framework:fw/?locale=fr').get_json()
+    assert data['name'] == 'Référentiel'
+    assert 'translations' not in data
+
+    data = client.get('/api/frameworks/urn:test:framework:fw/',
+                      headers={'Accept-Language': 'de-DE,de;q=0.9'}).get_json()
+    assert data['name'] == 'Rahmenwerk'
+
+    data = client.get('/api/frameworks/urn:test:framework:fw/?locale=fr&include_translations=true').get_json()
+    assert data['name'] == 'Référentiel'
+    assert 'de' in data['translations']
+
+    assert 'translations' in client.get('/api/frameworks/urn:test:framework:fw/').get_json()
+
+
+def test_nested_risk_matrix_levels_are_localized(app):
+    data = app.test_client().get('/api/risk-matrices/rm/?locale=fr').get_json()
+    assert data['probability'][0]['name'] == 'Faible'
+    assert 'translations' not in data['probability'][0]
+
+
+def test_tree_snapshots_precomputed_per_locale(app):
+    locales = {s.locale for s in FrameworkTreeSnapshot.query.all()}
+    assert locales == {'', 'en', 'fr', 'de'}
+
+    client = app.test_client()
+    fr = client.get('/api/frameworks/urn:test:framework:fw/tree/?locale=fr-CA')
+    assert fr.get_json()['tree'][0]['name'] == 'Racine'
+    assert fr.headers['Vary'] == 'Accept-Language'
+
+    # No translation: falls back to the base-locale view, still without translations
+    it = client.get('/api/frameworks/urn:test:framework:fw/tree/', headers={'Accept-Language': 'it'}).get_json()
+    assert it['framework']['name'] == 'Framework'
+    assert 'translations' not in it['tree'][0]
+
+    full = client.get('/api/frameworks/urn:test:framework:fw/tree/').get_json()
+    assert full['tree'][0]['translations'] == {'fr': {'name': 'Racine'}}
@@ -0,0 +1,95 @@
+"""Tests for the batched requirement mapping ingest"""
+from pathlib import Path
+
+import pytest
+import yaml
+from sqlalchemy import event
+
+from application import db
+from app.models import Framework, LoadedLibrary, RequirementMapping, RequirementNode, StoredLibrary
+from app.routes.stored_libraries import create_stored_library_from_yaml, ingest_mapping_sets
+from load_libraries import sanitize_content
+
+MAPPING_LIBRARY = Path(__file__).parent / 'libraries' / 'map-nist-csf-1.1-iso27001-2022.yaml'
+
+
+def _mapping_set(mappings, source_framework='urn:fw:source', target_framework='urn:fw:target'):
+    return {
+        'urn': 'urn:test:mapping-set', 'ref_id': 'ms', 'name': 'Mappings',
+        'source_framework_urn': source_framework, 'target_framework_urn': target_framework,
+        'requirement_mappings': [
+            {'source_requirement_urn': source, 'target_requirement_urn': target, 'relationship': 'intersect',
+             'strength_of_relationship': strength, 'rationale': 'semantic', 'annotation': ''}
+            for source, target, strength in mappings
+        ],
+    }
+
+
+@pytest.fixture
+def app(app):
+    db.session.add(LoadedLibrary(id='urn:lib', urn='urn:lib', name='Library'))
+    db.session.add(Framework(id='urn:fw:source', urn='urn:fw:source', ref_id='src', name='Source',
+                             library_urn='urn:lib'))
+    for r in range(3):
+        db.session.add(RequirementNode(id=f'urn:src:{r}', urn=f'urn:src:{r}', framework_id='urn:fw:source'))
+    db.session.commit()
+    return app
+
+
+def test_mapping_library_is_typed_and_imported(app):
+    content = {
+        'urn': 'urn:test:mapping-library', 'ref_id': 'map', 'name': 'Mapping library',
+        'objects': {'requirement_mapping_set': _mapping_set([('urn:src:0', 'urn:tgt:0', 2),
+                                                             ('urn:src:1', 'urn:tgt:1', None)])},
+    }
+    library = create_stored_library_from_yaml(content)
+    assert library.object_type == 'mapping'
+    db.session.add(library)
+    db.session.commit()
+
+    response = app.test_client().post('/api/stored-libraries/urn:test:mapping-library/import/')
+
+    assert response.status_code == 200
+    assert response.get_json()['mappings'] == {'mapping_sets': 1, 'mappings': 2, 'skipped': 0}
+    data = app.test_client().get('/api/requirement-mapping-sets/urn:test:mapping-set/').get_json()
+    assert [(m['source_requirement_urn'], m['relationship_type'], m['strength']) for m in data['mappings']] == [
+        ('urn:src:0', 'intersect', 2), ('urn:src:1', 'intersect', None)]
+
+
+def test_ingest_dedupes_validates_and_batches(app):
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    mapping_set = _mapping_set([
+        ('urn:src:0', 'urn:tgt:0', 1),
+        ('urn:src:0', 'urn:tgt:0', 3),        # duplicate pair
+        ('urn:src:1', 'urn:tgt:1', 1),
+        ('urn:src:2', 'urn:tgt:2', 1),
+        ('urn:src:missing', 'urn:tgt:3', 1),  # not in the loaded source framework
+    ])
+
+    report = ingest_mapping_sets([mapping_set], 'urn:lib', batch_size=2)
+
+    assert report == {'mapping_sets': 1, 'mappings': 3, 'skipped': 1}
+    inserts = [s for s in statements if s.startswith('INSERT INTO requirement_mappings ')]
+    assert len(inserts) == 2
+    validation = [s for s in statements if s.startswith('SELECT') and 'requirement_nodes' in s]
+    assert len(validation) == 1
+    # Target framework not loaded: its URNs are kept unchecked
+    assert RequirementMapping.query.filter_by(source_requirement_urn='urn:src:0').one().strength == 1
+
+
+def test_real_mapping_library_imports_every_pair(app):
+    with open(MAPPING_LIBRARY, 'r', encoding='utf-8') as file:
+        content = sanitize_content(yaml.safe_load(file))
+    pairs = {(m['source_requirement_urn'], m['target_requirement_urn'])
+             for m in content['objects']['requirement_mapping_set']['requirement_mappings']}
+    db.session.add(create_stored_library_from_yaml(content))
+    db.session.commit()
+
+    response = app.test_client().post(f"/api/stored-libraries/{content['urn']}/import/")
+
+    assert response.status_code == 200
+    assert response.get_json()['mappings']['mappings'] == len(pairs)
+    assert RequirementMapping.query.count() == len(pairs)
+    assert db.session.get(StoredLibrary, content['urn']).object_type == 'mapping'
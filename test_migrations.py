@@ -0,0 +1,128 @@
+"""Tests for the Alembic migrations: an empty database upgraded to head matches the models"""
+import gzip
+import json
+import os
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from flask_migrate import upgrade
+from sqlalchemy import text
+
+from application import create_app, db
+from app.compression import content_hash, encode_document
+from app.models import StoredLibrary
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "migrated.db"}')
+    app = create_app()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_upgrade_of_empty_database_matches_models(app):
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)
+        with db.engine.connect() as connection:
+            context = MigrationContext.configure(connection, opts={'compare_type': True})
+            assert compare_metadata(context, db.metadata) == []
+
+
+def _seed_loaded_framework(framework):
+    """A loaded library with gzip content holding ``framework``, and its framework and node rows"""
+    content = gzip.compress(json.dumps({'urn': 'urn:lib', 'objects': {'framework': framework}}).encode())
+    with db.engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO stored_libraries (id, urn, ref_id, locale, name) "
+            "VALUES ('urn:lib', 'urn:lib', 'lib', 'en', 'Library')"))
+        connection.execute(text(
+            "INSERT INTO stored_library_contents (library_id, codec, content_hash, size, compressed_size, data) "
+            "VALUES ('urn:lib', 'gzip', 'hash', 0, 0, :data)"), {'data': content})
+        connection.execute(text(
+            "INSERT INTO loaded_libraries (id, urn, stored_library_id) VALUES ('urn:lib', 'urn:lib', 'urn:lib')"))
+        connection.execute(text(
+            "INSERT INTO frameworks (id, urn, ref_id, name, library_urn) "
+            "VALUES (:urn, :urn, 'fw', 'Framework', 'urn:lib')"), {'urn': framework['urn']})
+        for node in framework['requirement_nodes']:
+            connection.execute(text(
+                "INSERT INTO requirement_nodes (id, urn, framework_id, parent_urn) "
+                "VALUES (:urn, :urn, :framework, :parent)"),
+                {'urn': node['urn'], 'framework': framework['urn'], 'parent': node.get('parent_urn')})
+
+
+def test_implementation_group_masks_are_backfilled(app):
+    framework = {
+        'urn': 'urn:fw', 'ref_id': 'fw', 'name': 'Framework',
+        'implementation_groups_definition': [{'ref_id': 'IG1'}, {'ref_id': 'IG2'}],
+        'requirement_nodes': [
+            {'urn': 'urn:req:1', 'ref_id': '1'},
+            {'urn': 'urn:req:1.1', 'ref_id': '1.1', 'parent_urn': 'urn:req:1', 'implementation_groups': ['IG2']},
+            {'urn': 'urn:req:2', 'ref_id': '2', 'implementation_groups': ['IG1', 'IG2']},
+        ],
+    }
+    with app.app_context():
+        upgrade(directory=MIGRATIONS, revision='e1b7d95c3a60')
+        _seed_loaded_framework(framework)
+
+        upgrade(directory=MIGRATIONS, revision='f3a9c1d27e84')
+
+        with db.engine.connect() as connection:
+            masks = {urn: (mask, subtree) for urn, mask, subtree in connection.execute(text(
+                'SELECT id, ig_mask, ig_subtree_mask FROM requirement_nodes'))}
+            definition = connection.scalar(text('SELECT implementation_groups_definition FROM frameworks'))
+    assert masks == {'urn:req:1': (0, 2), 'urn:req:1.1': (2, 2), 'urn:req:2': (3, 3)}
+    assert json.loads(definition) == framework['implementation_groups_definition']
+
+
+def test_requirement_links_are_backfilled(app):
+    framework = {
+        'urn': 'urn:fw', 'ref_id': 'fw', 'name': 'Framework',
+        'requirement_nodes': [
+            {'urn': 'urn:req:1', 'ref_id': '1', 'reference_controls': ['urn:ctl:a', 'urn:ctl:b']},
+            {'urn': 'urn:req:2', 'ref_id': '2', 'reference_controls': ['urn:ctl:a'], 'threats': ['urn:thr:x']},
+        ],
+    }
+    with app.app_context():
+        upgrade(directory=MIGRATIONS, revision='c4f7a2e9b318')
+        _seed_loaded_framework(framework)
+
+        upgrade(directory=MIGRATIONS, revision='e1b7d95c3a60')
+
+        with db.engine.connect() as connection:
+            links = {table: set(connection.execute(text(
+                f'SELECT r.urn, t.urn, l.framework_id FROM {table} l '
+                f'JOIN urns r ON r.id = l.requirement_urn_id JOIN urns t ON t.id = l.{column}')))
+                for table, column in (('requirement_reference_controls', 'reference_control_urn_id'),
+                                      ('requirement_threats', 'threat_urn_id'))}
+    assert links == {
+        'requirement_reference_controls': {('urn:req:1', 'urn:ctl:a', 'urn:fw'), ('urn:req:1', 'urn:ctl:b', 'urn:fw'),
+                                           ('urn:req:2', 'urn:ctl:a', 'urn:fw')},
+        'requirement_threats': {('urn:req:2', 'urn:thr:x', 'urn:fw')},
+    }
+
+
+def test_legacy_content_is_compressed(app):
+    document = {'urn': 'urn:lib', 'objects': {'framework': {'urn': 'urn:fw', 'name': 'Été'}}}
+    with app.app_context():
+        upgrade(directory=MIGRATIONS, revision='0b6d4e8f2a17')
+        with db.engine.begin() as connection:
+            connection.execute(text(
+                "INSERT INTO stored_libraries (id, urn, ref_id, locale, name, content) "
+                "VALUES ('urn:lib', 'urn:lib', 'lib', 'en', 'Library', :content)"), {'content': json.dumps(document)})
+
+        upgrade(directory=MIGRATIONS)
+
+        with db.engine.connect() as connection:
+            assert connection.scalar(text('SELECT content FROM stored_libraries')) is None
+            size, compressed_size = connection.execute(text(
+                'SELECT size, compressed_size FROM stored_library_contents')).one()
+        assert compressed_size > 0 and size > 0
+        library = db.session.get(StoredLibrary, 'urn:lib')
+        assert library.content == document
+        assert library.content_blob.content_hash == content_hash(encode_document(document))
+        db.session.remove()
@@ -0,0 +1,130 @@
+"""Hot library queries must be served by indexes (SQLite EXPLAIN QUERY PLAN)"""
+import os
+
+import pytest
+from sqlalchemy import event
+
+import query_plan_check
+from application import db
+from app.models import (Framework, LoadedLibrary, ReferenceControl, RequirementMapping, RequirementMappingSet,
+                        RequirementNode, RiskMatrix, StoredLibrary)
+from app.routes.stored_libraries import sync_requirement_links
+
+
+@pytest.fixture
+def app(app):
+    db.session.add(StoredLibrary(id='urn:lib', urn='urn:lib', ref_id='lib', name='Library', is_loaded=True))
+    db.session.add(LoadedLibrary(id='urn:lib', urn='urn:lib', name='Library'))
+    db.session.add(Framework(id='fw', urn='urn:fw', ref_id='fw', name='Framework', library_urn='urn:lib'))
+    for r in range(20):
+        db.session.add(RequirementNode(id=f'r{r}', urn=f'urn:r{r}', framework_id='fw', ref_id=str(r), order_id=r,
+                                       parent_urn='urn:r0' if r else None))
+    db.session.add(ReferenceControl(id='c', urn='urn:c', name='Control', library_urn='urn:lib'))
+    db.session.add(RiskMatrix(id='m', urn='urn:m', name='Matrix', library_urn='urn:lib'))
+    db.session.add(RequirementMappingSet(id='ms', urn='urn:ms', name='Mappings', library_urn='urn:lib'))
+    db.session.add(RequirementMapping(mapping_set_id='ms', source_requirement_urn='urn:r1',
+                                      target_requirement_urn='urn:r2'))
+    db.session.flush()
+    sync_requirement_links({'urn': 'fw', 'requirement_nodes': [
+        {'urn': f'urn:r{r}', 'reference_controls': ['urn:c'], 'threats': ['urn:t']} for r in range(20)]})
+    db.session.commit()
+    return app
+
+
+def query_plans(app, url):
+    """EXPLAIN QUERY PLAN details of every SELECT issued while serving ``url``"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        assert app.test_client().get(url).status_code == 200
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+    with db.engine.connect() as connection:
+        return [
+            ' | '.join(row[3] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters))
+            for statement, parameters in statements
+        ]
+
+
+def assert_indexed(plans, table):
+    details = [detail.strip() for plan in plans for detail in plan.split('|')]
+    touching = [detail for detail in details if f' {table} ' in f' {detail} ']
+    assert touching, f'no query on {table}: {plans}'
+    assert f'SCAN {table}' not in touching, f'full scan of {table}: {touching}'
+
+
+@pytest.mark.parametrize('url, table', [
+    ('/api/loaded-libraries/urn:lib/content/', 'frameworks'),
+    ('/api/loaded-libraries/urn:lib/content/', 'reference_controls'),
+    ('/api/loaded-libraries/urn:lib/content/', 'risk_matrices'),
+    ('/api/loaded-libraries/urn:lib/content/', 'requirement_mapping_sets'),
+    ('/api/frameworks/?include=requirements', 'requirement_nodes'),
+    ('/api/requirement-nodes/?framework=fw', 'requirement_nodes'),
+    ('/api/requirement-nodes/?ref_id=3', 'requirement_nodes'),
+    ('/api/requirement-nodes/r0/', 'requirement_nodes'),
+    ('/api/requirement-mapping-sets/ms/', 'requirement_mappings'),
+    ('/api/requirement-nodes/r1/related/', 'requirement_nodes'),
+    ('/api/requirement-nodes/r1/related/', 'requirement_mappings'),
+    ('/api/requirement-nodes/r1/reference-controls/', 'requirement_reference_controls'),
+    ('/api/reference-controls/c/requirements/', 'requirement_reference_controls'),
+    ('/api/threats/urn:t/requirements/', 'requirement_threats'),
+    ('/api/frameworks/fw/reference-controls/', 'requirement_reference_controls'),
+    ('/api/stored-libraries/?is_loaded=true', 'stored_libraries'),
+])
+def test_hot_queries_use_indexes(app, url, table):
+    assert_indexed(query_plans(app, url), table)
+
+
+def test_tree_query_reads_nodes_in_index_order(app):
+    plans = query_plans(app, '/api/frameworks/?include=requirements')
+    node_plans = [plan for plan in plans if 'requirement_nodes' in plan]
+    assert any('ix_requirement_nodes_framework_id_order_id' in plan for plan in node_plans)
+    assert not any('TEMP B-TREE FOR ORDER BY' in plan for plan in node_plans)
+
+
+def test_plan_check_flags_new_scans_and_extra_queries():
+    query = {'sql': 'SELECT * FROM requirement_nodes WHERE framework_id = ?', 'cost': 10.0, 'seq_scans': [],
+             'plan': ['SEARCH requirement_nodes USING INDEX ix_requirement_nodes_framework_id_order_id']}
+    scanned = dict(query, plan=['SCAN requirement_nodes'], seq_scans=['requirement_nodes'])
+    slower = dict(query, cost=20.0)
+
+    assert query_plan_check.compare_plans({'tree': [query]}, {'tree': [query]}) == ([], [])
+    regressions, _ = query_plan_check.compare_plans({'tree': [query]}, {'tree': [scanned]})
+    assert regressions == ['tree: new full scan of requirement_nodes in ' + query['sql']]
+    regressions, _ = query_plan_check.compare_plans({'tree': [query]}, {'tree': [query, query]})
+    assert regressions == ['tree: 2 queries (baseline 1)']
+    assert query_plan_check.compare_plans({'tree': [query]}, {'tree': [slower]}, cost_tolerance=0.5)[0]
+    assert not query_plan_check.compare_plans({'tree': [query]}, {'tree': [slower]}, cost_tolerance=1.5)[0]
+
+
+def test_hot_endpoints_match_committed_baseline(monkeypatch):
+    # configure_database() writes these; let monkeypatch restore them
+    for key in ('DATABASE_URL', 'IDENTITY_CACHE_ENABLED', 'CACHE_BACKEND', 'VERCEL', 'DATABASE_REPLICA_URLS',
+                'CATALOG_DB_PATH'):
+        monkeypatch.setenv(key, os.environ.get(key, ''))
+        if not os.environ[key]:
+            monkeypatch.delenv(key)
+
+    report = query_plan_check.main([])
+
+    assert report['dialect'] == 'sqlite'
+    assert set(report['plans']) == set(query_plan_check.HOT_ENDPOINTS)
+    assert report['regressions'] == []
+
+
+def test_committed_postgresql_baseline():
+    section = query_plan_check.load_baseline(query_plan_check.DEFAULT_BASELINE)['postgresql']
+    assert set(section['endpoints']) == set(query_plan_check.HOT_ENDPOINTS)
+    queries = [query for endpoint in section['endpoints'].values() for query in endpoint]
+    assert all('cost' in query and 'buffers' in query for query in queries)
+    # Single-object lookups never scan the big tables; only whole-framework / whole-set reads do
+    for name in ('requirement_node_detail', 'requirement_node_related', 'requirement_nodes_by_ref_id',
+                 'reference_control_requirements'):
+        for query in section['endpoints'][name]:
+            assert not {'requirement_nodes', 'requirement_mappings'} & set(query['seq_scans']), (name, query['sql'])
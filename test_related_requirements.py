@@ -0,0 +1,80 @@
+"""Tests for the related-items endpoints of requirement nodes"""
+import pytest
+from sqlalchemy import event
+
+from application import db
+from app.models import Framework, LoadedLibrary, RequirementMapping, RequirementMappingSet, RequirementNode
+
+
+@pytest.fixture
+def app_env():
+    return {'IDENTITY_CACHE_ENABLED': 'false'}
+
+
+@pytest.fixture
+def app(app):
+    db.session.add(LoadedLibrary(id='urn:lib', urn='urn:lib', name='Library'))
+    for fw in ('a', 'b'):
+        db.session.add(Framework(id=fw, urn=f'urn:fw:{fw}', ref_id=fw, name=fw.upper(), library_urn='urn:lib'))
+    # a1 > a1.1 > a1.1.x (5 leaves); b1, b2
+    db.session.add(RequirementNode(id='a1', urn='urn:a1', framework_id='a', order_id=0))
+    db.session.add(RequirementNode(id='a1.1', urn='urn:a1.1', framework_id='a', parent_urn='urn:a1', order_id=1))
+    for leaf in range(5):
+        db.session.add(RequirementNode(id=f'a1.1.{leaf}', urn=f'urn:a1.1.{leaf}', framework_id='a',
+                                       parent_urn='urn:a1.1', order_id=10 - leaf))
+    for node in ('b1', 'b2'):
+        db.session.add(RequirementNode(id=node, urn=f'urn:{node}', framework_id='b'))
+    db.session.add(RequirementMappingSet(id='ms', urn='urn:ms', name='A to B', library_urn='urn:lib'))
+    db.session.add(RequirementMapping(mapping_set_id='ms', source_requirement_urn='urn:a1.1.0',
+                                      target_requirement_urn='urn:b1', relationship_type='equal'))
+    db.session.add(RequirementMapping(mapping_set_id='ms', source_requirement_urn='urn:b2',
+                                      target_requirement_urn='urn:a1.1.0', relationship_type='subset'))
+    db.session.add(RequirementMapping(mapping_set_id='ms', source_requirement_urn='urn:a1.1.0',
+                                      target_requirement_urn='urn:unloaded', relationship_type='intersect'))
+    db.session.commit()
+    return app
+
+
+def _count_queries():
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+def test_related_items_of_a_requirement(app):
+    data = app.test_client().get('/api/requirement-nodes/a1.1.0/related/').get_json()
+
+    assert data['requirement']['urn'] == 'urn:a1.1.0'
+    assert [a['id'] for a in data['ancestors']] == ['a1', 'a1.1']
+    assert data['children'] == []
+    assert [(m['direction'], m['urn'], m['relationship_type'], m['requirement'] and m['requirement']['id'])
+            for m in data['mappings']] == [
+        ('outgoing', 'urn:b1', 'equal', 'b1'),
+        ('outgoing', 'urn:unloaded', 'intersect', None),
+        ('incoming', 'urn:b2', 'subset', 'b2'),
+    ]
+
+    parent = app.test_client().get('/api/requirement-nodes/urn:a1.1/related/').get_json()
+    assert [c['id'] for c in parent['children']] == [f'a1.1.{leaf}' for leaf in range(4, -1, -1)]
+    assert app.test_client().get('/api/requirement-nodes/nope/related/').status_code == 404
+
+
+def test_bulk_related_uses_a_fixed_number_of_queries(app):
+    client = app.test_client()
+    statements = _count_queries()
+    client.get('/api/requirement-nodes/related/?id=a1.1.0')
+    single = len(statements)
+
+    statements.clear()
+    ids = ['a1', 'a1.1'] + [f'a1.1.{leaf}' for leaf in range(5)] + ['b1', 'b2']
+    data = client.get('/api/requirement-nodes/related/?id=' + ','.join(ids + ['nope'])).get_json()
+
+    assert len(statements) == single
+    assert [r['requirement']['id'] for r in data['results']] == ids
+    assert data['missing'] == ['nope']
+    assert [m['direction'] for m in data['results'][-2]['mappings']] == ['incoming']
+
+
+def test_bulk_related_requires_ids(app):
+    assert app.test_client().get('/api/requirement-nodes/related/').status_code == 400
@@ -0,0 +1,122 @@
+"""Tests for read replica routing"""
+import pytest
+
+from application import cache, create_app, db, identity_cache
+from app.models import ReferenceControl
+from app.routing import STICKY_COOKIE, read_only
+
+
+def _make_app(tmp_path, monkeypatch, replica_url, identity_cache_enabled=False):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "primary.db"}')
+    monkeypatch.setenv('DATABASE_REPLICA_URLS', replica_url)
+    monkeypatch.setenv('IDENTITY_CACHE_ENABLED', str(identity_cache_enabled).lower())
+    return create_app()
+
+
+@pytest.fixture(params=[False])
+def app(tmp_path, monkeypatch, request):
+    app = _make_app(tmp_path, monkeypatch, f'sqlite:///{tmp_path / "replica.db"}', request.param)
+    replica = app.extensions['replicas'].engines['replica_0']
+    with app.app_context():
+        # Same row with a different name on each side shows where reads went
+        for engine, name in ((db.engines[None], 'Primary'), (replica, 'Replica')):
+            db.metadata.create_all(engine)
+            with engine.begin() as connection:
+                connection.execute(ReferenceControl.__table__.insert(), {'id': 'c1', 'urn': 'urn:c1', 'name': name})
+    yield app
+    with app.app_context():
+        db.engines[None].dispose()
+        replica.dispose()
+
+
+def test_get_reads_from_replica(app):
+    response = app.test_client().get('/api/reference-controls/c1/')
+    assert response.get_json()['name'] == 'Replica'
+    assert STICKY_COOKIE not in response.headers.get('Set-Cookie', '')
+
+
+def test_writes_stick_to_primary(app):
+    client = app.test_client()
+    response = client.post('/api/reference-controls/', json={'urn': 'urn:c2', 'ref_id': 'c2', 'name': 'New'})
+    assert response.status_code == 201
+    cookie = response.headers['Set-Cookie']
+    assert STICKY_COOKIE in cookie
+    # Sent back on cross-site (CORS) calls too
+    assert 'SameSite=None' in cookie and 'Secure' in cookie
+
+    # The cookie keeps the client on the primary, which has the new row
+    assert client.get('/api/reference-controls/urn:c2/').status_code == 200
+    assert client.get('/api/reference-controls/c1/').get_json()['name'] == 'Primary'
+
+
+def test_session_sticks_to_primary_after_flush(app):
+    with app.test_request_context('/', method='GET'):
+        assert db.session.get(ReferenceControl, 'c1').name == 'Replica'
+        db.session.add(ReferenceControl(id='c3', urn='urn:c3', name='Other'))
+        db.session.flush()
+        db.session.expire_all()
+        assert db.session.get(ReferenceControl, 'c1').name == 'Primary'
+        db.session.rollback()
+
+
+def test_read_only_block_outside_requests(app):
+    with app.app_context():
+        assert db.session.get(ReferenceControl, 'c1').name == 'Primary'
+        db.session.remove()
+        with read_only():
+            assert db.session.get(ReferenceControl, 'c1').name == 'Replica'
+
+
+@pytest.mark.parametrize('app', [True], indirect=True)
+def test_identity_cache_fills_from_primary(app):
+    client = app.test_client()
+    identity_cache.clear()
+    # The miss is loaded from the primary, then served from the cache
+    assert client.get('/api/reference-controls/c1/').get_json()['name'] == 'Primary'
+    assert client.get('/api/reference-controls/c1/').get_json()['name'] == 'Primary'
+    with app.test_request_context('/', method='GET'):
+        assert db.session.get(ReferenceControl, 'c1').name == 'Replica'
+
+
+def test_shared_cache_skips_fills_after_replica_reads(app):
+    with app.test_request_context('/', method='GET'):
+        control = db.session.get(ReferenceControl, 'c1')
+        # Computed from a replica row: served, not stored
+        assert cache.get_or_compute('test-replicas', 'name', lambda: control.name.encode()) == b'Replica'
+        assert cache.get('test-replicas', 'name') is None
+        db.session.remove()
+    with app.test_request_context('/', method='GET'):
+        value = cache.get_or_compute('test-replicas', 'name',
+                                     lambda: db.session.get(ReferenceControl, 'c1').name.encode())
+        assert value == cache.get('test-replicas', 'name') == b'Primary'
+        db.session.remove()
+
+
+def test_unreachable_replica_is_ejected(tmp_path, monkeypatch):
+    app = _make_app(tmp_path, monkeypatch, f'sqlite:///file:{tmp_path / "missing.db"}?mode=ro&uri=true')
+    with app.app_context():
+        db.create_all(bind_key=None)
+        db.session.add(ReferenceControl(id='c1', urn='urn:c1', name='Primary'))
+        db.session.commit()
+
+    client = app.test_client()
+    assert client.get('/api/reference-controls/c1/').get_json()['name'] == 'Primary'
+    stats = client.get('/api/metrics/database/').get_json()
+    assert stats['replicas']['replica_0']['healthy'] is False
+    assert stats['replicas']['replica_0']['ejections'] == 1
+    assert stats['primary_fallbacks'] >= 1
+
+
+def test_replicas_do_not_leak_into_other_apps(app, tmp_path, monkeypatch):
+    monkeypatch.delenv('DATABASE_REPLICA_URLS')
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    other = create_app()
+    with other.app_context():
+        db.create_all()
+        assert db.session.get(ReferenceControl, 'c1') is None
+        db.session.remove()
+
+    # Each app keeps its own replica set: the first one still reads its replica
+    assert other.extensions['replicas'] is not app.extensions['replicas']
+    assert other.extensions['replicas'].keys == [] and app.extensions['replicas'].keys == ['replica_0']
+    assert app.test_client().get('/api/reference-controls/c1/').get_json()['name'] == 'Replica'
@@ -0,0 +1,98 @@
+"""Tests for the requirement -> reference control / threat link tables"""
+import pytest
+from sqlalchemy import event
+
+from application import db
+from app.models import LoadedLibrary, ReferenceControl, RequirementReferenceControl, RequirementThreat, StoredLibrary
+from app.routes.stored_libraries import create_stored_library_from_yaml
+
+
+def _framework_library(version, nodes):
+    return {
+        'urn': 'urn:test:library', 'ref_id': 'lib', 'name': 'Library', 'version': str(version),
+        'objects': {'framework': {
+            'urn': 'urn:test:framework', 'ref_id': 'fw', 'name': 'Framework',
+            'requirement_nodes': [
+                dict({'urn': f'urn:test:req:{ref}', 'ref_id': ref, 'assessable': True}, **links)
+                for ref, links in nodes
+            ],
+        }},
+    }
+
+
+NODES = [
+    ('r1', {'reference_controls': ['urn:test:ctl:a', 'urn:test:ctl:b'], 'threats': ['urn:test:threat:x']}),
+    ('r2', {'reference_controls': ['urn:test:ctl:a']}),
+    ('r3', {}),
+]
+
+
+@pytest.fixture
+def app_env():
+    return {'IDENTITY_CACHE_ENABLED': 'false'}
+
+
+@pytest.fixture
+def app(app):
+    db.session.add(LoadedLibrary(id='urn:test:controls', urn='urn:test:controls', name='Controls'))
+    db.session.add(ReferenceControl(id='urn:test:ctl:a', urn='urn:test:ctl:a', ref_id='A', name='Control A',
+                                    library_urn='urn:test:controls'))
+    db.session.add(create_stored_library_from_yaml(_framework_library(1, NODES)))
+    db.session.commit()
+    assert app.test_client().post('/api/stored-libraries/urn:test:library/import/').status_code == 200
+    return app
+
+
+def test_import_fills_links_and_forward_lookups(app):
+    client = app.test_client()
+
+    assert RequirementReferenceControl.query.count() == 3
+    assert RequirementThreat.query.count() == 1
+    controls = client.get('/api/requirement-nodes/urn:test:req:r1/reference-controls/').get_json()
+    assert [(c['urn'], c['reference_control'] and c['reference_control']['name']) for c in controls['results']] == [
+        ('urn:test:ctl:a', 'Control A'), ('urn:test:ctl:b', None)]
+    threats = client.get('/api/requirement-nodes/urn:test:req:r1/threats/').get_json()
+    assert threats == {'count': 1, 'results': [{'urn': 'urn:test:threat:x'}]}
+    related = client.get('/api/requirement-nodes/urn:test:req:r2/related/').get_json()
+    assert related['reference_controls'] == ['urn:test:ctl:a'] and related['threats'] == []
+    assert client.get('/api/requirement-nodes/nope/threats/').status_code == 404
+
+
+def test_reverse_lookups_and_coverage_use_indexed_joins(app):
+    client = app.test_client()
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    by_control = client.get('/api/reference-controls/urn:test:ctl:a/requirements/').get_json()
+    assert [r['ref_id'] for r in by_control['results']] == ['r1', 'r2']
+    assert not any('stored_libraries' in s for s in statements)
+    unloaded = client.get('/api/reference-controls/urn:test:ctl:b/requirements/?framework=urn:test:framework')
+    assert [r['ref_id'] for r in unloaded.get_json()['results']] == ['r1']
+    by_threat = client.get('/api/threats/urn:test:threat:x/requirements/').get_json()
+    assert [r['ref_id'] for r in by_threat['results']] == ['r1']
+
+    coverage = client.get('/api/frameworks/urn:test:framework/reference-controls/').get_json()
+    assert [(c['urn'], c['requirements'], c['reference_control'] is not None) for c in coverage['results']] == [
+        ('urn:test:ctl:a', 2, True), ('urn:test:ctl:b', 1, False)]
+
+
+def test_upgrade_syncs_links(app):
+    nodes = [
+        ('r1', {'reference_controls': ['urn:test:ctl:b'], 'threats': []}),
+        ('r2', {'reference_controls': ['urn:test:ctl:a'], 'threats': ['urn:test:threat:y']}),
+        ('r3', {}),
+    ]
+    library = db.session.get(StoredLibrary, 'urn:test:library')
+    library.version = '2'
+    library.content = _framework_library(2, nodes)
+    db.session.commit()
+
+    response = app.test_client().post('/api/stored-libraries/urn:test:library/upgrade/')
+
+    assert response.status_code == 200
+    changes = response.get_json()['changes']
+    assert changes['requirement_reference_controls'] == {'inserted': 0, 'deleted': 1}
+    assert changes['requirement_threats'] == {'inserted': 1, 'deleted': 1}
+    by_control = app.test_client().get('/api/reference-controls/urn:test:ctl:b/requirements/').get_json()
+    assert [r['ref_id'] for r in by_control['results']] == ['r1']
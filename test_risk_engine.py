@@ -0,0 +1,93 @@
+"""Tests for the vectorized risk matrix engine"""
+import time
+
+import numpy as np
+import pytest
+
+from application import db
+from app.models import RiskMatrix
+from app.risk_engine import compiled_matrix
+
+SCALE = [{'abbreviation': 'L', 'name': 'Low'}, {'abbreviation': 'M', 'name': 'Medium'},
+         {'abbreviation': 'H', 'name': 'High'}]
+RISK = [{'abbreviation': 'L', 'name': 'Low', 'hexcolor': '#00FF00'},
+        {'abbreviation': 'M', 'name': 'Medium', 'hexcolor': '#FFFF00'},
+        {'abbreviation': 'H', 'name': 'High', 'hexcolor': '#FF0000'}]
+GRID = [[0, 1, 1], [1, 1, 2], [1, 2, None]]  # one cell without a level
+
+
+@pytest.fixture
+def app_env():
+    return {'IDENTITY_CACHE_ENABLED': 'false'}
+
+
+@pytest.fixture
+def app(app):
+    db.session.add(RiskMatrix(id='m', urn='urn:m', name='Matrix', probability=SCALE, impact=SCALE,
+                              grid=GRID, risk_levels=RISK))
+    db.session.commit()
+    return app
+
+
+def test_evaluate_counts_levels_and_heatmap(app):
+    response = app.test_client().post('/api/risk-matrices/m/evaluate/', json={
+        'scenarios': [[0, 0], [1, 2], [1, 2], [2, 1], [2, 2]], 'include_scores': True})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['count'] == 5
+    assert [(level['abbreviation'], level['count']) for level in data['levels']] == [('L', 1), ('M', 0), ('H', 3)]
+    assert data['unrated'] == 1
+    assert data['heatmap'] == [[1, 0, 0], [0, 0, 2], [0, 1, 1]]
+    assert data['scores'] == [0, 2, 2, 2, -1]
+
+    columns = app.test_client().post('/api/risk-matrices/m/evaluate/',
+                                     json={'probability': [0, 1], 'impact': [1, 1]}).get_json()
+    assert [level['count'] for level in columns['levels']] == [0, 2, 0] and 'scores' not in columns
+
+
+def test_invalid_scenarios_are_rejected(app):
+    client = app.test_client()
+
+    for body in ({}, {'scenarios': [[0, 3]]}, {'scenarios': [[0, 1, 2]]}, {'scenarios': [['a', 1]]},
+                 {'probability': [0, 1], 'impact': [0]}):
+        assert client.post('/api/risk-matrices/m/evaluate/', json=body).status_code == 400, body
+    assert client.post('/api/risk-matrices/nope/evaluate/', json={'scenarios': []}).status_code == 404
+
+
+def test_non_integer_indexes_are_rejected(app):
+    client = app.test_client()
+
+    # An int64 cast would score these as [1, 1] and [1, 0]
+    for body in ({'scenarios': [[1.5, 1]]}, {'scenarios': [[True, False]]},
+                 {'probability': [1.5], 'impact': [1]}, {'probability': [0, True], 'impact': [1, 1]}):
+        assert client.post('/api/risk-matrices/m/evaluate/', json=body).status_code == 400, body
+
+
+def test_batch_size_is_capped(app):
+    client = app.test_client()
+    app.config['RISK_EVALUATE_MAX_SCENARIOS'] = 2
+
+    assert client.post('/api/risk-matrices/m/evaluate/', json={'scenarios': [[0, 0]] * 2}).status_code == 200
+    response = client.post('/api/risk-matrices/m/evaluate/', json={'scenarios': [[0, 0]] * 3})
+    assert response.status_code == 400 and '2 scenarios' in response.get_json()['error']
+    assert client.post('/api/risk-matrices/m/evaluate/',
+                       json={'probability': [0] * 3, 'impact': [0] * 3}).status_code == 400
+
+
+def test_compiled_once_per_version_and_fast(app):
+    matrix = db.session.get(RiskMatrix, 'm')
+    compiled = compiled_matrix(matrix)
+    assert compiled_matrix(matrix) is compiled
+
+    matrix.grid = [[2, 2, 2], [2, 2, 2], [2, 2, 2]]
+    db.session.commit()
+    recompiled = compiled_matrix(matrix)
+    assert recompiled is not compiled and recompiled.lookup.min() == 2
+
+    rng = np.random.default_rng(0)
+    probability, impact = rng.integers(0, 3, 100_000), rng.integers(0, 3, 100_000)
+    start = time.perf_counter()
+    result = compiled.evaluate(probability, impact)
+    assert time.perf_counter() - start < 0.5
+    assert sum(level['count'] for level in result['levels']) + result['unrated'] == 100_000
@@ -0,0 +1,157 @@
+"""Tests for the shared cache backends and cached endpoints"""
+import threading
+import time
+
+import pytest
+
+from application import db, cache
+from app.cache import FileSystemBackend, MemoryBackend, RedisBackend, SharedCache
+from app.models import RequirementMappingSet
+
+
+class FakeRedis:
+    """Dict-backed stand-in for the redis-py client commands we use"""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value, expires_at = self.data.get(key, (None, None))
+            if expires_at is not None and expires_at < time.monotonic():
+                del self.data[key]
+                return None
+            return value
+
+    def set(self, key, value, px=None, nx=False):
+        with self.lock:
+            if nx and key in self.data:
+                return None
+            expires_at = time.monotonic() + px / 1000 if px else None
+            self.data[key] = (value, expires_at)
+            return True
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def eval(self, script, numkeys, key, value):
+        # Only script used: RedisBackend.DELETE_IF_EQUAL
+        assert script == RedisBackend.DELETE_IF_EQUAL and numkeys == 1
+        with self.lock:
+            if self.data.get(key, (None, None))[0] == value:
+                del self.data[key]
+                return 1
+            return 0
+
+
+def _shared_cache(backend):
+    shared = SharedCache()
+    shared.backend = backend
+    return shared
+
+
+@pytest.fixture(params=['memory', 'filesystem', 'redis'])
+def shared(request, tmp_path):
+    if request.param == 'memory':
+        return _shared_cache(MemoryBackend())
+    if request.param == 'filesystem':
+        return _shared_cache(FileSystemBackend(str(tmp_path / 'cache')))
+    return _shared_cache(RedisBackend(FakeRedis()))
+
+
+def test_get_or_compute_and_namespace_invalidation(shared):
+    calls = []
+    compute = lambda: calls.append(1) or b'{"tree": []}'
+
+    assert shared.get_or_compute('library:urn:a', 'tree', compute) == b'{"tree": []}'
+    assert shared.get_or_compute('library:urn:a', 'tree', compute) == b'{"tree": []}'
+    assert len(calls) == 1
+
+    shared.get_or_compute('library:urn:b', 'tree', compute)
+    shared.invalidate('library:urn:a')
+    shared.get_or_compute('library:urn:a', 'tree', compute)
+    shared.get_or_compute('library:urn:b', 'tree', compute)
+    assert len(calls) == 3
+
+
+def test_single_flight_collapses_concurrent_misses(shared):
+    calls = []
+
+    def slow_compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return b'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(shared.get_or_compute('ns', 'k', slow_compute)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [b'value'] * 8
+    assert len(calls) == 1
+
+
+def test_timed_out_waiter_keeps_other_holders_lock(shared):
+    shared.lock_timeout = 0.1
+    full_key = shared._full_key('ns', 'k')
+    lock_key = f'{full_key}:lock'
+    shared.backend.add(lock_key, b'stale holder', ttl=0.1)
+
+    def compute():
+        # Our wait timed out and the stale lock expired; another caller takes the lock
+        shared.backend.delete(lock_key)
+        assert shared.backend.add(lock_key, b'new holder', ttl=30)
+        return b'value'
+
+    assert shared.get_or_compute('ns', 'k', compute) == b'value'
+    assert shared.backend.get(lock_key) == b'new holder'
+
+
+def test_compare_and_delete(shared):
+    shared.backend.set('lock', b'mine', ttl=30)
+    shared.backend.delete_if_equal('lock', b'theirs')
+    assert shared.backend.get('lock') == b'mine'
+    shared.backend.delete_if_equal('lock', b'mine')
+    assert shared.backend.get('lock') is None
+
+
+def test_memory_backend_byte_accounting_evicts_lru():
+    backend = MemoryBackend(max_bytes=10)
+    backend.set('a', b'12345')
+    backend.set('b', b'12345')
+    backend.get('a')
+    backend.set('c', b'12345')
+
+    assert backend.get('b') is None
+    assert backend.get('a') == b'12345'
+    assert backend.stats()['bytes'] == 10
+    assert backend.stats()['evictions'] == 1
+
+
+def test_filesystem_backend_shared_between_instances(tmp_path):
+    first = _shared_cache(FileSystemBackend(str(tmp_path)))
+    second = _shared_cache(FileSystemBackend(str(tmp_path)))
+
+    first.get_or_compute('library:x', 'content', lambda: b'cached')
+    assert second.get('library:x', 'content') == b'cached'
+    second.invalidate('library:x')
+    assert first.get('library:x', 'content') is None
+
+
+def test_mapping_set_endpoint_is_cached_and_invalidated(app):
+    db.session.add(RequirementMappingSet(id='ms', urn='ms', name='Crosswalk'))
+    db.session.commit()
+
+    client = app.test_client()
+    assert client.get('/api/requirement-mapping-sets/ms/').get_json()['name'] == 'Crosswalk'
+    client.get('/api/requirement-mapping-sets/ms/')
+    assert cache.stats()['computes'] == 1
+
+    client.put('/api/requirement-mapping-sets/ms/', json={'name': 'Renamed'})
+    assert client.get('/api/requirement-mapping-sets/ms/').get_json()['name'] == 'Renamed'
+    assert cache.stats()['computes'] == 2
@@ -0,0 +1,95 @@
+"""Tests for precomputed framework tree snapshots"""
+import pytest
+from sqlalchemy import event
+
+from application import db
+from app.models import FrameworkTreeSnapshot, LoadedLibrary
+from app.routes.stored_libraries import import_framework_from_library
+from app.routing import STICKY_COOKIE
+
+
+FRAMEWORK_DATA = {
+    'urn': 'urn:test:framework:fw',
+    'ref_id': 'fw',
+    'name': 'Framework',
+    'requirement_nodes': [
+        {'urn': 'urn:test:req:1', 'ref_id': '1', 'name': 'Root', 'order_id': 1},
+        {'urn': 'urn:test:req:1.2', 'ref_id': '1.2', 'name': 'Second', 'parent_urn': 'urn:test:req:1', 'order_id': 3},
+        {'urn': 'urn:test:req:1.1', 'ref_id': '1.1', 'name': 'First', 'parent_urn': 'urn:test:req:1', 'order_id': 2},
+    ],
+}
+
+
+@pytest.fixture
+def app(app):
+    db.session.add(LoadedLibrary(id='urn:test:library', urn='urn:test:library', name='Library'))
+    db.session.flush()
+    import_framework_from_library(FRAMEWORK_DATA, 'urn:test:library')
+    db.session.commit()
+    return app
+
+
+def _count_selects():
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+def test_import_writes_snapshot(app):
+    snapshot = db.session.get(FrameworkTreeSnapshot, ('urn:test:framework:fw', ''))
+    assert snapshot is not None
+    assert len(snapshot.version) == 40
+
+
+def test_tree_endpoint_serves_snapshot_in_one_query(app):
+    client = app.test_client()
+    db.session.expunge_all()
+    statements = _count_selects()
+
+    response = client.get('/api/frameworks/urn:test:framework:fw/tree/')
+
+    data = response.get_json()
+    assert data['framework']['name'] == 'Framework'
+    assert [child['name'] for child in data['tree'][0]['children']] == ['First', 'Second']
+    assert len(statements) == 1
+    assert response.headers['ETag']
+
+    cached = client.get('/api/frameworks/urn:test:framework:fw/tree/',
+                        headers={'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
+
+
+def test_loaded_library_tree_uses_snapshot(app):
+    response = app.test_client().get('/api/loaded-libraries/urn:test:library/tree/')
+    assert response.get_json()['tree'][0]['name'] == 'Root'
+
+
+def test_update_regenerates_snapshot(app):
+    client = app.test_client()
+    before = client.get('/api/frameworks/urn:test:framework:fw/tree/').headers['ETag']
+
+    client.put('/api/frameworks/urn:test:framework:fw/', json={'name': 'Renamed'})
+    response = client.get('/api/frameworks/urn:test:framework:fw/tree/')
+
+    assert response.get_json()['framework']['name'] == 'Renamed'
+    assert response.headers['ETag'] != before
+
+
+def test_missing_snapshot_is_built_without_writing(app):
+    version = db.session.get(FrameworkTreeSnapshot, ('urn:test:framework:fw', '')).version
+    FrameworkTreeSnapshot.query.delete()
+    db.session.commit()
+
+    response = app.test_client().get('/api/frameworks/urn:test:framework:fw/tree/')
+
+    assert response.status_code == 200
+    assert response.get_json()['framework']['name'] == 'Framework'
+    assert response.headers['ETag'] == f'"{version}"'
+    assert STICKY_COOKIE not in response.headers.get('Set-Cookie', '')
+    assert FrameworkTreeSnapshot.query.count() == 0
+
+    localized = app.test_client().get('/api/loaded-libraries/urn:test:library/tree/?locale=fr')
+    assert localized.get_json()['tree'][0]['name'] == 'Root'
+    assert FrameworkTreeSnapshot.query.count() == 0
+    assert app.test_client().get('/api/frameworks/missing/tree/').status_code == 404
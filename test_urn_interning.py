@@ -0,0 +1,103 @@
+"""Tests for the URN dictionary and the integer URN columns"""
+import pytest
+
+from application import db
+from app.models import RequirementMapping, RequirementNode, StoredLibrary, Urn, intern_urns
+
+
+def _content(version, mappings):
+    return {
+        'urn': 'urn:test:library',
+        'version': version,
+        'objects': {
+            'framework': {
+                'urn': 'urn:test:framework', 'ref_id': 'fw', 'name': 'Framework',
+                'requirement_nodes': [
+                    {'urn': 'urn:test:req:1', 'ref_id': '1'},
+                    {'urn': 'urn:test:req:1.1', 'ref_id': '1.1', 'parent_urn': 'urn:test:req:1'},
+                    {'urn': 'urn:test:req:1.2', 'ref_id': '1.2', 'parent_urn': 'urn:test:req:1'},
+                ],
+            },
+            'requirement_mapping_sets': [{
+                'urn': 'urn:test:mapping-set', 'name': 'Mappings',
+                'mappings': [{'source': source, 'target': target, 'relationship': relationship}
+                             for source, target, relationship in mappings],
+            }],
+        },
+    }
+
+
+@pytest.fixture
+def app(app):
+    db.session.add(StoredLibrary(id='urn:test:library', urn='urn:test:library', ref_id='lib', name='Library',
+                                 version='1', content=_content(1, [('urn:test:req:1.1', 'urn:x:a', 'equal'),
+                                                                   ('urn:test:req:1.2', 'urn:x:b', 'subset')])))
+    db.session.commit()
+    assert app.test_client().post('/api/stored-libraries/urn:test:library/import/').status_code == 200
+    return app
+
+
+def _urn_id(urn):
+    return db.session.scalar(db.select(Urn.id).where(Urn.urn == urn))
+
+
+def test_intern_urns_is_idempotent(app):
+    connection = db.session.connection()
+    first = intern_urns(connection, ['urn:new:1', 'urn:new:2', None])
+    assert intern_urns(connection, ['urn:new:2', 'urn:new:1']) == first
+    assert set(first) == {'urn:new:1', 'urn:new:2'}
+
+
+def test_requirement_nodes_are_interned_and_children_use_ids(app):
+    parent = db.session.get(RequirementNode, 'urn:test:req:1')
+    child = db.session.get(RequirementNode, 'urn:test:req:1.1')
+
+    assert parent.urn_id == _urn_id('urn:test:req:1')
+    assert child.parent_urn_id == parent.urn_id
+    assert [node.urn for node in parent.get_children()] == ['urn:test:req:1.1', 'urn:test:req:1.2']
+
+    # Changing a URN column re-interns on flush
+    child.parent_urn = 'urn:test:req:1.2'
+    db.session.commit()
+    assert child.parent_urn_id == _urn_id('urn:test:req:1.2')
+
+
+def test_mappings_have_integer_keys_and_expose_urns(app):
+    mappings = RequirementMapping.query.order_by(RequirementMapping.source_requirement_urn).all()
+    assert all(isinstance(mapping.id, int) for mapping in mappings)
+    assert mappings[0].source_urn_id == _urn_id('urn:test:req:1.1')
+    assert mappings[0].target_urn_id == _urn_id('urn:x:a')
+
+    data = app.test_client().get('/api/requirement-mapping-sets/urn:test:mapping-set/').get_json()
+    assert [(m['source_requirement_urn'], m['target_requirement_urn']) for m in data['mappings']] == [
+        ('urn:test:req:1.1', 'urn:x:a'), ('urn:test:req:1.2', 'urn:x:b')]
+    # The API id stays the URN-derived string
+    assert data['mappings'][0]['id'] == 'urn:test:mapping-set:urn:test:req:1.1:urn:x:a'
+
+
+def test_requirement_urn_lookups_use_interned_ids(app):
+    statements = []
+    db.event.listen(db.engine, 'before_cursor_execute',
+                    lambda conn, cursor, statement, *args: statements.append(statement))
+    nodes = RequirementNode.query.filter(RequirementNode.urn_in(['urn:test:req:1.2'])).all()
+    assert [node.id for node in nodes] == ['urn:test:req:1.2']
+    assert 'urns' in statements[-1]
+    indexes = db.inspect(db.engine).get_indexes('requirement_nodes')
+    assert not any(index['column_names'] == ['urn'] for index in indexes)
+
+
+def test_upgrade_matches_mappings_by_urns(app):
+    kept_id = RequirementMapping.query.filter_by(target_requirement_urn='urn:x:a').one().id
+    library = db.session.get(StoredLibrary, 'urn:test:library')
+    library.version = '2'
+    library.content = _content(2, [('urn:test:req:1.1', 'urn:x:a', 'superset'),
+                                   ('urn:test:req:1.2', 'urn:x:c', 'equal')])
+    db.session.commit()
+
+    response = app.test_client().post('/api/stored-libraries/urn:test:library/upgrade/')
+
+    assert response.get_json()['changes']['requirement_mappings'] == {'inserted': 1, 'updated': 1, 'deleted': 1}
+    kept = db.session.get(RequirementMapping, kept_id)
+    assert kept.relationship_type == 'superset'
+    added = RequirementMapping.query.filter_by(target_requirement_urn='urn:x:c').one()
+    assert added.target_urn_id == _urn_id('urn:x:c')